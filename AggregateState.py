@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import hashlib
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+
+# Bits of the word hashes which pick a HyperLogLog register: 2^14 registers, for a standard error of about 0.8%
+HLL_PRECISION = 14
+
+STATE_VERSION = 2
+
+
+def hash_words(words):
+    """
+    64-bit hashes of words, stable across processes and Python versions (unlike hash()), so that sketches built in
+    different processes can be merged.
+
+    :param words: iterable of str
+    :return: np.array of uint64
+    """
+    digests = b"".join(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest() for word in words)
+    return np.frombuffer(digests, dtype='<u8').astype('uint64')
+
+
+def song_hashes(store):
+    """
+    64-bit content hash of each song of a token store, from its sequence of words, so that a song is recognised
+    whichever token store (and vocabulary order) it's in.
+
+    :param store: TokenStore.TokenStore
+    :return: np.array of uint64
+    """
+    vocabulary = store.vocabulary.tolist()
+    offsets = store.offsets
+    return hash_words(" ".join(map(vocabulary.__getitem__, store.token_ids[offsets[i]:offsets[i + 1]].tolist()))
+                      for i in range(len(offsets) - 1))
+
+
+def _leading_zeros(values):
+    # Number of leading zero bits of each 64-bit value, by halving the width searched at each step
+    values = values.copy()
+    zeros = np.zeros(len(values), dtype='int64')
+    for shift in (32, 16, 8, 4, 2, 1):
+        top_clear = values < (np.uint64(1) << np.uint64(64 - shift))
+        zeros[top_clear] += shift
+        values[top_clear] <<= np.uint64(shift)
+    zeros[values == 0] = 64
+    return zeros
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch of a set of words: estimates the number of distinct words in a fixed 2^precision bytes,
+    however many words are added. Two sketches with the same precision are merged by keeping the larger register,
+    which gives the sketch of the union of their sets.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        """
+        :param precision: int, 4 to 18
+        :param registers: np.array of uint8 of size 2^precision, e.g. of a saved sketch
+        """
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype='uint8') if registers is None else registers
+
+    def add_hashes(self, hashes):
+        """
+        Adds words by their hashes (see hash_words).
+
+        :param hashes: np.array of uint64
+        :return: None
+        """
+        hashes = np.asarray(hashes, dtype='uint64')
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype('int64')
+        remainders = hashes << np.uint64(self.precision)
+        ranks = np.minimum(_leading_zeros(remainders) + 1, 64 - self.precision + 1).astype('uint8')
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def add(self, words):
+        """
+        :param words: iterable of str
+        :return: None
+        """
+        self.add_hashes(hash_words(words))
+
+    def merge(self, other):
+        """
+        Adds the words of another sketch to this one.
+
+        :param other: HyperLogLog with the same precision
+        :return: None
+        """
+        if other.precision != self.precision:
+            raise ValueError("Can't merge HyperLogLog sketches of precision {} and {}".format(self.precision,
+                                                                                             other.precision))
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """
+        Estimated number of distinct words, with the linear counting correction for small sets.
+
+        :return: int
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype('int64')).sum()
+        empty = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and empty:
+            estimate = m * np.log(m / empty)
+        return int(round(estimate))
+
+    def copy(self):
+        return HyperLogLog(self.precision, self.registers.copy())
+
+
+class AggregateState:
+    """
+    Per-period (e.g. per-year) state from which the yearly table is computed: the number of songs, the running sums
+    and counts of each per-song feature, the total number of words, and the set of distinct stems, either exactly or
+    as a HyperLogLog sketch for huge corpora. Adding songs only touches their own tokens and periods, and states built
+    on different partitions of a corpus (or by different workers) merge into the state of the whole corpus. The
+    content hashes of the songs (see song_hashes) are kept too, so that songs which are already counted can be
+    recognised (see known_songs).
+    """
+
+    def __init__(self, features, sketch=False, precision=HLL_PRECISION, period_column="Year"):
+        """
+        :param features: list of str, the per-song features which are averaged
+        :param sketch: bool, estimate the vocabulary size with HyperLogLog sketches instead of sets of stems
+        :param precision: int, precision of the sketches
+        :param period_column: str
+        """
+        self.features = list(features)
+        self.sketch = sketch
+        self.precision = precision
+        self.period_column = period_column
+        self.periods = {}
+        self.song_hashes = set()
+
+    def _period(self, period):
+        if period not in self.periods:
+            self.periods[period] = {"songs": 0, "sums": np.zeros(len(self.features)),
+                                    "counts": np.zeros(len(self.features), dtype='int64'), "total_words": 0,
+                                    "vocabulary": HyperLogLog(self.precision) if self.sketch else set()}
+        return self.periods[period]
+
+    def add_songs(self, df_songs, store, stems, stem_ids, stop_mask):
+        """
+        Adds songs to the state: their features, and their words from a token store of just these songs (or of a
+        corpus they're the first songs of). Adding the same song twice counts it twice; see known_songs.
+
+        :param df_songs: pd.DataFrame with the period column and the features, in the order of the token store
+        :param store: TokenStore.TokenStore
+        :param stems: np.array of str, as returned by TokenStore.stem_vocabulary
+        :param stem_ids: np.array, stem id of each vocabulary entry
+        :param stop_mask: np.array of bool, stopword flag of each stem
+        :return: None
+        """
+        from TokenStore import song_lengths, song_tokens
+
+        counted = ~stop_mask & (stems != '')
+        hashes = hash_words(stems) if self.sketch else None
+        lengths = song_lengths(store)
+        self.song_hashes.update(song_hashes(store)[:len(df_songs)].tolist())
+        values = df_songs[self.features].to_numpy(dtype='float64')
+        valid = ~np.isnan(values)
+        values = np.where(valid, values, 0.0)
+        periods = df_songs[self.period_column].to_numpy()
+        for period in pd.unique(periods):
+            rows = np.flatnonzero(periods == period)
+            # Periods are plain Python values, so that the saved state doesn't depend on numpy scalar types
+            state = self._period(period.item() if hasattr(period, "item") else period)
+            state["songs"] += len(rows)
+            state["sums"] += values[rows].sum(axis=0)
+            state["counts"] += valid[rows].sum(axis=0)
+            state["total_words"] += int(lengths[rows].sum())
+            song_stems = np.unique(stem_ids[song_tokens(store, rows)])
+            song_stems = song_stems[counted[song_stems]]
+            if self.sketch:
+                state["vocabulary"].add_hashes(hashes[song_stems])
+            else:
+                state["vocabulary"].update(stems[song_stems].tolist())
+
+    def merge(self, other):
+        """
+        Adds the songs of another state, e.g. of another partition of the corpus.
+
+        :param other: AggregateState with the same features and kind of vocabulary
+        :return: None
+        """
+        if other.features != self.features or other.sketch != self.sketch:
+            raise ValueError("Can't merge aggregate states with different features or vocabulary kinds")
+        for period, other_state in other.periods.items():
+            state = self._period(period)
+            state["songs"] += other_state["songs"]
+            state["sums"] += other_state["sums"]
+            state["counts"] += other_state["counts"]
+            state["total_words"] += other_state["total_words"]
+            if self.sketch:
+                state["vocabulary"].merge(other_state["vocabulary"])
+            else:
+                state["vocabulary"] |= other_state["vocabulary"]
+        self.song_hashes |= other.song_hashes
+
+    def known_songs(self, store):
+        """
+        Which songs of a token store were already added to the state, by their content hash.
+
+        :param store: TokenStore.TokenStore
+        :return: np.array of bool
+        """
+        return np.isin(song_hashes(store), np.fromiter(self.song_hashes, dtype='uint64', count=len(self.song_hashes)))
+
+    def collapse(self, period="All"):
+        """
+        The state of all periods together, as a single period, e.g. to compare whole corpora.
+
+        :param period: the name of the single period
+        :return: AggregateState
+        """
+        collapsed = AggregateState(self.features, self.sketch, self.precision, self.period_column)
+        for period_state in self.periods.values():
+            part = AggregateState(self.features, self.sketch, self.precision, self.period_column)
+            part.periods[period] = period_state
+            collapsed.merge(part)
+        collapsed.song_hashes = set(self.song_hashes)
+        return collapsed
+
+    def vocabulary_size(self, period):
+        vocabulary = self.periods[period]["vocabulary"]
+        return vocabulary.count() if self.sketch else len(vocabulary)
+
+    def table(self):
+        """
+        The per-period table, with the same columns as Pipeline.average_years: the mean of each feature, vocabulary
+        size, lexical diversity, total words and number of songs.
+
+        :return: pd.DataFrame indexed by period, with only the periods which have songs
+        """
+        periods = sorted(self.periods)
+        states = [self.periods[period] for period in periods]
+        sums = np.array([state["sums"] for state in states]).reshape(len(states), len(self.features))
+        counts = np.array([state["counts"] for state in states]).reshape(len(states), len(self.features))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        df_period = pd.DataFrame(means, index=pd.Index(periods, name=self.period_column), columns=self.features)
+        vocabulary = np.array([self.vocabulary_size(period) for period in periods], dtype='int64')
+        total_words = np.array([state["total_words"] for state in states], dtype='int64')
+        df_period["Vocabulary size"] = vocabulary
+        df_period["Lexical diversity"] = np.divide(vocabulary, total_words, out=np.zeros(len(periods)),
+                                                   where=total_words > 0)
+        df_period["Total words"] = total_words
+        df_period["Number of Songs"] = np.array([state["songs"] for state in states], dtype='int64')
+        return df_period
+
+    def save(self, path):
+        """
+        Saves the state, replacing the file only once it's completely written.
+
+        :param path: str
+        :return: None
+        """
+        periods = {period: dict(state, vocabulary=state["vocabulary"].registers if self.sketch
+                                else sorted(state["vocabulary"]))
+                   for period, state in self.periods.items()}
+        contents = {"version": STATE_VERSION, "features": self.features, "sketch": self.sketch,
+                    "precision": self.precision, "period_column": self.period_column, "periods": periods,
+                    "song_hashes": np.fromiter(self.song_hashes, dtype='uint64', count=len(self.song_hashes))}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(contents, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a state saved by save.
+
+        :param path: str
+        :return: AggregateState
+        """
+        with open(path, "rb") as f:
+            contents = pickle.load(f)
+        if contents.get("version") != STATE_VERSION:
+            raise ValueError("{} was saved by another version of AggregateState".format(path))
+        state = cls(contents["features"], contents["sketch"], contents["precision"], contents["period_column"])
+        for period, period_state in contents["periods"].items():
+            vocabulary = period_state["vocabulary"]
+            state.periods[period] = dict(period_state, vocabulary=HyperLogLog(state.precision, vocabulary)
+                                         if state.sketch else set(vocabulary))
+        state.song_hashes = set(contents["song_hashes"].tolist())
+        return state
+
+
+def merge_states(states):
+    """
+    Merges the states of several partitions of a corpus into a new state.
+
+    :param states: non-empty list of AggregateState
+    :return: AggregateState
+    """
+    first = states[0]
+    merged = AggregateState(first.features, first.sketch, first.precision, first.period_column)
+    for state in states:
+        merged.merge(state)
+    return merged
@@ -10,20 +10,33 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from Functions import *
-import pickle
+from TokenStore import *
+from CorpusStore import load_corpus
+from Deduplication import deduplicate
+from FeatureExtraction import default_workers
+from FeatureCache import FeatureCache, feature_fingerprint, extract_features_cached
 from nltk.corpus import stopwords
-from wordcloud import WordCloud, STOPWORDS
-from PIL import Image
+from wordcloud import STOPWORDS
+from TimeSeries import reindex_periods, impute, moving_average
+from WordCloudRender import load_mask, compute_layout, save_layout, DRAFT_FACTOR
+import Functions
+import Instrumentation
+
+# Set LYRICS_TRACE=1 to record the time and memory of each part of the analysis (LYRICS_TRACE=memory to also trace
+# allocations, which is slower); the trace is written to the Outputs folder at the end
+if os.environ.get("LYRICS_TRACE"):
+    Instrumentation.enable(trace_malloc=os.environ["LYRICS_TRACE"] == "memory", trace_modules=[Functions])
 
 
 ###################################
 # 1. DATA CLEANING #
 ###################################
 
-# Load the scraped lyrics from the pickled file
-infile = open("lyrics.txt", "rb")
-dfLyrics = pickle.load(infile)
-infile.close()
+Instrumentation.begin("cleaning")
+
+# Load the scraped lyrics from the Arrow corpus file (converted from the old pickled lyrics.txt on first run), with
+# Arrow-backed strings which stay in the memory-mapped file rather than becoming Python objects
+dfLyrics = load_corpus(columns=["Song Title", "Date", "Lyrics"], compact=True)
 
 # Drop missing lyrics and missing years
 dfLyrics = dfLyrics.dropna(subset=["Lyrics", "Date"])
@@ -36,89 +49,86 @@ dfLyrics = dfLyrics[~dfLyrics["Song Title"].str.contains('|'.join(searchFor))]
 dfLyrics.reset_index(inplace=True, drop=True)
 
 # Add a new Year column and replace newlines with blank space in Lyrics; also drop tags, e.g. [Outro]
-dfLyrics["Year"] = pd.DatetimeIndex(dfLyrics["Date"]).year
-dfLyrics["Lyrics"] = dfLyrics["Lyrics"].str.replace("\n", " ")
-dfLyrics["Lyrics"] = dfLyrics['Lyrics'].str.replace(r"\[[^\]]*\]", "")
+dfLyrics["Year"] = pd.DatetimeIndex(dfLyrics["Date"]).year.astype("int16")
+dfLyrics["Lyrics"] = dfLyrics["Lyrics"].str.replace(r"\[[^\]]*\]", "", regex=True).str.replace("\n", " ")
 
 # Drop songs where lyrics are not released or from leaked demo, as well as very short lyrics
 dfLyrics = dfLyrics[~dfLyrics['Lyrics'].str.contains("Lyrics for this|Lyrics from")]
-dfLyrics = dfLyrics[~dfLyrics['Lyrics'].apply(lambda x: len(x) < 10)]
+dfLyrics = dfLyrics[dfLyrics['Lyrics'].str.len() >= 10]
+
+# The title list above only catches the duplicates I found by hand. Set LYRICS_DEDUP_THRESHOLD (e.g. 0.8, like
+# Pipeline.py's --dedup-threshold) to also drop songs whose lyrics are nearly the same as another song's (found with
+# MinHash signatures of their word sequences), keeping the shortest title, and LYRICS_VERBOSE=1 to print them
+dedupThreshold = float(os.environ.get("LYRICS_DEDUP_THRESHOLD", 1))
+if dedupThreshold < 1:
+    dfLyrics, dfDuplicates = deduplicate(dfLyrics, dedupThreshold)
+    if os.environ.get("LYRICS_VERBOSE"):
+        print(dfDuplicates)
+Instrumentation.end()
+
+Instrumentation.begin("tokenizing")
+
+# Reuse the stems learned in previous runs
+stemCachePath = os.path.join('Outputs', 'stem_cache.tsv')
+load_stem_cache(stemCachePath)
+
+# Tokenize the cleaned lyrics once; the word-based measures below all use this token store
+# It is also saved as .npy files, which later runs can memory-map with load_token_store
+tokenStore = build_token_store(dfLyrics["Lyrics"])
+save_token_store(tokenStore, os.path.join('Outputs', 'TokenStore'))
+Instrumentation.end()
 
 
 ###################################
 # 2. CALCULATING FEATURES #
 ###################################
 
+Instrumentation.begin("features")
+
 # I've defined two lexicons: I-words (words referring to oneself); and greatness words
 # Here I load each lexicon and then count the occurrence of its words in each song
-lexiconI = pd.read_table(os.path.join('Lexicons', 'i_words.txt'), index_col=0, sep='\t')
-lexiconGreat = pd.read_table(os.path.join('Lexicons', 'greatness_words.txt'), index_col=0, sep='\t')
-
-# Extract the list of regex patterns in each lexicon and compile them
-patternListI = [re.compile(pattern, re.IGNORECASE) for pattern in lexiconI['Regex']]
-patternListGreat = [re.compile(pattern, re.IGNORECASE) for pattern in lexiconGreat['Regex']]
-
-# Count the number of pattern matches in each file for both lexicons and put them in a DataFrame
-lyricsSeries = dfLyrics["Lyrics"]
-matchCountI = count_patterns_series(patternListI, lyricsSeries)
-matchCountGreat = count_patterns_series(patternListGreat, lyricsSeries)
-countIDF = df_pattern_matches(dfLyrics, matchCountI, lexiconI)
-countGreatDF = df_pattern_matches(dfLyrics, matchCountGreat, lexiconGreat)
-
-# Finally, count total lexicon words per song and add new columns to the corpus
-totalIWords = countIDF.sum(axis=1)
-totalGreatWords = countGreatDF.sum(axis=1)
-dfLyrics["I-words"] = totalIWords
-dfLyrics["Greatness words"] = totalGreatWords
+lexiconPaths = {"I-words": os.path.join('Lexicons', 'i_words.txt'),
+                "Greatness words": os.path.join('Lexicons', 'greatness_words.txt')}
+lexiconI = pd.read_table(lexiconPaths["I-words"], index_col=0, sep='\t')
+lexiconGreat = pd.read_table(lexiconPaths["Greatness words"], index_col=0, sep='\t')
+
+# Count the lexicon words of each song, as well as its sentiment using TextBlob
+# This runs in a pool of worker processes, each of which compiles both lexicons into one matcher once
+# Songs whose lyrics were already processed with the same lexicons and stopwords are taken from the feature cache
+stops = stopwords.words('english')
+featureNames = ("Lexicons", "Sentiment")
+featureCache = FeatureCache(os.path.join('Outputs', 'feature_cache.sqlite'),
+                            feature_fingerprint(lexiconPaths, stops, featureNames))
+dfFeatures = extract_features_cached(dfLyrics, {"I-words": lexiconI, "Greatness words": lexiconGreat}, stops,
+                                     featureCache, featureNames, n_workers=default_workers())
+print("Feature cache: {} hits, {} misses".format(featureCache.hits, featureCache.misses))
+featureCache.close()
+
+# Finally, add the total lexicon words per song as new columns to the corpus
+dfLyrics["I-words"] = dfFeatures["I-words"]
+dfLyrics["Greatness words"] = dfFeatures["Greatness words"]
+
+# Stem each word of the token store's vocabulary once, and flag the stems which are stopwords
+stems, stemIds = stem_vocabulary(tokenStore)
+stopMask = stem_stopword_mask(stems, stops)
+save_stem_cache(stemCachePath)
 
 # The next measure we will use is the vocabulary size, i.e. number of unique words per song
 # We'll count unique words per year to avoid duplicate counting of words
-stops = stopwords.words('english')
-totalWordsYear = pd.Series(np.zeros(len(dfLyrics["Year"].unique())))
-uniqueWords = pd.Series(np.zeros(len(dfLyrics["Year"].unique())))
-lexicalDiversity = pd.Series(np.zeros(len(dfLyrics["Year"].unique())))
-
-for i, year in enumerate(dfLyrics["Year"].unique()):
-    dfYear = dfLyrics[dfLyrics["Year"] == year]
-
-    # Put all the lyrics for that year in one string, then use it to make a BoW
-    lyricsYear = ''
-    for lyrics in dfYear["Lyrics"]:
-        lyricsYear += ' ' + lyrics
-
-    # Make a bag of words from the lyrics and count number of unique words, removing stopwords
-    aBOW = make_conventional_bow(lyricsYear)
-    totalWordsYear[i] = sum(aBOW.values())
-    for k, v in list(aBOW.items()):
-        if k in stops or k == "":
-            del aBOW[k]
-    uniqueWords[i] = len(aBOW)
-    lexicalDiversity[i] = uniqueWords[i]/totalWordsYear[i]
-    # We'll attach this to the corpus later when we group by year
+# The per-song bags of words are summed per year in one go, so no song is tokenized again
+dfVocabularyYear = group_vocabulary(tokenStore, stems, stemIds, stopMask, dfLyrics["Year"])
+# We'll attach this to the corpus later when we group by year
 
 
 # Another measure we will use is lexical density, i.e. the ratio of non-stopwords to total words in a song
-lexicalDensity = pd.Series(np.zeros(len(lyricsSeries)))
-for i, lyrics in enumerate(lyricsSeries):
-    aBOW = make_conventional_bow(lyrics)
-    totalWords = sum(aBOW.values())
-    nonStopWords = 0
-    dictKeys = list(aBOW.keys())
-    for entry in dictKeys:
-        if entry not in stops:
-            nonStopWords += aBOW[entry]
-
-    if totalWords == 0:
-        lexicalDensity[i] = 0
-    else:
-        lexicalDensity[i] = (nonStopWords/totalWords)*100
-
-dfLyrics['Lexical density'] = lexicalDensity
+# It is calculated from the token store as well
+dfLyrics['Lexical density'] = lexical_density(tokenStore, stemIds, stopMask)
 
 
-# Using TextBlob, I measure each lyrics' sentiment
-sentiment = dfLyrics.apply(lambda row: get_lyrics_sentiment(row["Lyrics"]), axis=1)
-dfLyrics["Sentiment"] = sentiment
+# The sentiment of each song was measured with the lexicon counts above
+dfLyrics["Sentiment"] = dfFeatures["Sentiment"]
+Instrumentation.end()
+Instrumentation.begin("aggregation")
 
 # Finally, we get average I-words/Greatness words/Vocabulary size per year
 dfLyricsYear = dfLyrics[["Year", "I-words", "Greatness words", "Lexical density", "Sentiment"]]\
@@ -126,32 +136,27 @@ dfLyricsYear = dfLyrics[["Year", "I-words", "Greatness words", "Lexical density"
 dfLyricsYear.reset_index(inplace=True)
 
 # Since vocabulary size is grouped by year, we attach it to the DF here
-dfLyricsYear["Vocabulary size"] = uniqueWords
-dfLyricsYear["Lexical diversity"] = lexicalDiversity
-dfLyricsYear["Total words"] = totalWordsYear
+for column in ["Vocabulary size", "Lexical diversity", "Total words"]:
+    dfLyricsYear[column] = dfLyricsYear["Year"].map(dfVocabularyYear[column])
 
 # Add number of songs per year as well and reset index
 dfNoSongs = dfLyrics[["Year", "Date"]].groupby(["Year"]).count().reset_index()
 dfLyricsYear["Number of Songs"] = dfNoSongs["Date"]
 
 # Since there are a few years with no data (i.e. no songs released), we need to impute the missing data
-# First I add each missing year to the DF with NaN values
-for year in range(2003, 2021):
-    if year not in dfLyricsYear['Year'].values:
-        dfTemp = pd.DataFrame([[year, np.NaN, np.NaN, np.NaN, np.NaN, np.NaN, np.NaN, np.NaN, 0]],
-                              columns=list(dfLyricsYear.columns))
-        dfLyricsYear = dfLyricsYear.append(dfTemp, ignore_index=True)
-
-# Then we sort and re-index the data, and finally fill in the missing values using linear interpolation
-dfLyricsYear.sort_values(by=['Year'], inplace=True)
-dfLyricsYear.reset_index(drop=True, inplace=True)
-dfLyricsYear.interpolate(method='linear', inplace=True)
+# First I put the table on the full calendar, from the first to the last year with songs, which gives NaN values for
+# the missing years; then I fill them in using linear interpolation (the number of songs of those years is 0)
+dfLyricsYear = reindex_periods(dfLyricsYear)
+dfLyricsYear = impute(dfLyricsYear, method='linear')
+Instrumentation.end()
 
 
 ###################################
 # 3. PLOTTING #
 ###################################
 
+Instrumentation.begin("plotting")
+
 # First we plot I-words and Greatness words
 fig, ax1 = plt.subplots()
 
@@ -201,9 +206,10 @@ with pd.option_context('display.max_rows', None, 'display.max_columns', None):
 
 ####################################################################
 
-# Same analysis but using a 3-year rolling average for each variable
+# Same analysis but using a 3-year rolling average for each variable (the years themselves are not averaged)
+# moving_average also offers centered and exponentially weighted windows
 
-dfLyricsRolling = dfLyricsYear.rolling(3).mean()
+dfLyricsRolling = moving_average(dfLyricsYear, 3, kind="trailing")
 
 # Now we plot the data
 # First we plot I-words and Greatness words
@@ -254,19 +260,26 @@ with pd.option_context('display.max_rows', None, 'display.max_columns', None):
     print(dfLyricsRolling[["Total words", "Vocabulary size", "Lexical diversity", "Lexical density"]].corr())
 
 plt.plot(dfLyricsRolling["Year"], dfLyricsRolling["Sentiment"])
+Instrumentation.end()
 
 
+Instrumentation.begin("word cloud")
+
 # Let's also create a word cloud of all of Kanye's lyrics
-# Put all lyrics in a string
-allLyrics = ""
-for lyric in dfLyrics['Lyrics']:
-    allLyrics += lyric + " "
+# The word frequencies come straight from the token store
+wordFrequencies = word_frequencies(tokenStore, STOPWORDS)
 
-# Create a mask to display the cloud in the shape of a person
-mask = np.array(Image.open('user.png'))
+# Create a mask to display the cloud in the shape of a person (the decoded image is cached in Outputs/Masks)
+# Set draftCloud to True for a quick preview placed on a 4 times smaller canvas
+draftCloud = False
+mask = load_mask('user.png', DRAFT_FACTOR if draftCloud else 1, os.path.join('Outputs', 'Masks'))
 
-# Create a word cloud and display it
-wordCloud = WordCloud(width=3000, height=2000, random_state=3, background_color='white', colormap='Set2',
-                      collocations=False, stopwords=STOPWORDS, mask=mask).generate(allLyrics)
+# Create a word cloud and display it; its layout is saved, so Pipeline.py wordcloud --reuse-layout can redraw or
+# recolour it without placing the words again
+wordCloud = compute_layout(wordFrequencies.to_dict(), mask, draftCloud)
+save_layout(wordCloud, os.path.join('Outputs', 'wordcloud_layout.json'), DRAFT_FACTOR if draftCloud else 1)
 
 plot_cloud(wordCloud)
+Instrumentation.end()
+
+Instrumentation.write_trace(os.path.join('Outputs', 'trace.json'), os.path.join('Outputs', 'trace.chrome.json'))
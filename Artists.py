@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from Pipeline import OUTPUTS, SEARCH_FOR, CORPUS_CHUNK_SIZE, impute_years, year_state_chunked
+
+
+ARTIST_OUTPUTS = os.path.join(OUTPUTS, 'Artists')
+COMPARISON_PATH = os.path.join(OUTPUTS, 'artist_comparison.csv')
+
+# Manual title blacklists of the artists (see Pipeline.SEARCH_FOR); the songs of other artists are only deduplicated
+TITLE_FILTERS = {"Kanye West": SEARCH_FOR}
+
+# Columns of the cross-artist comparison table
+COMPARISON_COLUMNS = ["Number of Songs", "First year", "Last year", "I-words", "Greatness words", "Lexical density",
+                      "Lexical diversity", "Sentiment", "Vocabulary size", "Total words"]
+
+
+def init_worker():
+    # The libraries and stopwords are loaded once per worker process, not once per artist
+    from nltk.corpus import stopwords
+    import textblob
+    import AggregateState
+    import FeatureExtraction
+    import TokenStore
+
+    stopwords.words('english')
+
+
+def artist_summary(state):
+    """
+    The metrics of an artist's whole corpus: the mean of each per-song feature over all songs, and the vocabulary
+    size and lexical diversity of all songs together (which, unlike the means, grow with the size of the corpus).
+
+    :param state: AggregateState.AggregateState of the artist's songs
+    :return: pd.Series
+    """
+    summary = state.collapse().table().iloc[0]
+    years = sorted(state.periods)
+    summary["First year"] = years[0]
+    summary["Last year"] = years[-1]
+    return summary
+
+
+def analyze_artist(artist, corpus_path, directory=ARTIST_OUTPUTS, dedup_threshold=0.8, chunk_size=CORPUS_CHUNK_SIZE,
+                   sketch=False, first_year=None, last_year=None, impute="linear"):
+    """
+    Features and yearly table of one artist, calculated a chunk of songs at a time (see Pipeline.year_state_chunked).
+    Saves the yearly table as <slug>.csv in the directory, and the per-song features and per-year state in the
+    <slug> subdirectory.
+
+    :param artist: str
+    :param corpus_path: str, the artist's partition of the corpus
+    :param directory: str
+    :param dedup_threshold: float, lyrics similarity above which songs are near-duplicates (1 to keep them all)
+    :param chunk_size: int, number of songs per chunk
+    :param sketch: bool, estimate the vocabulary sizes with HyperLogLog sketches
+    :param first_year: int, first year of the yearly table
+    :param last_year: int, last year of the yearly table
+    :param impute: str, see TimeSeries.IMPUTATIONS
+    :return: artist: str, summary: pd.Series as returned by artist_summary (None if no songs are left)
+    """
+    from CorpusStore import artist_slug, write_corpus
+
+    try:
+        state, df_songs = year_state_chunked(corpus_path, TITLE_FILTERS.get(artist), dedup_threshold, chunk_size,
+                                             workers=1, sketch=sketch)
+    except ValueError as e:
+        print("{}: {}".format(artist, e))
+        return artist, None
+
+    slug = artist_slug(artist)
+    os.makedirs(os.path.join(directory, slug), exist_ok=True)
+    df_songs.insert(0, "Artist", artist)
+    write_corpus(df_songs, os.path.join(directory, slug, 'song_features.arrow'))
+    state.save(os.path.join(directory, slug, 'aggregate_state.pkl'))
+    impute_years(state.table(), first_year, last_year, impute).to_csv(os.path.join(directory, slug + '.csv'),
+                                                                      index=False)
+    return artist, artist_summary(state)
+
+
+def analyze_artists(corpora, directory=ARTIST_OUTPUTS, n_workers=None, **options):
+    """
+    Runs analyze_artist for every artist in a pool of worker processes, each loading the libraries once for all the
+    artists it analyses, the largest corpora first so that the workers finish at about the same time.
+
+    :param corpora: dict of artist -> path of the artist's corpus, see CorpusStore.artist_corpora
+    :param directory: str
+    :param n_workers: int, number of worker processes (default: number of CPUs; 1 to run in this process)
+    :param options: keyword arguments of analyze_artist
+    :return: pd.DataFrame indexed by artist with COMPARISON_COLUMNS, sorted by artist
+    """
+    import pandas as pd
+
+    artists = sorted(corpora, key=lambda artist: os.path.getsize(corpora[artist]), reverse=True)
+    analyze = partial(analyze_artist, directory=directory, **options)
+    n_workers = min(n_workers or os.cpu_count() or 1, len(artists))
+    if n_workers <= 1:
+        init_worker()
+        results = [analyze(artist, corpora[artist]) for artist in artists]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker) as executor:
+            results = list(executor.map(analyze, artists, [corpora[artist] for artist in artists]))
+
+    summaries = {artist: summary for artist, summary in results if summary is not None}
+    df_comparison = pd.DataFrame.from_dict(summaries, orient="index").reindex(columns=COMPARISON_COLUMNS)
+    df_comparison.index.name = "Artist"
+    counts = ["Number of Songs", "First year", "Last year", "Vocabulary size", "Total words"]
+    df_comparison[counts] = df_comparison[counts].astype("int64")
+    return df_comparison.sort_index()
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+
+Benchmark suite of the Functions.py building blocks and of each stage of the analysis, run on synthetic corpora
+(see synthetic_corpus.py) of the requested sizes. The best time of several repeats of each benchmark is written as
+JSON, and two such files can be compared to flag regressions.
+
+    python Benchmarks/bench.py --sizes 1000 10000 --output before.json
+    python Benchmarks/bench.py --sizes 1000 10000 --output after.json
+    python Benchmarks/bench.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Number of patterns of the synthetic lexicon of the large lexicon benchmarks
+LARGE_LEXICON_SIZE = 300
+
+
+def large_lexicon(words, size):
+    r"""
+    A lexicon of the given size in the style of the real ones, from a list of words: every third pattern also
+    matches the words starting with its word, e.g. \bgreat\w{0,}\b, and every tenth is a pair of words.
+
+    :param words: list of str
+    :param size: int
+    :return: pd.DataFrame with 'Label' and 'Regex' columns
+    """
+    import pandas as pd
+
+    patterns = []
+    for i in range(size):
+        if i % 10 == 9:
+            pattern = r"\b{} {}\b".format(words[i], words[i + 1])
+        elif i % 3 == 2:
+            pattern = r"\b{}\w{{0,}}\b".format(words[i])
+        else:
+            pattern = r"\b{}\b".format(words[i])
+        patterns.append(pattern)
+    return pd.DataFrame({"Label": patterns, "Regex": patterns})
+
+
+def setup(n_songs, seed):
+    """
+    Generates a corpus and everything the benchmarks need from it, so that only the benchmarked step is timed.
+
+    :param n_songs: int
+    :param seed: int
+    :return: dict
+    """
+    import re as regex
+    from nltk.corpus import stopwords
+    from synthetic_corpus import generate_corpus, vocabulary_statistics
+    from Functions import LexiconMatcher
+    from Pipeline import clean_lyrics, load_lexicons, LEXICON_PATHS
+    from TokenStore import build_token_store, stem_vocabulary, stem_stopword_mask
+
+    lexicons = load_lexicons({name: os.path.join(ROOT, path) for name, path in LEXICON_PATHS.items()})
+    statistics = vocabulary_statistics()
+    df_raw = generate_corpus(n_songs, seed, statistics)
+    df_lyrics = clean_lyrics(df_raw)
+    stops = stopwords.words('english')
+    token_store = build_token_store(df_lyrics["Lyrics"])
+    stems, stem_ids = stem_vocabulary(token_store)
+    lexicon = large_lexicon([word for word in statistics["words"] if regex.fullmatch(r"[a-z]+", word)],
+                            LARGE_LEXICON_SIZE)
+    return {"df_raw": df_raw, "df_lyrics": df_lyrics, "lexicons": lexicons, "stops": stops,
+            "pattern_list": [regex.compile(pattern, regex.IGNORECASE)
+                             for lexicon in lexicons.values() for pattern in lexicon['Regex']],
+            "matcher": LexiconMatcher(list(lexicons.values())),
+            "large_pattern_list": [regex.compile(pattern, regex.IGNORECASE) for pattern in lexicon['Regex']],
+            "large_matcher": LexiconMatcher([lexicon]),
+            "token_store": token_store, "stems": stems, "stem_ids": stem_ids,
+            "stop_mask": stem_stopword_mask(stems, stops)}
+
+
+def benchmarks():
+    """
+    The benchmarks, as name -> function of the setup data.
+
+    :return: dict
+    """
+    import Functions
+    import Pipeline
+    import TokenStore
+    from Deduplication import deduplicate
+    from FeatureExtraction import extract_features
+
+    def count_patterns_string(data):
+        for lyrics in data["df_lyrics"]["Lyrics"]:
+            Functions.count_patterns_string(data["pattern_list"], lyrics)
+
+    def make_conventional_bow(data):
+        Functions.clear_stem_cache()
+        for lyrics in data["df_lyrics"]["Lyrics"]:
+            Functions.make_conventional_bow(lyrics)
+
+    def get_lyrics_sentiment(data):
+        for lyrics in data["df_lyrics"]["Lyrics"]:
+            Functions.get_lyrics_sentiment(lyrics)
+
+    def get_lyrics_sentiment_series(data):
+        Functions._sentiment_cache.clear()
+        Functions.get_lyrics_sentiment_series(data["df_lyrics"]["Lyrics"])
+
+    def stage_features(data):
+        extract_features(data["df_lyrics"], data["lexicons"], data["stops"], ("Lexicons", "Sentiment"), n_workers=1)
+
+    def stage_aggregate(data):
+        df_songs = data["df_lyrics"][["Year"]].copy()
+        df_songs["Lexical density"] = TokenStore.lexical_density(data["token_store"], data["stem_ids"],
+                                                                 data["stop_mask"])
+        df_vocabulary_year = TokenStore.group_vocabulary(data["token_store"], data["stems"], data["stem_ids"],
+                                                         data["stop_mask"], df_songs["Year"])
+        Pipeline.aggregate_years(df_songs, df_vocabulary_year)
+
+    def stage_plot(data):
+        import matplotlib
+        matplotlib.use('Agg')
+        import pandas as pd
+        df_year = pd.DataFrame({"Year": range(2003, 2021)})
+        for column in ["I-words", "Greatness words", "Total words", "Lexical diversity"]:
+            df_year[column] = range(len(df_year))
+        with tempfile.TemporaryDirectory() as directory:
+            for left, right in Pipeline.PLOT_PAIRS:
+                Pipeline.plot_pair(df_year, left, right, os.path.join(directory, left[0] + ".png"))
+
+    def stage_wordcloud(data):
+        from wordcloud import WordCloud, STOPWORDS
+        frequencies = TokenStore.word_frequencies(data["token_store"], STOPWORDS)
+        WordCloud(width=600, height=400, random_state=3).generate_from_frequencies(frequencies.to_dict())
+
+    return {
+        "count_patterns_string": count_patterns_string,
+        "count_patterns_series": lambda data: Functions.count_patterns_series(data["pattern_list"],
+                                                                              data["df_lyrics"]["Lyrics"]),
+        "LexiconMatcher.count_series": lambda data: data["matcher"].count_series(data["df_lyrics"]["Lyrics"]),
+        "count_patterns_series large lexicon": lambda data: Functions.count_patterns_series(
+            data["large_pattern_list"], data["df_lyrics"]["Lyrics"]),
+        "LexiconMatcher.count_series large lexicon": lambda data: data["large_matcher"].count_series(
+            data["df_lyrics"]["Lyrics"]),
+        "make_conventional_bow": make_conventional_bow,
+        "get_lyrics_sentiment": get_lyrics_sentiment,
+        "get_lyrics_sentiment_series": get_lyrics_sentiment_series,
+        "stage clean": lambda data: Pipeline.clean_lyrics(data["df_raw"]),
+        "stage deduplicate": lambda data: deduplicate(data["df_lyrics"]),
+        "stage tokenize": lambda data: TokenStore.build_token_store(data["df_lyrics"]["Lyrics"]),
+        "stage features": stage_features,
+        "stage lexical density": lambda data: TokenStore.lexical_density(data["token_store"], data["stem_ids"],
+                                                                         data["stop_mask"]),
+        "stage aggregate": stage_aggregate,
+        "stage plot": stage_plot,
+        "stage wordcloud": stage_wordcloud,
+    }
+
+
+def run(sizes, repeats, seed, only=None):
+    """
+    Runs the benchmarks on corpora of each size.
+
+    :param sizes: list of int
+    :param repeats: int
+    :param seed: int
+    :param only: str, regex selecting the benchmarks to run
+    :return: dict of "name@size" -> result
+    """
+    results = {}
+    for n_songs in sizes:
+        data = setup(n_songs, seed)
+        for name, benchmark in benchmarks().items():
+            if only and not re.search(only, name):
+                continue
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                benchmark(data)
+                times.append(time.perf_counter() - start)
+            key = "{}@{}".format(name, n_songs)
+            results[key] = {"benchmark": name, "songs": n_songs, "seconds": min(times),
+                            "us_per_song": min(times) / max(1, len(data["df_lyrics"])) * 1e6}
+            print("{:<45} {:>10.4f}s {:>10.1f}us/song".format(key, results[key]["seconds"],
+                                                             results[key]["us_per_song"]))
+    return results
+
+
+def compare(before, after, tolerance):
+    """
+    Benchmarks of after which are slower than in before by more than the tolerance.
+
+    :param before: dict, results file contents
+    :param after: dict, results file contents
+    :param tolerance: float, allowed relative slowdown
+    :return: list of str
+    """
+    regressions = []
+    for key, result in sorted(after["results"].items()):
+        if key not in before["results"]:
+            continue
+        old = before["results"][key]["seconds"]
+        change = result["seconds"] / old - 1 if old else 0
+        flag = "REGRESSION" if change > tolerance else ""
+        print("{:<45} {:>10.4f}s -> {:>10.4f}s {:>+8.1%} {}".format(key, old, result["seconds"], change, flag))
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000], help="corpus sizes, 1k to 1M songs")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="regex selecting the benchmarks to run")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two results files")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown (default 0.1)")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        sys.exit(1 if compare(before, after, args.tolerance) else 0)
+
+    results = run(args.sizes, args.repeats, args.seed, args.only)
+    if args.output:
+        meta = {"python": platform.python_version(), "platform": platform.platform(), "seed": args.seed,
+                "repeats": args.repeats, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+
+Startup-time regression benchmark for the Pipeline.py command line. For the top-level command and each stage, it
+measures the wall time of parsing the command line in a fresh interpreter (the median of several runs), and checks
+that none of the heavy libraries were imported by then. Compared with a baseline, a run fails if any command got
+slower by more than the tolerance, or imports a heavy library at startup.
+
+    python Benchmarks/startup.py --output startup.json
+    python Benchmarks/startup.py --baseline startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = [[], ["ingest"], ["features"], ["aggregate"], ["plot"], ["wordcloud"], ["lexicons"], ["run"], ["report"],
+            ["stream"], ["artists"], ["add-songs", "song.txt", "--title", "Song", "--date", "2026-10-01"]]
+HEAVY_MODULES = ["numpy", "pandas", "scipy", "nltk", "textblob", "matplotlib", "wordcloud", "PIL", "pyarrow",
+                 "aiohttp", "bs4"]
+
+# Parses the command line like Pipeline.main without running the stage, then reports the heavy modules loaded
+PROBE = """
+import sys
+sys.argv = ["Pipeline.py"] + {argv!r}
+import Pipeline
+if len(sys.argv) > 1:
+    Pipeline.make_parser().parse_args(sys.argv[1:])
+print(" ".join(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+
+def measure(command, repeats):
+    """
+    Startup time and heavy modules imported for a command.
+
+    :param command: list of str, Pipeline.py arguments
+    :param repeats: int
+    :return: dict
+    """
+    probe = PROBE.format(argv=command, heavy=HEAVY_MODULES)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+        times.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(times), "heavy_imports": result.stdout.split()}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of results against a baseline.
+
+    :param results: dict of command -> measurement
+    :param baseline: dict of command -> measurement
+    :param tolerance: float, allowed relative slowdown
+    :return: list of str
+    """
+    regressions = []
+    for command, result in results.items():
+        if result["heavy_imports"]:
+            regressions.append("{}: imports {} at startup".format(command, ", ".join(result["heavy_imports"])))
+        if command in baseline and result["seconds"] > baseline[command]["seconds"] * (1 + tolerance):
+            regressions.append("{}: {:.3f}s, baseline {:.3f}s".format(command, result["seconds"],
+                                                                      baseline[command]["seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    args = parser.parse_args()
+
+    results = {}
+    for command in COMMANDS:
+        name = " ".join(["Pipeline.py"] + command)
+        results[name] = measure(command, args.repeats)
+        print("{:<25} {:.3f}s {}".format(name, results[name]["seconds"], " ".join(results[name]["heavy_imports"])))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
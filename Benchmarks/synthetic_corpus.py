@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+
+Seeded generator of synthetic lyrics corpora of any size, with the vocabulary statistics of the real lyrics: word
+frequencies, song lengths and release years are learned from lyrics.txt and the Archive/Lyrics files, and each
+synthetic song is drawn from them. Songs have line breaks, section tags such as [Chorus] and a few near-duplicates,
+so that the cleaning and deduplication steps have something to do.
+"""
+
+import glob
+import os
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from Functions import list_conventional_words
+
+
+SECTION_TAGS = ["[Intro]", "[Verse 1]", "[Verse 2]", "[Chorus]", "[Hook]", "[Bridge]", "[Outro]"]
+
+
+def real_lyrics():
+    """
+    Lyrics and release years of the real corpus: lyrics.txt and the song files in Archive/Lyrics/<year>.
+
+    :return: list of (str, int)
+    """
+    songs = []
+    with open(os.path.join(ROOT, "lyrics.txt"), "rb") as infile:
+        df_lyrics = pickle.load(infile).dropna(subset=["Lyrics", "Date"])
+    years = pd.DatetimeIndex(df_lyrics["Date"]).year
+    songs += list(zip(df_lyrics["Lyrics"], years))
+    for path in glob.glob(os.path.join(ROOT, "Archive", "Lyrics", "*", "*.txt")):
+        year = os.path.basename(os.path.dirname(path))
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            songs.append((f.read(), int(year) if year.isdigit() else None))
+    return songs
+
+
+def vocabulary_statistics():
+    """
+    Word frequencies, song lengths (in words), line lengths and release years of the real corpus.
+
+    :return: dict
+    """
+    word_counts = {}
+    song_lengths = []
+    line_lengths = []
+    years = []
+    for lyrics, year in real_lyrics():
+        words = [word for word in list_conventional_words(lyrics) if word]
+        for word in words:
+            word_counts[word] = word_counts.get(word, 0) + 1
+        if words:
+            song_lengths.append(len(words))
+        line_lengths += [len(line.split()) for line in lyrics.split("\n") if line.strip()]
+        if year is not None:
+            years.append(year)
+    words, counts = zip(*sorted(word_counts.items(), key=lambda item: -item[1]))
+    return {"words": np.array(words), "probabilities": np.array(counts) / sum(counts),
+            "song_lengths": np.array(song_lengths), "line_lengths": np.array(line_lengths),
+            "years": np.array(years)}
+
+
+def generate_corpus(n_songs, seed=0, statistics=None, duplicate_fraction=0.02):
+    """
+    Generates a synthetic corpus with the columns of the scraped corpus (Song Title, Date, Lyrics).
+
+    :param n_songs: int
+    :param seed: int
+    :param statistics: dict, as returned by vocabulary_statistics (computed if not given)
+    :param duplicate_fraction: float, fraction of songs which are slightly altered copies of an earlier song
+    :return: pd.DataFrame
+    """
+    return pd.concat(list(iter_corpus_chunks(n_songs, seed, statistics, duplicate_fraction)), ignore_index=True)
+
+
+def iter_corpus_chunks(n_songs, seed=0, statistics=None, duplicate_fraction=0.02, chunk_size=10000):
+    """
+    Same as generate_corpus, one chunk of songs at a time, so that large corpora needn't fit in memory.
+
+    :return: generator of pd.DataFrame
+    """
+    if statistics is None:
+        statistics = vocabulary_statistics()
+    rng = np.random.RandomState(seed)
+    words = statistics["words"]
+    # Drawing words through the cumulative distribution is much faster than rng.choice with p=...
+    cumulative = np.cumsum(statistics["probabilities"])
+    cumulative[-1] = 1.0
+
+    def draw_words(size):
+        return words[np.searchsorted(cumulative, rng.rand(size), side="right")]
+
+    for start in range(0, n_songs, chunk_size):
+        titles, dates, lyrics_list = [], [], []
+        for i in range(start, min(start + chunk_size, n_songs)):
+            if lyrics_list and rng.rand() < duplicate_fraction:
+                # Near-duplicate of a song of this chunk: an alternate version with a few lines changed
+                original = rng.randint(len(lyrics_list))
+                lines = lyrics_list[original].split("\n")
+                for line in rng.randint(len(lines), size=max(1, len(lines) // 20)):
+                    lines[line] = " ".join(draw_words(6))
+                titles.append(titles[original] + " (Alternate Version)")
+                dates.append(dates[original])
+                lyrics_list.append("\n".join(lines))
+                continue
+
+            n_words = int(rng.choice(statistics["song_lengths"]))
+            song_words = draw_words(n_words).tolist()
+            # Draw enough line lengths and tags for the longest possible song, one word per line
+            line_lengths = np.maximum(1, rng.choice(statistics["line_lengths"], size=n_words)).tolist()
+            tags = rng.randint(-9 * len(SECTION_TAGS), len(SECTION_TAGS), size=n_words).tolist()
+            lines = []
+            position = 0
+            for line_length, tag in zip(line_lengths, tags):
+                if position >= n_words:
+                    break
+                if tag >= 0:
+                    lines.append(SECTION_TAGS[tag])
+                lines.append(" ".join(song_words[position:position + line_length]))
+                position += line_length
+            year = int(rng.choice(statistics["years"]))
+            titles.append("Song {}".format(i))
+            dates.append("{}-{:02d}-{:02d}".format(year, rng.randint(1, 13), rng.randint(1, 29)))
+            lyrics_list.append("\n".join(lines))
+        yield pd.DataFrame({"Song Title": titles, "Date": dates, "Lyrics": lyrics_list})
@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import json
+import os
+import pickle
+import re
+import numpy as np
+import pandas as pd
+
+
+# The corpus is stored as an uncompressed Arrow IPC file, which can be memory-mapped: reading a subset of the columns
+# or rows doesn't read (or copy) the rest of the file, and the lyrics are only materialised when converted to pandas
+CORPUS_PATH = "lyrics.arrow"
+PICKLE_CORPUS_PATH = "lyrics.txt"
+
+# The corpus of several artists is partitioned by artist: one corpus file per artist in this directory, each with an
+# Artist column
+ARTISTS_DIRECTORY = "Artists"
+
+
+def add_year_column(df_lyrics):
+    """
+    Adds a Year column derived from the release Date, unless there already is one.
+
+    :param df_lyrics: pd.DataFrame
+    :return: pd.DataFrame
+    """
+    if "Year" not in df_lyrics.columns:
+        df_lyrics = df_lyrics.copy()
+        df_lyrics["Year"] = pd.to_datetime(df_lyrics["Date"], errors="coerce").dt.year.astype("Int16")
+    return df_lyrics
+
+
+def write_corpus(df_lyrics, path=CORPUS_PATH):
+    """
+    Writes a corpus DataFrame (Song Title, Date, Lyrics, ...) to an Arrow IPC file, adding a Year column for
+    filtering. The file is written next to its final location and then moved, so readers never see half a file.
+
+    :param df_lyrics: pd.DataFrame
+    :param path: str
+    :return: None
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(add_year_column(df_lyrics), preserve_index=False)
+    temp_path = path + ".tmp"
+    with pa.OSFile(temp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, path)
+
+
+def compact_frame(df_lyrics):
+    """
+    Converts the columns of a corpus DataFrame to compact dtypes: Arrow-backed strings instead of Python string
+    objects, the release dates (shared by the songs of an album) and artists as categorical columns and the years as
+    int16.
+
+    :param df_lyrics: pd.DataFrame
+    :return: pd.DataFrame
+    """
+    df_lyrics = df_lyrics.copy(deep=False)
+    for column in df_lyrics.columns:
+        dtype = df_lyrics[column].dtype
+        if column in ("Date", "Artist"):
+            df_lyrics[column] = df_lyrics[column].astype("category")
+        elif column == "Year":
+            df_lyrics[column] = df_lyrics[column].astype("int16" if not df_lyrics[column].isna().any() else "Int16")
+        elif dtype == object or (isinstance(dtype, pd.StringDtype) and dtype.storage != "pyarrow"):
+            df_lyrics[column] = df_lyrics[column].astype(string_dtype())
+    return df_lyrics
+
+
+def string_dtype():
+    """
+    Arrow-backed pandas string dtype, with NaN for missing values as the default string dtype of pandas 3.
+
+    :return: pd.StringDtype
+    """
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        # pandas < 2.3
+        return pd.StringDtype("pyarrow")
+
+
+def _open_corpus(path, columns=None, years=None):
+    # Memory-mapped Arrow table of a corpus file. The table's buffers point into the memory map, so it is left open
+    # for as long as they are used
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    if years is not None:
+        first, last = years
+        mask = None
+        if first is not None:
+            mask = pc.greater_equal(table["Year"], first)
+        if last is not None:
+            below = pc.less_equal(table["Year"], last)
+            mask = below if mask is None else pc.and_(mask, below)
+        if mask is not None:
+            table = table.filter(mask)
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+def _table_to_pandas(table, compact):
+    if not compact:
+        return table.to_pandas()
+    import pyarrow as pa
+
+    # Strings are wrapped rather than converted to Python objects, so the lyrics stay in the memory map
+    strings = string_dtype()
+    return compact_frame(table.to_pandas(
+        types_mapper=lambda arrow_type: strings if arrow_type in (pa.string(), pa.large_string()) else None))
+
+
+def read_corpus(path=CORPUS_PATH, columns=None, years=None, compact=False):
+    """
+    Reads a corpus written by write_corpus, memory-mapping the file.
+
+    :param path: str
+    :param columns: list of column names to read (all by default)
+    :param years: (first, last) year range to keep, inclusive; either end can be None
+    :param compact: bool, use the compact dtypes of compact_frame
+    :return: pd.DataFrame
+    """
+    return _table_to_pandas(_open_corpus(path, columns, years), compact)
+
+
+def iter_corpus(path=CORPUS_PATH, columns=None, chunk_size=10000, compact=True):
+    """
+    Reads a corpus chunk by chunk, so that only one chunk of songs is converted to pandas at a time. The index of
+    each chunk continues the previous chunk's.
+
+    :param path: str
+    :param columns: list of column names to read (all by default)
+    :param chunk_size: int, number of songs per chunk
+    :param compact: bool, use the compact dtypes of compact_frame
+    :return: generator of pd.DataFrame
+    """
+    table = _open_corpus(path, columns)
+    for start in range(0, table.num_rows, chunk_size):
+        df_chunk = _table_to_pandas(table.slice(start, chunk_size), compact)
+        df_chunk.index = pd.RangeIndex(start, start + len(df_chunk))
+        yield df_chunk
+
+
+def corpus_nbytes(path=CORPUS_PATH, columns=None):
+    """
+    Size of the columns of a corpus in Arrow format, which is about the memory they take as compact pandas columns.
+    Only the file's metadata is read.
+
+    :param path: str
+    :param columns: list of column names (all by default)
+    :return: int
+    """
+    return _open_corpus(path, columns).nbytes
+
+
+def convert_pickle_corpus(pickle_path=PICKLE_CORPUS_PATH, path=CORPUS_PATH):
+    """
+    One-time conversion of a pickled corpus DataFrame (the old lyrics.txt) to the Arrow corpus format.
+
+    :param pickle_path: str
+    :param path: str
+    :return: None
+    """
+    with open(pickle_path, "rb") as infile:
+        df_lyrics = pickle.load(infile)
+    write_corpus(df_lyrics, path)
+
+
+def load_corpus(path=CORPUS_PATH, pickle_path=PICKLE_CORPUS_PATH, columns=None, years=None, compact=False):
+    """
+    Reads the Arrow corpus, converting it from the pickled corpus first if it doesn't exist yet.
+
+    :param path: str
+    :param pickle_path: str
+    :param columns: list of column names to read (all by default)
+    :param years: (first, last) year range to keep, inclusive
+    :param compact: bool, use the compact dtypes of compact_frame
+    :return: pd.DataFrame
+    """
+    if not os.path.exists(path):
+        convert_pickle_corpus(pickle_path, path)
+    return read_corpus(path, columns, years, compact)
+
+
+def corpus_schema():
+    """
+    Arrow schema of the sharded corpus written by ShardedCorpusWriter.
+
+    :return: pa.Schema
+    """
+    import pyarrow as pa
+
+    return pa.schema([("Song ID", pa.int64()), ("Song Title", pa.string()), ("Date", pa.string()),
+                      ("Lyrics", pa.string()), ("Year", pa.int16())])
+
+
+def shard_paths(directory):
+    """
+    Paths of the shards of a sharded corpus, in the order they were written.
+
+    :param directory: str
+    :return: list of str
+    """
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory))
+            if f.startswith("shard-") and f.endswith(".arrow")]
+
+
+class ShardedCorpusWriter:
+    """
+    Append-only corpus writer for ingestion: song records are buffered and written out as numbered Arrow IPC shards of
+    shard_size songs, so memory use doesn't grow with the number of songs. After each shard, a checkpoint file records
+    the resume state of the song source (e.g. the next page to fetch). An interrupted ingestion reopened on the same
+    directory carries on from the checkpoint, and song_ids tells the source which songs it can skip. Once the source
+    is exhausted, close(complete=True) clears the resume state, so that a later refresh goes through the whole source
+    again (e.g. from page 1, where new songs may sort) and only fetches the songs which aren't stored yet.
+    """
+
+    CHECKPOINT = "checkpoint.json"
+
+    def __init__(self, directory, shard_size=500):
+        """
+        :param directory: str
+        :param shard_size: int, number of songs per shard
+        """
+        self.directory = directory
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+
+        # Shards are written before their checkpoint, so the shards on disk are the source of truth for what's done
+        self.song_ids = set()
+        self.n_shards = 0
+        for path in shard_paths(directory):
+            self.song_ids.update(read_corpus(path, columns=["Song ID"])["Song ID"])
+            self.n_shards += 1
+        self.state = None
+        self.complete = False
+        checkpoint_path = os.path.join(directory, self.CHECKPOINT)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            self.complete = checkpoint.get("complete", False)
+            self.state = None if self.complete else checkpoint["state"]
+        self.buffer = []
+        self.buffer_state = self.state
+
+    def add(self, record, state=None):
+        """
+        Adds a song record; a full buffer is written out as a new shard.
+
+        :param record: dict with 'Song ID', 'Song Title', 'Date' and 'Lyrics'
+        :param state: JSON-serialisable resume state of the source after this song
+        :return: None
+        """
+        if record["Song ID"] in self.song_ids:
+            return
+        self.buffer.append(record)
+        self.song_ids.add(record["Song ID"])
+        self.buffer_state = state
+        self.complete = False
+        if len(self.buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered songs as a new shard, followed by the checkpoint.
+
+        :return: None
+        """
+        if self.buffer:
+            import pyarrow as pa
+
+            df = add_year_column(pd.DataFrame(self.buffer, columns=["Song ID", "Song Title", "Date", "Lyrics"]))
+            table = pa.Table.from_pandas(df, schema=corpus_schema(), preserve_index=False)
+            path = os.path.join(self.directory, "shard-{:06d}.arrow".format(self.n_shards))
+            with pa.OSFile(path + ".tmp", "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(path + ".tmp", path)
+            self.n_shards += 1
+            self.buffer = []
+
+        self.state = self.buffer_state
+        checkpoint_path = os.path.join(self.directory, self.CHECKPOINT)
+        with open(checkpoint_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"state": self.state, "complete": self.complete, "shards": self.n_shards,
+                       "songs": len(self.song_ids)}, f)
+        os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+    def close(self, complete=False):
+        """
+        Writes out the buffered songs and the checkpoint.
+
+        :param complete: bool, the source is exhausted, so the next ingestion starts from its beginning
+        :return: None
+        """
+        if complete:
+            self.buffer_state = None
+            self.complete = True
+        self.flush()
+
+
+def compact_shards(directory, path=CORPUS_PATH, artist=None):
+    """
+    Combines the shards of a sharded corpus into a single corpus file, one record batch at a time.
+
+    :param directory: str
+    :param path: str
+    :param artist: str, added as an Artist column (for a partition of a corpus of several artists)
+    :return: None
+    """
+    import pyarrow as pa
+
+    schema = corpus_schema()
+    if artist is not None:
+        schema = schema.append(pa.field("Artist", pa.string()))
+    temp_path = path + ".tmp"
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pa.OSFile(temp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for shard_path in shard_paths(directory):
+                reader = pa.ipc.open_file(pa.memory_map(shard_path, "r"))
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    if artist is not None:
+                        batch = pa.RecordBatch.from_arrays(batch.columns + [pa.array([artist] * batch.num_rows,
+                                                                                     pa.string())], schema=schema)
+                    writer.write_batch(batch)
+    os.replace(temp_path, path)
+
+
+def artist_slug(artist):
+    """
+    File name of an artist's partition, e.g. kanye-west for Kanye West.
+
+    :param artist: str
+    :return: str
+    """
+    return re.sub(r'[^a-z0-9]+', '-', artist.lower()).strip('-') or "artist"
+
+
+def artist_corpus_path(artist, directory=ARTISTS_DIRECTORY):
+    """
+    :param artist: str
+    :param directory: str, directory of the partitioned corpus
+    :return: str
+    """
+    return os.path.join(directory, artist_slug(artist) + ".arrow")
+
+
+def partition_artist(path):
+    """
+    Artist of a partition of a corpus partitioned by artist, from the first value of its Artist column (only the
+    first record batch with songs is read, from the memory-mapped file).
+
+    :param path: str
+    :return: str, or None if the file has no Artist column or no songs
+    """
+    import pyarrow as pa
+
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    if "Artist" not in reader.schema.names:
+        return None
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        if batch.num_rows:
+            return batch.column("Artist")[0].as_py()
+    return None
+
+
+def artist_corpus_paths(artists, directory=ARTISTS_DIRECTORY):
+    """
+    Paths of the partitions of artists, checking that no two artists share one, among the artists given and those
+    already in the directory (e.g. "AC/DC" and "AC DC" both have the slug ac-dc).
+
+    :param artists: list of str
+    :param directory: str
+    :return: dict of artist -> path
+    """
+    paths = {}
+    owners = {}
+    for artist in artists:
+        path = artist_corpus_path(artist, directory)
+        owner = owners.get(path) or (partition_artist(path) if os.path.exists(path) else None)
+        if owner is not None and owner != artist:
+            raise ValueError("{} and {} would share the partition {}".format(owner, artist, path))
+        owners[path] = artist
+        paths[artist] = path
+    return paths
+
+
+def write_artist_corpora(df_lyrics, directory=ARTISTS_DIRECTORY):
+    """
+    Writes a corpus of several artists partitioned by its Artist column, replacing the partitions of those artists.
+
+    :param df_lyrics: pd.DataFrame with 'Artist', 'Song Title', 'Date' and 'Lyrics'
+    :param directory: str
+    :return: dict of artist -> path
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = artist_corpus_paths(list(df_lyrics["Artist"].unique()), directory)
+    for artist, df_artist in df_lyrics.groupby("Artist", sort=False):
+        write_corpus(df_artist, paths[artist])
+    return paths
+
+
+def artist_corpora(directory=ARTISTS_DIRECTORY):
+    """
+    The partitions of a corpus partitioned by artist, with the artist of each read from its Artist column (or else
+    the file name).
+
+    :param directory: str
+    :return: dict of artist -> path, in order of file name
+    """
+    corpora = {}
+    if not os.path.isdir(directory):
+        return corpora
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".arrow"):
+            continue
+        path = os.path.join(directory, name)
+        corpora[partition_artist(path) or os.path.splitext(name)[0]] = path
+    return corpora
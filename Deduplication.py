@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import zlib
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from Functions import list_conventional_words
+
+
+# Mersenne prime larger than any 32-bit shingle hash, for the universal hash functions (a * x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def lyrics_shingles(text, shingle_size=5):
+    """
+    Set of the hashes of all runs of shingle_size consecutive words of a text (or of the whole text, if it's shorter).
+
+    :param text: str
+    :param shingle_size: int
+    :return: np.array of uint64
+    """
+    words = [word for word in list_conventional_words(text) if word]
+    if len(words) < shingle_size:
+        shingles = {" ".join(words)} if words else set()
+    else:
+        shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    return np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype='uint64')
+
+
+def minhash_signatures(texts, num_perm=128, shingle_size=5, seed=1):
+    """
+    MinHash signature of each text: for each of num_perm random hash functions, the smallest hash of its shingles.
+    The fraction of positions where two signatures agree estimates the Jaccard similarity of the shingle sets.
+
+    :param texts: iterable of str
+    :param num_perm: int
+    :param shingle_size: int
+    :param seed: int
+    :return: np.array of shape (texts, num_perm); texts without words get a row of -1 (never similar)
+    """
+    rng = np.random.RandomState(seed)
+    # Keep a * x below 2^64 (x < 2^32) so the products don't overflow
+    a = rng.randint(1, 1 << 31, size=num_perm).astype('uint64')
+    b = rng.randint(0, 1 << 31, size=num_perm).astype('uint64')
+
+    signatures = []
+    for text in texts:
+        shingles = lyrics_shingles(text, shingle_size)
+        if len(shingles) == 0:
+            signatures.append(np.full(num_perm, -1, dtype='int64'))
+            continue
+        hashes = (np.outer(shingles, a) + b) % MERSENNE_PRIME
+        signatures.append(hashes.min(axis=0).astype('int64'))
+    return np.array(signatures, dtype='int64').reshape(-1, num_perm)
+
+
+def near_duplicate_clusters(signatures, threshold=0.8, bands=32):
+    """
+    Groups texts whose estimated Jaccard similarity is at least threshold, using locality-sensitive hashing: the
+    signatures are cut into bands, and only texts sharing all values of some band are compared, so the work stays
+    roughly linear in the number of texts.
+
+    :param signatures: np.array, as returned by minhash_signatures
+    :param threshold: float
+    :param bands: int, must divide the signature length
+    :return: list of clusters (lists of row positions, in order) with more than one text
+    """
+    n_texts, num_perm = signatures.shape
+    rows = num_perm // bands
+    parent = list(range(n_texts))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    compared = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for i in range(n_texts):
+            if band_values[i, 0] >= 0:
+                buckets[band_values[i].tobytes()].append(i)
+        for members in buckets.values():
+            for j in members[1:]:
+                pair = (members[0], j)
+                if pair in compared:
+                    continue
+                compared.add(pair)
+                if np.mean(signatures[members[0]] == signatures[j]) >= threshold:
+                    parent[find(j)] = find(members[0])
+
+    clusters = defaultdict(list)
+    for i in range(n_texts):
+        clusters[find(i)].append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def deduplicate(df_lyrics, threshold=0.8, num_perm=128, bands=32, shingle_size=5, seed=1):
+    """
+    Drops near-duplicate songs (alternate versions, remixes, retitled re-releases, ...), keeping one song per cluster
+    of near-duplicate lyrics: the one with the shortest title, which is usually the original (e.g. "Stronger" rather
+    than "Stronger (A-Trak Remix)"), or else the first one.
+
+    :param df_lyrics: pd.DataFrame with 'Song Title' and 'Lyrics'
+    :param threshold: float, minimum estimated Jaccard similarity of the lyrics' word shingles
+    :param num_perm: int, MinHash signature length
+    :param bands: int, number of LSH bands
+    :param shingle_size: int, number of words per shingle
+    :param seed: int
+    :return: df_kept: pd.DataFrame, df_dropped: pd.DataFrame with the dropped songs and the song kept instead
+    """
+    signatures = minhash_signatures(df_lyrics["Lyrics"], num_perm, shingle_size, seed)
+    dropped, df_dropped = duplicates(signatures, df_lyrics["Song Title"].to_numpy(), threshold, bands)
+    df_dropped.index = df_lyrics.index[dropped]
+    keep_mask = np.ones(len(df_lyrics), dtype=bool)
+    keep_mask[dropped] = False
+    return df_lyrics[keep_mask], df_dropped
+
+
+def duplicates(signatures, titles, threshold=0.8, bands=32):
+    """
+    The songs dropped by deduplicate, from their MinHash signatures and titles, e.g. collected chunk by chunk from a
+    corpus which doesn't fit in memory.
+
+    :param signatures: np.array, as returned by minhash_signatures
+    :param titles: np.array of str
+    :param threshold: float, minimum estimated Jaccard similarity of the lyrics' word shingles
+    :param bands: int, number of LSH bands
+    :return: dropped: list of row positions, df_dropped: pd.DataFrame with the dropped songs and the song kept instead
+    """
+    clusters = near_duplicate_clusters(signatures, threshold, bands)
+    dropped = []
+    report = []
+    for members in clusters:
+        kept = min(members, key=lambda i: (len(titles[i]), i))
+        for i in members:
+            if i != kept:
+                dropped.append(i)
+                report.append({"Song Title": titles[i], "Kept": titles[kept],
+                               "Similarity": float(np.mean(signatures[i] == signatures[kept]))})
+    return dropped, pd.DataFrame(report, columns=["Song Title", "Kept", "Similarity"])
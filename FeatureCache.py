@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import pandas as pd
+from Functions import lyrics_hash
+from FeatureExtraction import FEATURES, extract_features, feature_columns
+
+
+# Bump this whenever the way features are calculated changes, so that old cache entries are not used anymore
+FEATURE_VERSION = 1
+
+
+def package_version(name):
+    """
+    Installed version of a package, or None if it's not installed.
+
+    :param name: str
+    :return: str
+    """
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def feature_fingerprint(lexicon_paths, stops, features=FEATURES):
+    """
+    Fingerprint of everything other than the lyrics which the features depend on: the contents of the lexicon files,
+    the stopword list, the stemmer and sentiment analyzer versions, and the requested features. Editing a lexicon
+    file therefore gives a new fingerprint.
+
+    :param lexicon_paths: dict of column name -> lexicon file path
+    :param stops: list of str
+    :param features: tuple of feature names
+    :return: str
+    """
+    fingerprint = hashlib.sha1()
+    parts = [FEATURE_VERSION, sorted(features), list(stops), "snowball english ignore_stopwords",
+             package_version("nltk"), package_version("textblob")]
+    fingerprint.update(json.dumps(parts).encode("utf-8"))
+    for name, path in lexicon_paths.items():
+        fingerprint.update(name.encode("utf-8"))
+        with open(path, "rb") as f:
+            fingerprint.update(hashlib.sha1(f.read()).digest())
+    return fingerprint.hexdigest()
+
+
+class FeatureCache:
+    """
+    On-disk cache of per-song features in an SQLite file, keyed by the hash of the cleaned lyrics and the feature
+    fingerprint (see feature_fingerprint). Counts the hits and misses per song looked up by extract_features_cached,
+    so songs with the same lyrics each count.
+    """
+
+    def __init__(self, path, fingerprint):
+        """
+        :param path: str, SQLite file
+        :param fingerprint: str
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Several processes (e.g. one per artist) may share the cache, so a locked database is waited for
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS features "
+                                "(lyrics_hash TEXT, fingerprint TEXT, features TEXT, "
+                                "PRIMARY KEY (lyrics_hash, fingerprint))")
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        """
+        Looks up the features of several songs.
+
+        :param keys: collection of lyrics hashes
+        :return: dict of lyrics hash -> dict of features, only for the keys found
+        """
+        keys = list(keys)
+        found = {}
+        # Stay below SQLite's limit on the number of query parameters
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows = self.connection.execute("SELECT lyrics_hash, features FROM features WHERE fingerprint = ? AND "
+                                           "lyrics_hash IN ({})".format(",".join("?" * len(batch))),
+                                           [self.fingerprint] + batch)
+            found.update((key, json.loads(features)) for key, features in rows)
+        return found
+
+    def put_many(self, items):
+        """
+        Stores the features of several songs.
+
+        :param items: dict of lyrics hash -> dict of features
+        :return: None
+        """
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?)",
+                                        [(key, self.fingerprint, json.dumps(features))
+                                         for key, features in items.items()])
+
+    def prune(self):
+        """
+        Deletes the entries of every other fingerprint, e.g. after a lexicon was edited.
+
+        :return: int, number of entries deleted
+        """
+        with self.connection:
+            return self.connection.execute("DELETE FROM features WHERE fingerprint != ?",
+                                           [self.fingerprint]).rowcount
+
+    def close(self):
+        self.connection.close()
+
+
+def extract_features_cached(df_lyrics, lexicons, stops, cache, features=FEATURES, **kwargs):
+    """
+    Same as FeatureExtraction.extract_features, but only the songs missing from the cache are calculated (once per
+    distinct lyrics) and then added to it. The cache fingerprint must have been made with the same lexicons, stopwords
+    and features.
+
+    :param df_lyrics: pd.DataFrame with a 'Lyrics' column
+    :param lexicons: dict of column name -> lexicon pd.DataFrame
+    :param stops: list of str
+    :param cache: FeatureCache
+    :param features: tuple of feature names
+    :param kwargs: passed on to extract_features
+    :return: pd.DataFrame with the same index as df_lyrics
+    """
+    keys = [lyrics_hash(lyrics) for lyrics in df_lyrics["Lyrics"]]
+    found = cache.get_many(set(keys))
+    hits = sum(key in found for key in keys)
+    cache.hits += hits
+    cache.misses += len(keys) - hits
+
+    # Calculate each missing lyrics once, even if it appears several times
+    missing = {}
+    for i, key in enumerate(keys):
+        if key not in found and key not in missing:
+            missing[key] = i
+    if missing:
+        df_missing = extract_features(df_lyrics.iloc[list(missing.values())], lexicons, stops, features, **kwargs)
+        computed = dict(zip(missing, df_missing.to_dict(orient="records")))
+        cache.put_many(computed)
+        found.update(computed)
+
+    df = pd.DataFrame([found[key] for key in keys], index=df_lyrics.index,
+                      columns=feature_columns(lexicons, features))
+    return df
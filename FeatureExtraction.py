@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from Functions import LexiconMatcher, get_lexical_density, get_lyrics_sentiment_series, make_conventional_bow
+
+
+# Features calculated by default; "BoW" (the stemmed bag of words of each song) can be requested as well
+FEATURES = ("Lexicons", "Lexical density", "Sentiment")
+
+# Read-only state of the current process, set once by init_worker
+_worker_state = {}
+
+
+def init_worker(lexicons, stops):
+    """
+    Builds the state shared by all chunks of a worker: the compiled lexicon matcher and the stopword set.
+
+    :param lexicons: dict of column name -> lexicon pd.DataFrame
+    :param stops: list of str
+    :return: None
+    """
+    _worker_state["lexicon_names"] = list(lexicons)
+    _worker_state["matcher"] = LexiconMatcher(list(lexicons.values()))
+    _worker_state["stops"] = set(stops)
+
+
+def feature_columns(lexicons, features=FEATURES):
+    """
+    Columns of the features returned by extract_chunk and extract_features, in their order.
+
+    :param lexicons: dict of column name -> lexicon pd.DataFrame (or just the column names)
+    :param features: tuple of feature names, see FEATURES (and "BoW")
+    :return: list of str
+    """
+    columns = list(lexicons) if "Lexicons" in features else []
+    return columns + [feature for feature in ("Lexical density", "BoW", "Sentiment") if feature in features]
+
+
+def extract_chunk(lyrics_list, features=FEATURES):
+    """
+    Calculates the features of a chunk of songs with the state set by init_worker.
+
+    :param lyrics_list: list of str
+    :param features: tuple of feature names, see FEATURES (and "BoW")
+    :return: dict of column name -> np.array
+    """
+    columns = {}
+    if "Lexicons" in features:
+        matcher = _worker_state["matcher"]
+        counts = matcher.split(matcher.count_series(lyrics_list))
+        for name, lexicon_counts in zip(_worker_state["lexicon_names"], counts):
+            columns[name] = lexicon_counts.sum(axis=1)
+    if "Lexical density" in features:
+        stops = _worker_state["stops"]
+        columns["Lexical density"] = np.array([get_lexical_density(lyrics, stops) for lyrics in lyrics_list],
+                                              dtype='float64')
+    if "BoW" in features:
+        columns["BoW"] = np.empty(len(lyrics_list), dtype=object)
+        columns["BoW"][:] = [make_conventional_bow(lyrics) for lyrics in lyrics_list]
+    if "Sentiment" in features:
+        columns["Sentiment"] = get_lyrics_sentiment_series(lyrics_list).to_numpy()
+    return columns
+
+
+def extract_features(df_lyrics, lexicons, stops, features=FEATURES, n_workers=None, chunk_size=None,
+                     mp_context=None):
+    """
+    Calculates the per-song features of a corpus: the total count of each lexicon, lexical density and sentiment.
+
+    The songs are split into chunks which are processed by a pool of worker processes, each initialised once with
+    the lexicons and stopwords, and the results are put back together in the original order. With n_workers=1
+    everything runs in this process, with exactly the same results.
+
+    :param df_lyrics: pd.DataFrame with a 'Lyrics' column
+    :param lexicons: dict of column name -> lexicon pd.DataFrame, e.g. {"I-words": lexiconI}
+    :param stops: list of str
+    :param features: tuple of feature names, see FEATURES
+    :param n_workers: int, number of worker processes (defaults to the number of CPUs)
+    :param chunk_size: int, number of songs per chunk (defaults to about four chunks per worker)
+    :param mp_context: multiprocessing context for the pool
+    :return: pd.DataFrame with the same index as df_lyrics
+    """
+    lyrics_list = list(df_lyrics["Lyrics"])
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(lyrics_list) // (4 * n_workers)))
+    chunks = [lyrics_list[i:i + chunk_size] for i in range(0, len(lyrics_list), chunk_size)]
+
+    if n_workers == 1 or len(chunks) <= 1:
+        init_worker(lexicons, stops)
+        results = [extract_chunk(chunk, features) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context, initializer=init_worker,
+                                 initargs=(lexicons, stops)) as executor:
+            results = list(executor.map(extract_chunk, chunks, [features] * len(chunks)))
+
+    if not results:
+        init_worker(lexicons, stops)
+        results = [extract_chunk([], features)]
+    df = pd.DataFrame({column: np.concatenate([result[column] for result in results])
+                       for column in results[0]}, index=df_lyrics.index)
+    return df
+
+
+def default_workers():
+    """
+    Number of workers to use from a plain script: all CPUs with the fork start method, otherwise 1, since with
+    spawn the workers would re-run a script that has no __main__ guard.
+
+    :return: int
+    """
+    if multiprocessing.get_start_method() == 'fork':
+        return os.cpu_count() or 1
+    return 1
@@ -7,10 +7,19 @@ Created in November 2020
 
 import numpy as np
 import pandas as pd
+import hashlib
+import os
 import re
-from nltk.stem.snowball import SnowballStemmer
-from textblob import TextBlob
-import matplotlib.pyplot as plt
+from collections import Counter, namedtuple, OrderedDict
+# The regex parser, which LexiconMatcher and LexiconProfile use to analyse the lexicon patterns
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+# nltk, TextBlob and matplotlib are slow to import, so they are only imported by the functions using them
 
 
 def count_patterns_string(pattern_list, string):
@@ -35,22 +44,284 @@ def count_patterns_series(pattern_list, series):
 
     :param pattern_list: list
     :param series: pd.Series
-    :return: match_counts: pd.Series
+    :return: match_counts: np.array
+    """
+    return count_patterns(pattern_list, series)
+
+
+SparseMatchCounts = namedtuple('SparseMatchCounts', ['matrix', 'labels', 'index'])
+SparseMatchCounts.__doc__ = """
+Sparse pattern counts: a scipy.sparse CSR matrix of shape (texts, patterns), the pattern labels for its columns
+(or None if unknown) and the index of the texts for its rows.
+"""
+
+
+def count_patterns(patterns, texts, sparse=False, labels=None):
+    """
+    Counts occurrences of each pattern in each text, in a single pass over the texts.
+
+    The texts can be a series or any iterable of strings, including a generator. With sparse=True only the
+    non-zero counts are kept and a SparseMatchCounts is returned instead of a dense array, so memory grows with the
+    number of hits rather than with texts x patterns.
+
+    :param patterns: list of compiled regex patterns, or a LexiconMatcher
+    :param texts: pd.Series or iterable of str
+    :param sparse: bool
+    :param labels: list, column labels for the sparse result (defaults to the LexiconMatcher labels)
+    :return: match_counts: np.array, or SparseMatchCounts if sparse
+    """
+    if isinstance(patterns, LexiconMatcher):
+        count_string = patterns.count_string
+        n_patterns = len(patterns.patterns)
+        if labels is None:
+            labels = patterns.labels
+    else:
+        def count_string(string):
+            return count_patterns_string(patterns, string)
+        n_patterns = len(patterns)
+
+    if isinstance(texts, pd.Series):
+        index = texts.index
+    else:
+        index = None
+
+    if not sparse:
+        if index is not None:
+            match_counts = np.zeros((len(texts), n_patterns), dtype='int64')
+            for i, string in enumerate(texts):
+                match_counts[i, :] = count_string(string)
+            return match_counts
+        rows = [count_string(string) for string in texts]
+        return np.array(rows, dtype='int64').reshape(len(rows), n_patterns)
+
+    from scipy.sparse import csr_matrix
+
+    # Build the CSR arrays directly, one row at a time
+    data = []
+    indices = []
+    indptr = [0]
+    for string in texts:
+        matches = count_string(string)
+        hit_columns = np.flatnonzero(matches)
+        data.append(matches[hit_columns])
+        indices.append(hit_columns)
+        indptr.append(indptr[-1] + len(hit_columns))
+
+    n_rows = len(indptr) - 1
+    data = np.concatenate(data) if data else np.zeros(0, dtype='int64')
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype='int64')
+    matrix = csr_matrix((data, indices, np.array(indptr)), shape=(n_rows, n_patterns), dtype='int64')
+    if index is None:
+        index = pd.RangeIndex(n_rows)
+
+    return SparseMatchCounts(matrix, None if labels is None else list(labels), index)
+
+
+# The only characters besides A-Z which re.IGNORECASE matches to an ASCII letter
+IGNORECASE_FOLD = str.maketrans({"İ": "i", "ı": "i", "ſ": "s", "K": "k"})
+
+
+def word_pattern(pattern, flags=0):
+    r"""
+    Splits a pattern which matches whole words of ASCII letters, such as \bmy\b, \bi'm\b, \bnumber one\b or
+    \bgreat\w{0,}\b, into its words and the separators between them, and the number of word characters it allows
+    after the last word.
+
+    :param pattern: str
+    :param flags: int
+    :return: (parts, suffix): tuple of words and separators, alternately (lower-cased with re.IGNORECASE), and the
+             (min, max) number of word characters after the last word (max None if unbounded); or None if the
+             pattern isn't of that form
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return None
+    # Inline flags such as (?i) or (?a) would change what the words match
+    items = list(parsed)
+    if parsed.state.flags != sre_parse.parse('', flags).state.flags or len(items) < 3:
+        return None
+    boundary = (sre_constants.AT, sre_constants.AT_BOUNDARY)
+    if items[0] != boundary or items[-1] != boundary:
+        return None
+
+    items = items[1:-1]
+    suffix = (0, 0)
+    op, av = items[-1]
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and \
+            list(av[2]) == [(sre_constants.IN, [(sre_constants.CATEGORY, sre_constants.CATEGORY_WORD)])]:
+        suffix = (av[0], None if av[1] == sre_constants.MAXREPEAT else av[1])
+        items = items[:-1]
+    if not items or any(op is not sre_constants.LITERAL or av > 127 for op, av in items):
+        return None
+
+    literal = ''.join(chr(av) for op, av in items)
+    if flags & re.IGNORECASE:
+        literal = literal.lower()
+    parts = tuple(re.split(r'([^A-Za-z0-9_]+)', literal))
+    if not parts[0] or not parts[-1]:
+        return None
+    return parts, suffix
+
+
+class LexiconMatcher:
+    r"""
+    Counts the patterns of one or more lexicons in each string from a single scan of its words.
+
+    Most lexicon patterns match whole words, e.g. \bmy\b, \bgreat\w{0,}\b or \bnumber one\b (see word_pattern). The
+    words of a string are split out once and counted, and the distinct words are looked up in a dict of the words of
+    all patterns and of the prefixes of the \w{0,} patterns, so the cost grows with the words and hits rather than
+    with the number of patterns. Patterns of several words are looked up among the runs of as many words. A word can
+    match several patterns (e.g. "greatest" both \bgreatest\b and \bgreat\w{0,}\b), and each of them counts it, as
+    with findall once per pattern.
+
+    All other patterns are counted with findall, one by one, as are the patterns of several words which can overlap
+    themselves (e.g. \bha ha\b in "ha ha ha", which findall counts once) or end in \w{0,}, which are only scanned in
+    the strings containing their first word.
     """
-    match_counts = np.zeros((len(series), len(pattern_list)), dtype='int64')
-    indexes = list(series.index)
-    for idx in indexes:
-        string = series[idx]
-        matches = count_patterns_string(pattern_list, string)
-        match_counts[indexes.index(idx), :] = matches
 
-    return match_counts
+    def __init__(self, lexicon_dfs, flags=re.IGNORECASE):
+        """
+        :param lexicon_dfs: list of pd.DataFrame, each with 'Label' and 'Regex' columns
+        :param flags: int, regex flags applied to every pattern
+        """
+        self.lexicon_dfs = list(lexicon_dfs)
+        self.patterns = [pattern for lexicon_df in self.lexicon_dfs for pattern in lexicon_df['Regex']]
+        self.labels = [label for lexicon_df in self.lexicon_dfs for label in lexicon_df['Label']]
+        self.flags = flags
+
+        # Column ranges of each lexicon in the combined count array
+        self.slices = []
+        start = 0
+        for lexicon_df in self.lexicon_dfs:
+            self.slices.append(slice(start, start + len(lexicon_df)))
+            start += len(lexicon_df)
+
+        self.pattern_list = [re.compile(pattern, flags) for pattern in self.patterns]
+        self.word_regex = re.compile(r'(\w+)', flags)
+        # word -> indices of the patterns of that word
+        self.words = {}
+        # prefix length -> prefix -> (index, min, max) of the patterns of a word followed by \w{min,max}
+        self.prefixes = {}
+        # number of words -> words and separators -> indices of the patterns of several words, and their first words
+        self.phrases = {}
+        self.phrase_starts = set()
+        # first word -> indices of the patterns of several words counted with findall
+        self.scanned = {}
+        # Indices of the patterns counted with findall in every string
+        self.separate = []
+        for i, pattern in enumerate(self.patterns):
+            split = word_pattern(pattern, flags)
+            if split is None:
+                self.separate.append(i)
+                continue
+            parts, (low, high) = split
+            if len(parts) == 1 and high == 0:
+                self.words.setdefault(parts[0], []).append(i)
+            elif len(parts) == 1:
+                self.prefixes.setdefault(len(parts[0]), {}).setdefault(parts[0], []).append((i, low, high))
+            elif high == 0 and not any(parts[2 * n:] == parts[:-2 * n] for n in range(1, len(parts) // 2 + 1)):
+                self.phrases.setdefault(len(parts) // 2 + 1, {}).setdefault(parts, []).append(i)
+                self.phrase_starts.add(parts[0])
+            else:
+                self.scanned.setdefault(parts[0], []).append(i)
+
+    def string_words(self, string):
+        """
+        The words of a string, folded like re.IGNORECASE folds them to ASCII letters, and the separators between them.
+
+        :param string: str
+        :return: words: list of str, separators: list of str
+        """
+        ignore_case = self.flags & re.IGNORECASE
+        if ignore_case and string.isascii():
+            string = string.lower()
+        parts = self.word_regex.split(string)
+        words = parts[1::2]
+        if ignore_case and not string.isascii() and words:
+            # Lower-casing could change which characters are word characters, so the words are split out first
+            words = '\n'.join(words).translate(IGNORECASE_FOLD).lower().split('\n')
+        return words, parts[2:-1:2]
+
+    def count_string(self, string):
+        """
+        Counts the occurrence of each pattern of each lexicon in the string.
+
+        :param string: str
+        :return: match_count: np.array of all lexicons' counts, in lexicon order
+        """
+        match_count = np.zeros(len(self.patterns), dtype='int64')
+        for i in self.separate:
+            match_count[i] = len(self.pattern_list[i].findall(string))
+        if len(self.separate) == len(self.patterns):
+            return match_count
+
+        words, separators = self.string_words(string)
+        word_counts = Counter(words)
+        for word in word_counts.keys() & self.words.keys():
+            for i in self.words[word]:
+                match_count[i] += word_counts[word]
+        if self.prefixes:
+            for word, count in word_counts.items():
+                for length, prefixes in self.prefixes.items():
+                    if len(word) < length or word[:length] not in prefixes:
+                        continue
+                    for i, low, high in prefixes[word[:length]]:
+                        if low <= len(word) - length and (high is None or len(word) - length <= high):
+                            match_count[i] += count
+        if not self.phrase_starts.isdisjoint(word_counts.keys()):
+            for n_words, phrases in self.phrases.items():
+                # Runs of n_words words with their separators, e.g. ('number', ' ', 'one')
+                runs = Counter(zip(*[separators[j // 2:] if j % 2 else words[j // 2:] for j in range(2 * n_words - 1)]))
+                for run in runs.keys() & phrases.keys():
+                    for i in phrases[run]:
+                        match_count[i] += runs[run]
+        for word in word_counts.keys() & self.scanned.keys():
+            for i in self.scanned[word]:
+                match_count[i] = len(self.pattern_list[i].findall(string))
+
+        return match_count
+
+    def count_series(self, series):
+        """
+        Counts occurrences of each pattern of each lexicon in each string of a series.
+
+        :param series: pd.Series or iterable of str
+        :return: match_counts: np.array of shape (len(series), number of patterns)
+        """
+        return count_patterns(self, series)
+
+    def split(self, count_match_array):
+        """
+        Splits a combined count array into one array per lexicon, in the order the lexicons were given.
+
+        :param count_match_array: np.array or SparseMatchCounts
+        :return: list of np.array or SparseMatchCounts
+        """
+        if isinstance(count_match_array, SparseMatchCounts):
+            return [SparseMatchCounts(count_match_array.matrix[:, s],
+                                      None if count_match_array.labels is None else count_match_array.labels[s],
+                                      count_match_array.index)
+                    for s in self.slices]
+        return [count_match_array[:, s] for s in self.slices]
 
 
 def df_pattern_matches(corpus_index_df, count_match_array, lexicon_df):
-    """"""
+    """
+    Puts pattern counts into a DataFrame with the corpus index as rows and the lexicon labels as columns.
+    Sparse counts (SparseMatchCounts or a scipy.sparse matrix) give a sparse DataFrame, without densifying.
+
+    :param corpus_index_df: pd.DataFrame
+    :param count_match_array: np.array, SparseMatchCounts or scipy.sparse matrix
+    :param lexicon_df: pd.DataFrame
+    :return: df: pd.DataFrame
+    """
 
     p = list(lexicon_df['Label'])
+    if isinstance(count_match_array, SparseMatchCounts):
+        count_match_array = count_match_array.matrix
+    if hasattr(count_match_array, 'tocoo'):
+        return pd.DataFrame.sparse.from_spmatrix(count_match_array, index=corpus_index_df.index, columns=p)
     df = pd.DataFrame(count_match_array, index=corpus_index_df.index, columns=p)
     return df
 
@@ -66,6 +337,109 @@ def list_conventional_words(text):
     return conventional_words_pattern.findall(text.lower())
 
 
+# Process-wide stemmer and LRU cache of surface form -> stem, shared by every caller of stem_word
+_stemmer = None
+_stem_cache = OrderedDict()
+stem_cache_size = 100000
+
+
+def get_stemmer():
+    """
+    Returns the shared English Snowball stemmer (ignoring stopwords), creating it on first use.
+
+    :return: SnowballStemmer
+    """
+    global _stemmer
+    if _stemmer is None:
+        from nltk.stem.snowball import SnowballStemmer
+        _stemmer = SnowballStemmer("english", ignore_stopwords=True)
+    return _stemmer
+
+
+def stem_word(word):
+    """
+    Stems a word with the shared stemmer, remembering the result. Once the cache holds stem_cache_size words, the
+    least recently used one is evicted.
+
+    :param word: str
+    :return: str
+    """
+    word_stem = _stem_cache.get(word)
+    if word_stem is not None:
+        _stem_cache.move_to_end(word)
+        return word_stem
+    word_stem = get_stemmer().stem(word)
+    _stem_cache[word] = word_stem
+    if len(_stem_cache) > stem_cache_size:
+        _stem_cache.popitem(last=False)
+    return word_stem
+
+
+def set_stem_cache_size(size):
+    """
+    Changes the maximum number of cached stems, evicting the least recently used ones if needed.
+
+    :param size: int
+    :return: None
+    """
+    global stem_cache_size
+    stem_cache_size = size
+    while len(_stem_cache) > stem_cache_size:
+        _stem_cache.popitem(last=False)
+
+
+def clear_stem_cache():
+    """
+    Empties the stem cache.
+
+    :return: None
+    """
+    _stem_cache.clear()
+
+
+def save_stem_cache(path):
+    """
+    Saves the learned surface form -> stem table as a tab-separated file. The first line records the nltk version,
+    since a different stemmer version may stem differently.
+
+    :param path: str
+    :return: None
+    """
+    import nltk
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written next to the file and then moved, so that processes sharing the file never read half of it
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("# nltk {}\n".format(nltk.__version__))
+        for word, word_stem in _stem_cache.items():
+            f.write("{}\t{}\n".format(word, word_stem))
+    os.replace(temp_path, path)
+
+
+def load_stem_cache(path):
+    """
+    Loads a table saved by save_stem_cache into the stem cache. Missing files and tables saved with another nltk
+    version are ignored.
+
+    :param path: str
+    :return: int, number of stems loaded
+    """
+    import nltk
+    if not os.path.exists(path):
+        return 0
+    loaded = 0
+    with open(path, "r", encoding="utf-8") as f:
+        if f.readline().rstrip("\n") != "# nltk {}".format(nltk.__version__):
+            return 0
+        for line in f:
+            word, word_stem = line.rstrip("\n").split("\t")
+            _stem_cache[word] = word_stem
+            loaded += 1
+    set_stem_cache_size(stem_cache_size)
+    return loaded
+
+
 def make_conventional_bow(text):
     """
     Makes a bag of words of all stemmed conventional words in a file.
@@ -75,13 +449,28 @@ def make_conventional_bow(text):
     """
     text_words = list_conventional_words(text)
     bow = {}
-    stemmer = SnowballStemmer("english", ignore_stopwords=True)
     for word in text_words:
-        word_stem = stemmer.stem(word)
+        word_stem = stem_word(word)
         bow[word_stem] = bow.get(word_stem, 0) + 1
     return bow
 
 
+def get_lexical_density(text, stops):
+    """
+    Calculates the lexical density of a text, i.e. the percentage of its (stemmed) words which are not stopwords.
+
+    :param text: str
+    :param stops: set of str
+    :return: float
+    """
+    bow = make_conventional_bow(text)
+    total_words = sum(bow.values())
+    if total_words == 0:
+        return 0
+    non_stop_words = sum(count for word_stem, count in bow.items() if word_stem not in stops)
+    return (non_stop_words/total_words)*100
+
+
 def get_lyrics_sentiment(song_lyrics):
     """
     Given some text, calculate its polarity score using TextBlob.
@@ -90,10 +479,58 @@ def get_lyrics_sentiment(song_lyrics):
     :param song_lyrics: string
     :return: TextBlob.sentiment.polarity
     """
+    from textblob import TextBlob
     analysis = TextBlob(song_lyrics)
     return analysis.sentiment.polarity
 
 
+# Shared TextBlob sentiment analyzer and LRU cache of lyrics hash -> polarity
+_sentiment_analyzer = None
+_sentiment_cache = OrderedDict()
+sentiment_cache_size = 100000
+
+
+def lyrics_hash(text):
+    """
+    Content hash of a text, used as cache key.
+
+    :param text: str
+    :return: str
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def get_lyrics_sentiment_series(lyrics_series):
+    """
+    Given a series of texts, calculate the polarity score of each using TextBlob's default (pattern) analyzer.
+    The analyzer is created once and reused across calls, and the scores are cached by content hash, so that
+    duplicate lyrics and lyrics scored before cost nothing. Gives the same scores as get_lyrics_sentiment.
+
+    :param lyrics_series: pd.Series or iterable of str
+    :return: pd.Series of polarity scores, with the same index as lyrics_series
+    """
+    global _sentiment_analyzer
+    if _sentiment_analyzer is None:
+        from textblob.en.sentiments import PatternAnalyzer
+        _sentiment_analyzer = PatternAnalyzer()
+
+    polarity = []
+    for song_lyrics in lyrics_series:
+        key = lyrics_hash(song_lyrics)
+        score = _sentiment_cache.get(key)
+        if score is None:
+            score = _sentiment_analyzer.analyze(song_lyrics).polarity
+            _sentiment_cache[key] = score
+            if len(_sentiment_cache) > sentiment_cache_size:
+                _sentiment_cache.popitem(last=False)
+        else:
+            _sentiment_cache.move_to_end(key)
+        polarity.append(score)
+
+    index = lyrics_series.index if isinstance(lyrics_series, pd.Series) else None
+    return pd.Series(polarity, index=index, dtype='float64')
+
+
 def plot_cloud(word_cloud):
     """
     Given a WordCloud object, plots it.
@@ -101,6 +538,7 @@ def plot_cloud(word_cloud):
     :param word_cloud: WordCloud
     :return: None
     """
+    import matplotlib.pyplot as plt
     # Set size
     plt.figure(figsize=(40, 30))
     # Display image with no axis
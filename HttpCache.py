@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+class CacheMiss(Exception):
+    """
+    Raised in replay mode when a response isn't in the cache.
+    """
+
+
+def request_key(url, params=None):
+    """
+    Cache key of a request: hash of the URL and its (sorted) query parameters.
+
+    :param url: str
+    :param params: dict
+    :return: str
+    """
+    return hashlib.sha1(json.dumps([url, sorted((params or {}).items())], default=str).encode("utf-8")).hexdigest()
+
+
+def body_hash(body):
+    """
+    Key of a response body in the cache of parsing results.
+
+    :param body: str, a response body
+    :return: str
+    """
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+# Fraction of max_bytes which the responses take after an eviction
+EVICT_TO = 0.9
+
+
+class ResponseCache:
+    """
+    On-disk cache of HTTP responses in an SQLite file, keyed by URL and query parameters, plus a cache of the results
+    of parsing them, keyed by the hash of the response body and the parser name.
+
+    Responses older than ttl seconds are fetched again, and once the responses take more than max_bytes the least
+    recently used ones are evicted, down to EVICT_TO of max_bytes so that eviction runs only now and then, along with
+    the parsing results of bodies which are no longer cached. In replay mode the cache never expires and is the only
+    source of responses: requests which aren't in it raise CacheMiss, so a whole ingestion can be rerun without
+    network access.
+    """
+
+    def __init__(self, path, ttl=None, max_bytes=None, replay=False):
+        """
+        :param path: str, SQLite file
+        :param ttl: float, seconds a response stays fresh (forever by default)
+        :param max_bytes: int, maximum total size of the cached responses (unlimited by default)
+        :param replay: bool
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, url TEXT, body TEXT, "
+                                "size INTEGER, stored_at REAL, used_at REAL)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS parsed (body_hash TEXT, parser TEXT, result TEXT, "
+                                "PRIMARY KEY (body_hash, parser))")
+        # Caches made before body hashes were stored get the column, empty for their responses
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(responses)")]
+        if "body_hash" not in columns:
+            self.connection.execute("ALTER TABLE responses ADD COLUMN body_hash TEXT")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_body_hash ON responses (body_hash)")
+        self.connection.commit()
+        # Running total of the response sizes, so that a put doesn't add them all up
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url, params=None):
+        """
+        Cached response body of a request, or None if it isn't cached or is stale.
+
+        :param url: str
+        :param params: dict
+        :return: str
+        """
+        key = request_key(url, params)
+        row = self.connection.execute("SELECT body, stored_at FROM responses WHERE key = ?", [key]).fetchone()
+        now = time.time()
+        if row is None or (not self.replay and self.ttl is not None and now - row[1] > self.ttl):
+            self.misses += 1
+            if self.replay:
+                raise CacheMiss("{} is not in the response cache".format(url))
+            return None
+        self.hits += 1
+        with self.connection:
+            self.connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", [now, key])
+        return row[0]
+
+    def put(self, url, params, body):
+        """
+        Stores a response body, then evicts the least recently used responses if the cache is too big.
+
+        :param url: str
+        :param params: dict
+        :param body: str
+        :return: None
+        """
+        key = request_key(url, params)
+        size = len(body.encode("utf-8"))
+        now = time.time()
+        old = self.connection.execute("SELECT size FROM responses WHERE key = ?", [key]).fetchone()
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO responses (key, url, body, size, stored_at, used_at, "
+                                    "body_hash) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    [key, url, body, size, now, now, body_hash(body)])
+        self.total_bytes += size - (old[0] if old else 0)
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def evict(self, max_bytes):
+        """
+        Deletes the least recently used responses until they take at most max_bytes, and the parsing results of the
+        bodies which are no longer cached.
+
+        :param max_bytes: int
+        :return: int, number of responses deleted
+        """
+        # Recounted, as other processes sharing the cache may have added or evicted responses
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        deleted = []
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY used_at"):
+            if total <= max_bytes:
+                break
+            deleted.append((key,))
+            total -= size
+        with self.connection:
+            self.connection.executemany("DELETE FROM responses WHERE key = ?", deleted)
+        self.total_bytes = total
+        self.prune_parsed()
+        return len(deleted)
+
+    def prune_parsed(self):
+        """
+        Deletes the parsing results of the bodies which are no longer cached, e.g. evicted or changed pages.
+
+        :return: int, number of results deleted
+        """
+        with self.connection:
+            return self.connection.execute("DELETE FROM parsed WHERE NOT EXISTS (SELECT 1 FROM responses "
+                                           "WHERE responses.body_hash = parsed.body_hash)").rowcount
+
+    def parsed(self, body, parser, parse):
+        """
+        Result of parsing a response body, taken from the cache if this body was parsed before by the same parser.
+
+        :param body: str
+        :param parser: str, name (and version) of the parser
+        :param parse: function of the body returning a JSON-serialisable result
+        :return: result of parse(body)
+        """
+        key = body_hash(body)
+        row = self.connection.execute("SELECT result FROM parsed WHERE body_hash = ? AND parser = ?",
+                                      [key, parser]).fetchone()
+        if row is not None:
+            return json.loads(row[0])
+        result = parse(body)
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO parsed VALUES (?, ?, ?)", [key, parser, json.dumps(result)])
+        return result
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+from CorpusStore import ShardedCorpusWriter, compact_shards, CORPUS_PATH
+
+
+# A song source has a songs(state, skip_ids) method, which yields (record, state) pairs: a song record with 'Song ID',
+# 'Song Title', 'Date' and 'Lyrics', and the JSON-serialisable state from which the source can resume after that
+# song. skip_ids holds the ids of songs which are already stored, so the source doesn't have to fetch their lyrics.
+
+
+class LocalSongSource:
+    """
+    Songs from a list of song records, e.g. a fake Genius for tests or songs read from files. The resume state is the
+    position in the list.
+    """
+
+    def __init__(self, records):
+        """
+        :param records: list of dict with 'Song ID', 'Song Title', 'Date' and 'Lyrics'
+        """
+        self.records = records
+
+    def songs(self, state=None, skip_ids=()):
+        start = state["position"] if state else 0
+        for position in range(start, len(self.records)):
+            record = self.records[position]
+            if record["Song ID"] not in skip_ids:
+                yield record, {"position": position + 1}
+
+
+def release_date(song_info):
+    """
+    Release date of a song from the Genius API as 'YYYY-MM-DD' (or shorter if the day or month is unknown), or None.
+
+    :param song_info: dict
+    :return: str
+    """
+    if song_info.get("release_date"):
+        return song_info["release_date"]
+    components = song_info.get("release_date_components")
+    if not components or not components.get("year"):
+        return None
+    parts = [str(components["year"])] + ["{:02d}".format(components[k]) for k in ("month", "day") if components.get(k)]
+    return "-".join(parts)
+
+
+def ingest(source, directory, shard_size=500, corpus_path=CORPUS_PATH):
+    """
+    Streams the songs of a source into a sharded corpus, resuming from its checkpoint if there is one, and then
+    combines the shards into the corpus file. After a complete ingestion, the next one refreshes the corpus: it goes
+    through the whole source again and only adds the songs which are new.
+
+    :param source: song source, e.g. LocalSongSource (see LyricsFetch.ingest_async for GeniusAsyncSource)
+    :param directory: str, directory of the sharded corpus
+    :param shard_size: int, number of songs per shard (and between checkpoints)
+    :param corpus_path: str, or None to keep only the shards
+    :return: int, number of songs in the corpus
+    """
+    writer = ShardedCorpusWriter(directory, shard_size)
+    complete = False
+    try:
+        for record, state in source.songs(writer.state, writer.song_ids):
+            writer.add(record, state)
+        complete = True
+    finally:
+        # Also on an interruption, so that the songs fetched so far are kept
+        writer.close(complete)
+    if corpus_path is not None:
+        compact_shards(directory, corpus_path)
+    return len(writer.song_ids)
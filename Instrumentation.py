@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak RSS isn't recorded
+    resource = None
+
+
+# The current tracer, or None while instrumentation is disabled (the default). When disabled, stage() hands out
+# one shared no-op context manager and begin()/end() return straight away, and no function is wrapped
+_tracer = None
+_null_stage = contextlib.nullcontext()
+
+
+def peak_rss():
+    """
+    Peak resident set size of this process so far, in bytes (None where unknown).
+
+    :return: int
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Tracer:
+    """
+    Records the wall time, CPU time, peak RSS and (optionally) tracemalloc current/peak memory of nested stages, and
+    the number of calls and total time of wrapped functions.
+    """
+
+    def __init__(self, trace_malloc=False):
+        self.trace_malloc = trace_malloc
+        self.origin = time.perf_counter()
+        self.stages = []
+        self.stack = []
+        self.functions = {}
+        self.wrapped = []
+        # tracemalloc may already be running, e.g. with python -X tracemalloc, and is then left running by disable
+        self.started_malloc = trace_malloc and not tracemalloc.is_tracing()
+        if self.started_malloc:
+            tracemalloc.start()
+
+    def begin(self, name):
+        record = {"name": name, "depth": len(self.stack), "start": time.perf_counter() - self.origin,
+                  "cpu_start": time.process_time(), "peak_rss_start": peak_rss()}
+        if self.trace_malloc:
+            current, peak = tracemalloc.get_traced_memory()
+            # Remember the peak so far for the enclosing stage, since it is reset for this one
+            if self.stack:
+                self.stack[-1]["malloc_peak_seen"] = max(self.stack[-1]["malloc_peak_seen"], peak)
+            tracemalloc.reset_peak()
+            record["malloc_start"] = current
+            record["malloc_peak_seen"] = current
+        self.stack.append(record)
+
+    def end(self):
+        record = self.stack.pop()
+        record["wall_seconds"] = time.perf_counter() - self.origin - record["start"]
+        record["cpu_seconds"] = time.process_time() - record.pop("cpu_start")
+        record["peak_rss"] = peak_rss()
+        if self.trace_malloc:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, record.pop("malloc_peak_seen"))
+            start = record.pop("malloc_start")
+            record["malloc_delta"] = current - start
+            record["malloc_peak_delta"] = peak - start
+            if self.stack:
+                self.stack[-1]["malloc_peak_seen"] = max(self.stack[-1]["malloc_peak_seen"], peak)
+        self.stages.append(record)
+
+    def wrap(self, function, name):
+        statistics = self.functions.setdefault(name, {"calls": 0, "wall_seconds": 0.0})
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                statistics["calls"] += 1
+                statistics["wall_seconds"] += time.perf_counter() - start
+        return wrapper
+
+    def chrome_trace(self):
+        """
+        The stages in the Chrome trace event format (chrome://tracing, Perfetto).
+
+        :return: dict
+        """
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = []
+        for record in self.stages:
+            args = {k: v for k, v in record.items() if k not in ("name", "start", "wall_seconds", "depth")}
+            events.append({"name": record["name"], "ph": "X", "pid": pid, "tid": tid, "ts": record["start"] * 1e6,
+                           "dur": record["wall_seconds"] * 1e6, "args": args})
+        return {"traceEvents": sorted(events, key=lambda event: event["ts"]), "displayTimeUnit": "ms"}
+
+
+def enable(trace_malloc=False, trace_modules=()):
+    """
+    Starts recording stages. Tracing memory allocations with tracemalloc slows the run down noticeably, so it has to
+    be asked for. The public functions of trace_modules (e.g. Functions) are wrapped to count their calls and time,
+    including the references to them already imported into other modules.
+
+    :param trace_malloc: bool
+    :param trace_modules: list of modules
+    :return: Tracer
+    """
+    global _tracer
+    disable()
+    _tracer = Tracer(trace_malloc)
+    for module in trace_modules:
+        for name, function in list(vars(module).items()):
+            if name.startswith("_") or not callable(function) or isinstance(function, type) \
+                    or getattr(function, "__module__", None) != module.__name__:
+                continue
+            wrapper = _tracer.wrap(function, "{}.{}".format(module.__name__, name))
+            _replace_references(function, wrapper)
+            _tracer.wrapped.append((function, wrapper))
+    return _tracer
+
+
+def disable():
+    """
+    Stops recording and unwraps the traced functions.
+
+    :return: Tracer, the tracer which was active (or None)
+    """
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    if tracer is not None:
+        for function, wrapper in tracer.wrapped:
+            _replace_references(wrapper, function)
+        if tracer.started_malloc:
+            tracemalloc.stop()
+    return tracer
+
+
+def _replace_references(old, new):
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, "__dict__", None)
+        if not namespace:
+            continue
+        for name, value in list(namespace.items()):
+            if value is old:
+                namespace[name] = new
+
+
+def stage(name):
+    """
+    Context manager recording a stage, e.g. `with stage("features"): ...`.
+
+    :param name: str
+    :return: context manager
+    """
+    if _tracer is None:
+        return _null_stage
+    return _stage(name)
+
+
+@contextlib.contextmanager
+def _stage(name):
+    tracer = _tracer
+    tracer.begin(name)
+    try:
+        yield
+    finally:
+        tracer.end()
+
+
+def begin(name):
+    """
+    Starts recording a stage, for scripts where a with block doesn't fit. Must be matched by end().
+
+    :param name: str
+    :return: None
+    """
+    if _tracer is not None:
+        _tracer.begin(name)
+
+
+def end():
+    """
+    Ends the stage started last by begin().
+
+    :return: None
+    """
+    if _tracer is not None:
+        _tracer.end()
+
+
+def write_trace(path, chrome_path=None):
+    """
+    Writes the recorded stages and function statistics as JSON, and optionally as a Chrome trace, then prints a
+    summary. Does nothing when instrumentation is disabled.
+
+    :param path: str
+    :param chrome_path: str
+    :return: None
+    """
+    if _tracer is None:
+        return
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    stages = sorted(_tracer.stages, key=lambda record: record["start"])
+    with open(path, "w") as f:
+        json.dump({"stages": stages, "functions": _tracer.functions}, f, indent=2)
+    if chrome_path is not None:
+        with open(chrome_path, "w") as f:
+            json.dump(_tracer.chrome_trace(), f)
+
+    for record in stages:
+        memory = ""
+        if "malloc_peak_delta" in record:
+            memory = " {:>10.1f} MB allocated at peak".format(record["malloc_peak_delta"] / 2 ** 20)
+        print("{:<40} {:>9.3f}s wall {:>9.3f}s CPU{}".format("  " * record["depth"] + record["name"],
+                                                             record["wall_seconds"], record["cpu_seconds"], memory))
+    for name, statistics in sorted(_tracer.functions.items(), key=lambda item: -item[1]["wall_seconds"]):
+        if statistics["calls"]:
+            print("{:<40} {:>9.3f}s in {} calls".format(name, statistics["wall_seconds"], statistics["calls"]))
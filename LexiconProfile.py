@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import itertools
+import re
+import time
+import numpy as np
+import pandas as pd
+from Functions import sre_parse, sre_constants
+
+
+# Characters tried when a sample string needs a character from a class, e.g. \w or [^aeiou]
+SAMPLE_CHARACTERS = "aeioubcdfghjklmnpqrstvwxyz0123456789 '-_"
+
+
+def profile_lexicons(lexicons, texts, flags=re.IGNORECASE):
+    """
+    Runs every pattern of every lexicon over the texts on its own, recording per Label the cumulative match time, the
+    number of hits and the number of texts without any hit. Also counts the matches of each pattern which overlap a
+    match of another pattern of the same lexicon in the same text, i.e. words which are counted twice.
+
+    :param lexicons: dict of lexicon name -> pd.DataFrame with 'Label' and 'Regex'
+    :param texts: pd.Series or iterable of str
+    :param flags: int, regex flags applied to every pattern (as in LexiconMatcher)
+    :return: pd.DataFrame with one row per Label
+    """
+    texts = list(texts)
+    rows = []
+    for lexicon_name, lexicon_df in lexicons.items():
+        spans = []
+        for label, pattern in zip(lexicon_df['Label'], lexicon_df['Regex']):
+            regex = re.compile(pattern, flags)
+            start = time.perf_counter()
+            pattern_spans = [[hit.span() for hit in regex.finditer(text)] for text in texts]
+            seconds = time.perf_counter() - start
+            hits = np.array([len(text_spans) for text_spans in pattern_spans])
+            spans.append(pattern_spans)
+            rows.append({"Lexicon": lexicon_name, "Label": label, "Regex": pattern, "Seconds": seconds,
+                         "Hits": int(hits.sum()), "Zero-hit songs": int((hits == 0).sum())})
+
+        double_counts = _double_counts(spans)
+        for row, count in zip(rows[len(rows) - len(spans):], double_counts):
+            row["Double-counted hits"] = count
+
+    df_profile = pd.DataFrame(rows, columns=["Lexicon", "Label", "Regex", "Seconds", "Hits", "Zero-hit songs",
+                                             "Double-counted hits"])
+    total = df_profile["Seconds"].sum()
+    df_profile["Share of time"] = df_profile["Seconds"] / total if total else 0.0
+    return df_profile
+
+
+def _double_counts(spans):
+    # spans[pattern][text] is the list of match spans of the pattern in the text
+    double_counts = [0] * len(spans)
+    for text_spans in zip(*spans):
+        hits = sorted((start, end, i) for i, pattern_spans in enumerate(text_spans) for start, end in pattern_spans)
+        for a, (start, end, i) in enumerate(hits):
+            for other_start, other_end, j in hits[a + 1:]:
+                if other_start >= max(end, start + 1):
+                    break
+                if i != j:
+                    double_counts[i] += 1
+                    double_counts[j] += 1
+    return double_counts
+
+
+def check_lexicons(lexicons, flags=re.IGNORECASE):
+    """
+    Static check of the lexicon patterns. Flags patterns prone to catastrophic backtracking (nested quantifiers,
+    adjacent quantifiers or quantified alternatives which can match the same characters), patterns which can match
+    the empty string, duplicate patterns, and pairs of patterns of the same lexicon which can match overlapping text
+    and so count the same word twice (e.g. \\bi\\b inside I'm). Overlaps are found by generating sample strings
+    from each pattern and running the other patterns on them.
+
+    :param lexicons: dict of lexicon name -> pd.DataFrame with 'Label' and 'Regex'
+    :param flags: int
+    :return: pd.DataFrame with the columns Lexicon, Label, Problem and Detail
+    """
+    issues = []
+    for lexicon_name, lexicon_df in lexicons.items():
+        entries = list(zip(lexicon_df['Label'], lexicon_df['Regex']))
+        compiled = []
+        for label, pattern in entries:
+            try:
+                regex = re.compile(pattern, flags)
+                parsed = sre_parse.parse(pattern, flags)
+            except re.error as e:
+                issues.append((lexicon_name, label, "invalid", str(e)))
+                compiled.append(None)
+                continue
+            compiled.append((regex, parsed))
+            for problem in _backtracking_problems(parsed, flags):
+                issues.append((lexicon_name, label, "backtracking", problem))
+            if regex.fullmatch(""):
+                issues.append((lexicon_name, label, "empty match", "matches the empty string"))
+
+        seen = {}
+        for (label, pattern), entry in zip(entries, compiled):
+            if pattern in seen:
+                issues.append((lexicon_name, label, "duplicate", "same pattern as {}".format(seen[pattern])))
+            seen.setdefault(pattern, label)
+
+        # Patterns matching the empty string would overlap everything, and are flagged already
+        candidates = [i for i, entry in enumerate(compiled) if entry is not None and not entry[0].fullmatch("")]
+        for i, j in itertools.combinations(candidates, 2):
+            if entries[i][1] == entries[j][1]:
+                continue
+            for first, second in [(i, j), (j, i)]:
+                example = _overlap_example(compiled[first], compiled[second], flags)
+                if example is not None:
+                    issues.append((lexicon_name, entries[first][0], "overlap", "{} also matches {!r} in {!r}".format(
+                        entries[second][0], example[1], example[0])))
+                    break
+
+    return pd.DataFrame(issues, columns=["Lexicon", "Label", "Problem", "Detail"])
+
+
+def _overlap_example(first, second, flags):
+    # A sample match of first overlapped by a match of second, as (sample, second's match), or None
+    regex, parsed = first
+    other_regex = second[0]
+    for sample in _samples(parsed, flags):
+        for hit in regex.finditer(sample):
+            for other_hit in other_regex.finditer(sample):
+                if other_hit.start() < max(hit.end(), hit.start() + 1) and hit.start() < max(other_hit.end(),
+                                                                                               other_hit.start() + 1):
+                    return sample, other_hit.group()
+    return None
+
+
+def _samples(parsed, flags, limit=16):
+    # Strings matched by a parsed pattern: each quantifier repeated its minimum and one more time, and each
+    # alternative of each branch, up to limit combinations
+    samples = [""]
+    for op, av in parsed:
+        options = _node_samples(op, av, flags, limit)
+        if not options:
+            return []
+        samples = [sample + option for sample in samples for option in options][:limit]
+    return samples
+
+
+def _node_samples(op, av, flags, limit):
+    if op is sre_constants.LITERAL:
+        return [chr(av)]
+    if op in (sre_constants.IN, sre_constants.NOT_LITERAL, sre_constants.ANY):
+        for character in SAMPLE_CHARACTERS:
+            if _can_start_node(op, av, character, flags):
+                return [character]
+        return []
+    if op is sre_constants.SUBPATTERN:
+        return _samples(av[-1], flags, limit)
+    if op is sre_constants.BRANCH:
+        return [sample for branch in av[1] for sample in _samples(branch, flags, limit)][:limit]
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)):
+        low, high, item = av
+        item_samples = _samples(item, flags, limit) or [""]
+        counts = [low] + ([low + 1] if high > low else [])
+        return [item_samples[0] * count for count in counts]
+    # Anchors, lookarounds and anything else take no characters
+    return [""]
+
+
+def _can_start(parsed, character, flags):
+    # Whether a match of a parsed (sub)pattern can start with the character (approximately)
+    for op, av in parsed:
+        if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            continue
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                  getattr(sre_constants, "POSSESSIVE_REPEAT", None)):
+            if _can_start(av[2], character, flags):
+                return True
+            if av[0] > 0:
+                return False
+            continue
+        if op is sre_constants.SUBPATTERN:
+            return _can_start(av[-1], character, flags)
+        if op is sre_constants.BRANCH:
+            return any(_can_start(branch, character, flags) for branch in av[1])
+        return _can_start_node(op, av, character, flags)
+    return False
+
+
+def _can_start_node(op, av, character, flags):
+    fold = (lambda c: c.lower()) if flags & re.IGNORECASE else (lambda c: c)
+    if op is sre_constants.LITERAL:
+        return fold(chr(av)) == fold(character)
+    if op is sre_constants.NOT_LITERAL:
+        return fold(chr(av)) != fold(character)
+    if op is sre_constants.ANY:
+        return character != "\n"
+    if op is sre_constants.IN:
+        negate = False
+        matched = False
+        for item_op, item_av in av:
+            if item_op is sre_constants.NEGATE:
+                negate = True
+            elif item_op is sre_constants.LITERAL:
+                matched |= fold(chr(item_av)) == fold(character)
+            elif item_op is sre_constants.RANGE:
+                matched |= any(item_av[0] <= ord(c) <= item_av[1] for c in (character.lower(), character.upper()))
+            elif item_op is sre_constants.CATEGORY:
+                matched |= _in_category(item_av, character)
+        return matched != negate
+    return False
+
+
+def _in_category(category, character):
+    name = str(category)
+    if name.endswith("NOT_WORD"):
+        return not (character.isalnum() or character == "_")
+    if name.endswith("WORD"):
+        return character.isalnum() or character == "_"
+    if name.endswith("NOT_DIGIT"):
+        return not character.isdigit()
+    if name.endswith("DIGIT"):
+        return character.isdigit()
+    if name.endswith("NOT_SPACE"):
+        return not character.isspace()
+    if name.endswith("SPACE"):
+        return character.isspace()
+    return False
+
+
+def _backtracking_problems(parsed, flags, inside_unbounded=False):
+    # Descriptions of the constructs of a parsed pattern which can make matching take exponential or polynomial time
+    problems = []
+    previous_repeat = None
+    for op, av in parsed:
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, item = av
+            unbounded = high == sre_constants.MAXREPEAT
+            if inside_unbounded and high > 1:
+                problems.append("nested quantifier inside an unbounded quantifier")
+            if unbounded and previous_repeat is not None and \
+                    any(_can_start(previous_repeat, c, flags) and _can_start(item, c, flags)
+                        for c in SAMPLE_CHARACTERS):
+                problems.append("adjacent unbounded quantifiers over the same characters")
+            if unbounded:
+                body = item
+                while len(body) == 1 and body[0][0] is sre_constants.SUBPATTERN:
+                    body = body[0][1][-1]
+                if any(branch_op is sre_constants.BRANCH and _branches_overlap(branch_av[1], flags)
+                       for branch_op, branch_av in body):
+                    problems.append("unbounded quantifier over alternatives starting with the same characters")
+            problems += _backtracking_problems(item, flags, inside_unbounded or unbounded)
+            previous_repeat = item if unbounded else None
+            continue
+        if op is sre_constants.SUBPATTERN:
+            problems += _backtracking_problems(av[-1], flags, inside_unbounded)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                problems += _backtracking_problems(branch, flags, inside_unbounded)
+        if op not in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            previous_repeat = None
+    return problems
+
+
+def _branches_overlap(branches, flags):
+    for first, second in itertools.combinations(branches, 2):
+        if any(_can_start(first, c, flags) and _can_start(second, c, flags) for c in SAMPLE_CHARACTERS):
+            return True
+    return False
+
+
+def lexicon_report(lexicons, texts, flags=re.IGNORECASE):
+    """
+    Prints the profile of each lexicon pattern over the texts, slowest first, and the problems found by
+    check_lexicons.
+
+    :param lexicons: dict of lexicon name -> pd.DataFrame with 'Label' and 'Regex'
+    :param texts: pd.Series or iterable of str
+    :param flags: int
+    :return: df_profile: pd.DataFrame, df_issues: pd.DataFrame
+    """
+    df_profile = profile_lexicons(lexicons, texts, flags)
+    df_issues = check_lexicons(lexicons, flags)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(df_profile.sort_values("Seconds", ascending=False).to_string(index=False))
+        print()
+        if len(df_issues):
+            print(df_issues.to_string(index=False))
+        else:
+            print("No problems found in the lexicons")
+    return df_profile, df_issues
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from Ingestion import release_date
+from CorpusStore import ShardedCorpusWriter, compact_shards, CORPUS_PATH
+
+
+GENIUS_API = "https://api.genius.com"
+
+# Responses worth retrying: rate limited or a temporary server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """
+    Raised when a page can't be fetched: still failing after all retries, or with a status which isn't worth retrying
+    (e.g. 404), given as status.
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: allows bursts of up to capacity requests, and rate requests per second on average.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: float, requests per second
+        :param capacity: int, largest burst (defaults to rate, at least 1)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncFetcher:
+    """
+    Fetches pages over one pooled HTTP session (aiohttp), with at most concurrency requests in flight, a token bucket
+    rate limit, and retries with exponential backoff and jitter on connection errors, timeouts and RETRY_STATUSES.
+    Responses can be served from and saved to a ResponseCache. Use it as an async context manager.
+    """
+
+    def __init__(self, concurrency=8, rate=5, retries=4, backoff=0.5, timeout=30, headers=None, cache=None):
+        """
+        :param concurrency: int, maximum number of requests in flight
+        :param rate: float, maximum requests per second
+        :param retries: int, retries per request after the first attempt
+        :param backoff: float, seconds before the first retry; doubled for each further retry
+        :param timeout: float, seconds per request
+        :param headers: dict, sent with every request
+        :param cache: HttpCache.ResponseCache
+        """
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.cache = cache
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency),
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout), headers=self.headers)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def fetch(self, url, params=None, as_json=False):
+        """
+        Fetches a page.
+
+        :param url: str
+        :param params: dict of query parameters
+        :param as_json: bool, decode the response as JSON instead of text
+        :return: str, or the decoded JSON
+        """
+        import aiohttp
+
+        if self.cache is not None:
+            body = self.cache.get(url, params)
+            if body is not None:
+                return json.loads(body) if as_json else body
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            async with self.semaphore:
+                await self.bucket.acquire()
+                try:
+                    async with self.session.get(url, params=params) as response:
+                        if response.status >= 400 and response.status not in RETRY_STATUSES:
+                            raise FetchError("{} returned HTTP {}".format(url, response.status), response.status)
+                        if response.status not in RETRY_STATUSES:
+                            body = await response.text()
+                            if self.cache is not None:
+                                self.cache.put(url, params, body)
+                            return json.loads(body) if as_json else body
+                        error = "HTTP {}".format(response.status)
+                        retry_after = response.headers.get("Retry-After")
+                except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                    error = repr(e)
+                    retry_after = None
+            if last_attempt:
+                break
+            delay = self.backoff * 2 ** attempt * (1 + random.random())
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            await asyncio.sleep(delay)
+        raise FetchError("{} failed after {} attempts: {}".format(url, self.retries + 1, error))
+
+
+def parse_genius_lyrics(html, remove_section_headers=True):
+    """
+    Extracts the lyrics from a Genius song page.
+
+    :param html: str
+    :param remove_section_headers: bool, drop tags such as [Chorus]
+    :return: str
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    containers = soup.find_all("div", attrs={"data-lyrics-container": "true"})
+    if not containers:
+        # Older page layout
+        containers = soup.find_all("div", class_="lyrics")
+    for br in soup.find_all("br"):
+        br.replace_with("\n")
+    lyrics = "\n".join(container.get_text() for container in containers)
+    if remove_section_headers:
+        lyrics = re.sub(r"(\[.*?\])*", "", lyrics)
+        lyrics = re.sub("\n{2}", "\n", lyrics)
+    return lyrics.strip("\n")
+
+
+class GeniusAsyncSource:
+    """
+    Songs of an artist from the Genius API, with the lyrics pages of each page of the artist's song list fetched
+    concurrently. Songs whose lyrics page can't be fetched with a status which isn't worth retrying (e.g. 404) are
+    skipped and listed in failed; any other error aborts the ingestion. The api_base can point to a local stub server.
+    """
+
+    def __init__(self, token, artist_name, sort="title", per_page=50, excluded_terms=(), api_base=GENIUS_API,
+                 **fetcher_options):
+        """
+        :param token: str, Genius API access token
+        :param artist_name: str
+        :param sort: str, 'title', 'popularity' or 'release_date'
+        :param per_page: int, at most 50
+        :param excluded_terms: list of str, skip songs with any of these in their title (case-insensitive)
+        :param api_base: str
+        :param fetcher_options: passed on to AsyncFetcher
+        """
+        self.token = token
+        self.artist_name = artist_name
+        self.sort = sort
+        self.per_page = per_page
+        self.excluded_terms = [term.lower() for term in excluded_terms]
+        self.api_base = api_base
+        self.fetcher_options = fetcher_options
+        self.failed = []
+
+    async def find_artist_id(self, fetcher):
+        """
+        Id of the artist, from the first search hit whose primary artist has that name (or else the first hit).
+
+        :param fetcher: AsyncFetcher
+        :return: int
+        """
+        response = await fetcher.fetch(self.api_base + "/search", {"q": self.artist_name}, as_json=True)
+        artists = [hit["result"]["primary_artist"] for hit in response["response"]["hits"]]
+        if not artists:
+            raise FetchError("No artist found for '{}'".format(self.artist_name))
+        for artist in artists:
+            if artist["name"].lower() == self.artist_name.lower():
+                return artist["id"]
+        return artists[0]["id"]
+
+    def is_lyrics(self, song_info):
+        if song_info.get("lyrics_state", "complete") != "complete" or song_info.get("instrumental"):
+            return False
+        title = song_info["title"].lower()
+        return not any(term in title for term in self.excluded_terms)
+
+    async def fetch_song(self, fetcher, song_info):
+        html = await fetcher.fetch(song_info["url"])
+        if fetcher.cache is not None:
+            # Pages which haven't changed since they were last parsed aren't parsed again
+            lyrics = fetcher.cache.parsed(html, "genius lyrics", parse_genius_lyrics)
+        else:
+            lyrics = parse_genius_lyrics(html)
+        return {"Song ID": song_info["id"], "Song Title": song_info["title"], "Date": release_date(song_info),
+                "Lyrics": lyrics}
+
+    async def fetch_song_or_skip(self, fetcher, song_info):
+        """
+        Same as fetch_song, but a song whose page fails with a status which isn't worth retrying is added to failed
+        and skipped.
+
+        :param fetcher: AsyncFetcher
+        :param song_info: dict, a song of the artist's song list
+        :return: dict, the song record, or None if skipped
+        """
+        try:
+            return await self.fetch_song(fetcher, song_info)
+        except FetchError as e:
+            if e.status is None:
+                raise
+            print("Skipped '{}': {}".format(song_info["title"], e))
+            self.failed.append({"Song ID": song_info["id"], "Song Title": song_info["title"], "Status": e.status})
+            return None
+
+    async def ingest(self, writer):
+        """
+        Fetches the artist's songs into a corpus writer, resuming from its state and skipping the songs it has.
+
+        :param writer: ShardedCorpusWriter
+        :return: None
+        """
+        headers = {"Authorization": "Bearer " + self.token}
+        async with AsyncFetcher(headers=headers, **self.fetcher_options) as fetcher:
+            artist_id = await self.find_artist_id(fetcher)
+            page = writer.state["page"] if writer.state else 1
+            while page:
+                response = await fetcher.fetch("{}/artists/{}/songs".format(self.api_base, artist_id),
+                                               {"page": page, "per_page": self.per_page, "sort": self.sort},
+                                               as_json=True)
+                songs = [song_info for song_info in response["response"]["songs"]
+                         if song_info["id"] not in writer.song_ids and self.is_lyrics(song_info)]
+                # Songs are written as soon as their page is parsed, in whatever order they arrive
+                tasks = [asyncio.ensure_future(self.fetch_song_or_skip(fetcher, song_info)) for song_info in songs]
+                try:
+                    for task in asyncio.as_completed(tasks):
+                        song = await task
+                        if song is not None:
+                            writer.add(song, {"page": page})
+                finally:
+                    # On an error, the other songs of the page aren't left running
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                page = response["response"]["next_page"]
+
+
+def ingest_async(source, directory, shard_size=500, corpus_path=CORPUS_PATH, artist=None):
+    """
+    Same as Ingestion.ingest, for an async source such as GeniusAsyncSource.
+
+    :param source: GeniusAsyncSource
+    :param directory: str, directory of the sharded corpus
+    :param shard_size: int, number of songs per shard (and between checkpoints)
+    :param corpus_path: str, or None to keep only the shards
+    :param artist: str, added to the corpus file as an Artist column
+    :return: int, number of songs in the corpus
+    """
+    writer = ShardedCorpusWriter(directory, shard_size)
+    complete = False
+    try:
+        asyncio.run(source.ingest(writer))
+        complete = True
+    finally:
+        # Also on an interruption, so that the songs fetched so far are kept
+        writer.close(complete)
+    if corpus_path is not None:
+        compact_shards(directory, corpus_path, artist)
+    return len(writer.song_ids)
@@ -5,26 +5,23 @@ Created in December 2020
 @author: Dimitar Atanasov
 """
 
-import pandas as pd
-import pickle
-import lyricsgenius
+import os
+from LyricsFetch import GeniusAsyncSource, ingest_async
+from HttpCache import ResponseCache
 
 # Using the Genius API, I download all of Kanye West's songs, excluding remixes, live versions, and interviews
 # Additional clean up will be done later upon inspection of the scraped data
-genius = lyricsgenius.Genius("akw_nUqg_bhW3em_eiKq7yBNrb_KNEfhPqDhY1tavRm8fbmB0RSWZjK7o8fKmbl9")
-genius.verbose = False
-genius.remove_section_headers = True
-genius.excluded_terms = ["(Remix)", "(Live)", "Interview"]
-artist = genius.search_artist('Kanye West', sort="title")
-
-# I then put them in a DataFrame
-dfColumns = ['Song Title', 'Date', 'Lyrics']
-dfLyrics = pd.DataFrame(columns=dfColumns)
-for song in artist.songs:
-    dfTemp = pd.DataFrame([[song.title, song.year, song.lyrics]], columns=dfColumns)
-    dfCorpus = dfLyrics.append(dfTemp, ignore_index=True)
-
-# Pickle the scraped lyrics into a file
-outfile = open("lyrics.txt", "wb")
-pickle.dump(dfLyrics, outfile)
-outfile.close()
+# The lyrics pages are fetched concurrently over a pooled connection, within Genius' rate limits
+# The songs are streamed into a sharded corpus as they are downloaded, with a checkpoint after each shard, so an
+# interrupted scrape carries on where it stopped when this script is run again
+# Finally, the shards are combined into the Arrow corpus file
+# Responses are cached for a week, so a refresh only downloads new or changed pages
+# With replay=True, the scrape runs entirely from the cache, e.g. on a machine without network access
+responseCache = ResponseCache(os.path.join('Outputs', 'http_cache.sqlite'), ttl=7*24*3600, max_bytes=2*1024**3)
+source = GeniusAsyncSource("akw_nUqg_bhW3em_eiKq7yBNrb_KNEfhPqDhY1tavRm8fbmB0RSWZjK7o8fKmbl9", 'Kanye West',
+                           sort="title", excluded_terms=["(Remix)", "(Live)", "Interview"], concurrency=8, rate=5,
+                           cache=responseCache)
+numberOfSongs = ingest_async(source, os.path.join('Outputs', 'LyricsShards'))
+print("{} songs in the corpus ({} cached responses, {} downloaded)".format(numberOfSongs, responseCache.hits,
+                                                                        responseCache.misses))
+responseCache.close()
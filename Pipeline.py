@@ -0,0 +1,1173 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+
+Command-line entry point running the steps of Analysis.py as separate stages, e.g. for scheduled jobs:
+
+    python Pipeline.py ingest       # scrape the lyrics into the corpus file
+    python Pipeline.py features     # clean the corpus and calculate the per-song features
+    python Pipeline.py aggregate    # average the features per year and impute missing years
+    python Pipeline.py stream       # features and aggregate together, a chunk of songs at a time (out of core)
+    python Pipeline.py artists      # features and yearly tables of many artists in parallel, and a comparison
+    python Pipeline.py add-songs    # add newly released songs to the yearly table without recomputing it
+    python Pipeline.py plot         # save the plots of the yearly features
+    python Pipeline.py wordcloud    # save a word cloud of all lyrics
+    python Pipeline.py report       # render all plots in parallel, with an HTML index
+    python Pipeline.py lexicons     # profile and check the lexicon patterns
+    python Pipeline.py run          # run all of the above except ingest, skipping the stages which are up to date
+
+Each stage reads the outputs of the previous one from the Outputs folder. Only argparse, os and the standard
+library Instrumentation module are imported up front; numpy, pandas, nltk, TextBlob, matplotlib, wordcloud etc. are
+imported inside the stages which use them, so a job running a single stage only pays for the libraries of that stage.
+
+With --trace, the time and memory of the stage and of its steps are written to Outputs/trace.json and to
+Outputs/trace.chrome.json, which can be opened in chrome://tracing or Perfetto:
+
+    python Pipeline.py --trace --trace-memory --trace-functions features
+"""
+
+import argparse
+import os
+import sys
+from Instrumentation import stage, enable, write_trace
+
+
+OUTPUTS = 'Outputs'
+SONG_FEATURES_PATH = os.path.join(OUTPUTS, 'song_features.arrow')
+TOKEN_STORE_PATH = os.path.join(OUTPUTS, 'TokenStore')
+STEM_CACHE_PATH = os.path.join(OUTPUTS, 'stem_cache.tsv')
+FEATURE_CACHE_PATH = os.path.join(OUTPUTS, 'feature_cache.sqlite')
+AGGREGATE_STATE_PATH = os.path.join(OUTPUTS, 'aggregate_state.pkl')
+STAGES_PATH = os.path.join(OUTPUTS, 'Stages')
+WORDCLOUD_LAYOUT_PATH = os.path.join(OUTPUTS, 'wordcloud_layout.json')
+MASK_CACHE_PATH = os.path.join(OUTPUTS, 'Masks')
+REPORT_PATH = os.path.join(OUTPUTS, 'Report')
+YEARLY_PATH = os.path.join(OUTPUTS, 'lyrics_per_year.csv')
+PLOTS_PATH = os.path.join(OUTPUTS, 'Plots')
+TRACE_PATH = os.path.join(OUTPUTS, 'trace.json')
+CHROME_TRACE_PATH = os.path.join(OUTPUTS, 'trace.chrome.json')
+
+LEXICON_PATHS = {"I-words": os.path.join('Lexicons', 'i_words.txt'),
+                 "Greatness words": os.path.join('Lexicons', 'greatness_words.txt')}
+
+# Duplicates and everything which is not a song, compiled after manual inspection of the Kanye West corpus
+SEARCH_FOR = ["Freestyle", "Speech", "Reference", "Version", "Alternate", "Jools", "Sunday Service", "Demo", "Mix",
+              "Sessions", "Mos Def", "Paparazzi", "monologue", "Taylor Swift", "Single Art", "^On ", "Lecture",
+              r"\[*\]", "Notepad", "Making of", "Still Standing", "OG", "Solo", "SNL", "2 Ryde"]
+
+# Features calculated by FeatureExtraction for each song; lexical density is calculated from the token store
+FEATURE_NAMES = ("Lexicons", "Sentiment")
+
+# Number of songs cleaned at a time by clean_lyrics
+CLEANING_CHUNK_SIZE = 2000
+
+# Number of songs read at a time when the corpus doesn't fit in the memory budget
+CORPUS_CHUNK_SIZE = 10000
+
+# Peak memory of the in-memory features stage per byte of lyrics: the cleaned lyrics, the word shingles of the
+# deduplication, the tokens and the feature extraction (measured on synthetic corpora)
+IN_MEMORY_FACTOR = 6
+
+# Pairs of yearly features plotted against each other, with their axis labels
+PLOT_PAIRS = [(("I-words", "Average I-words"), ("Greatness words", "Average Greatness words")),
+              (("Total words", "Vocabulary size"), ("Lexical diversity", "Average Lexical density"))]
+
+
+def clean_lyrics(df_lyrics, search_for=SEARCH_FOR, chunk_size=CLEANING_CHUNK_SIZE):
+    """
+    Cleans a scraped corpus: drops songs without lyrics or date, titles matching search_for, unreleased lyrics and
+    very short lyrics, adds a Year column (int16), and removes newlines and tags such as [Outro] from the lyrics.
+
+    The lyrics are cleaned and filtered a slice of songs at a time, and only the lyrics which are kept are copied,
+    once, so the lyrics column is never duplicated (with a compact corpus, see CorpusStore.compact_frame, the
+    original lyrics stay in the memory-mapped file).
+
+    :param df_lyrics: pd.DataFrame with 'Song Title', 'Date' and 'Lyrics'
+    :param search_for: list of regex patterns of song titles to drop
+    :param chunk_size: int, number of songs cleaned at a time
+    :return: pd.DataFrame
+    """
+    import numpy as np
+    import pandas as pd
+
+    rows = np.flatnonzero(listed_songs(df_lyrics, search_for))
+
+    lyrics = []
+    kept_rows = []
+    for start in range(0, len(rows), chunk_size):
+        chunk_rows = rows[start:start + chunk_size]
+        chunk_lyrics = clean_lyrics_text(df_lyrics["Lyrics"].iloc[chunk_rows])
+        # Lyrics which are not released or from a leaked demo, and very short lyrics
+        valid = ~chunk_lyrics.str.contains("Lyrics for this|Lyrics from") & (chunk_lyrics.str.len() >= 10)
+        lyrics.append(chunk_lyrics[valid])
+        kept_rows.append(chunk_rows[valid.to_numpy(dtype=bool)])
+    kept_rows = np.concatenate(kept_rows) if kept_rows else rows
+
+    # Numbered as if the index had been reset after the title filter
+    index = pd.Index(np.searchsorted(rows, kept_rows))
+    df_clean = df_lyrics.drop(columns="Lyrics").iloc[kept_rows].set_axis(index)
+    df_clean.insert(df_lyrics.columns.get_loc("Lyrics"), "Lyrics",
+                    pd.concat(lyrics).set_axis(index) if lyrics else df_lyrics["Lyrics"].iloc[:0])
+    df_clean["Year"] = pd.DatetimeIndex(df_clean["Date"]).year.astype("int16")
+    return df_clean
+
+
+def listed_songs(df_lyrics, search_for=SEARCH_FOR):
+    """
+    The songs which pass the first filters of clean_lyrics: with lyrics and a date, and a title not matching
+    search_for. clean_lyrics numbers the songs it keeps by their position among these.
+
+    :param df_lyrics: pd.DataFrame with 'Song Title', 'Date' and 'Lyrics'
+    :param search_for: list of regex patterns of song titles to drop
+    :return: np.array of bool
+    """
+    keep = df_lyrics["Lyrics"].notna().to_numpy() & df_lyrics["Date"].notna().to_numpy()
+    if search_for:
+        keep &= ~df_lyrics["Song Title"].str.contains('|'.join(search_for)).to_numpy(dtype=bool, na_value=False)
+    return keep
+
+
+def clean_lyrics_text(lyrics):
+    """
+    Removes tags such as [Outro] and replaces newlines with spaces.
+
+    :param lyrics: pd.Series of str
+    :return: pd.Series of str
+    """
+    return lyrics.str.replace(r"\[[^\]]*\]", "", regex=True).str.replace("\n", " ")
+
+
+def load_lexicons(lexicon_paths=LEXICON_PATHS):
+    """
+    Loads the lexicons.
+
+    :param lexicon_paths: dict of column name -> lexicon file path
+    :return: dict of column name -> pd.DataFrame
+    """
+    import pandas as pd
+
+    return {name: pd.read_table(path, index_col=0, sep='\t') for name, path in lexicon_paths.items()}
+
+
+def stage_ingest(args):
+    from LyricsFetch import GeniusAsyncSource, ingest_async
+    from HttpCache import ResponseCache
+    from CorpusStore import artist_corpus_paths, artist_slug
+
+    token = args.token or os.environ.get("GENIUS_TOKEN")
+    if not token:
+        sys.exit("A Genius API token is needed, with --token or the GENIUS_TOKEN environment variable")
+    response_cache = ResponseCache(os.path.join(OUTPUTS, 'http_cache.sqlite'), ttl=7*24*3600,
+                                   max_bytes=2*1024**3, replay=args.replay)
+    # Several artists go to the corpus partitioned by artist, each with its own shards
+    partitioned = args.partitioned or len(args.artist) > 1
+    if partitioned:
+        try:
+            paths = artist_corpus_paths(args.artist, args.artists_directory)
+        except ValueError as e:
+            sys.exit(str(e))
+    for artist in args.artist:
+        source = GeniusAsyncSource(token, artist, sort="title", excluded_terms=["(Remix)", "(Live)", "Interview"],
+                                   cache=response_cache)
+        if partitioned:
+            number_of_songs = ingest_async(source, os.path.join(OUTPUTS, 'LyricsShards', artist_slug(artist)),
+                                           corpus_path=paths[artist],
+                                           artist=artist)
+        else:
+            number_of_songs = ingest_async(source, os.path.join(OUTPUTS, 'LyricsShards'), corpus_path=args.corpus)
+        print("{}: {} songs in the corpus".format(artist, number_of_songs))
+    response_cache.close()
+
+
+def remove_duplicates(df_lyrics, threshold=0.8):
+    """
+    Drops near-duplicate songs (see Deduplication.deduplicate) and prints them.
+
+    :param df_lyrics: pd.DataFrame with 'Song Title' and 'Lyrics'
+    :param threshold: float, lyrics similarity above which songs are near-duplicates (1 to keep them all)
+    :return: pd.DataFrame
+    """
+    import pandas as pd
+    from Deduplication import deduplicate
+
+    if threshold >= 1:
+        return df_lyrics
+    with stage("deduplicate"):
+        df_lyrics, df_dropped = deduplicate(df_lyrics, threshold)
+    print("Dropped {} near-duplicate songs".format(len(df_dropped)))
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(df_dropped)
+    return df_lyrics
+
+
+def song_features(df_lyrics, workers=None):
+    """
+    Calculates the per-song features of a cleaned corpus: lexicon counts, lexical density and sentiment. The token
+    store of the lyrics and the stem cache are saved in the Outputs folder on the way, for the vocabulary measures
+    and the word cloud.
+
+    :param df_lyrics: pd.DataFrame with 'Song Title', 'Date', 'Year' and 'Lyrics'
+    :param workers: int, number of worker processes (defaults to FeatureExtraction.default_workers)
+    :return: pd.DataFrame with 'Song Title', 'Date', 'Year' and the features
+    """
+    from Functions import load_stem_cache, save_stem_cache
+    from TokenStore import build_token_store, save_token_store, stem_vocabulary
+
+    with stage("tokenize"):
+        load_stem_cache(STEM_CACHE_PATH)
+        token_store = build_token_store(df_lyrics["Lyrics"])
+        save_token_store(token_store, TOKEN_STORE_PATH)
+        stems, stem_ids = stem_vocabulary(token_store)
+        save_stem_cache(STEM_CACHE_PATH)
+
+    feature_cache = open_feature_cache()
+    df_songs = features_of_songs(df_lyrics, token_store, stems, stem_ids, workers, feature_cache)
+    print("Feature cache: {} hits, {} misses".format(feature_cache.hits, feature_cache.misses))
+    feature_cache.close()
+    return df_songs
+
+
+def open_feature_cache():
+    """
+    Opens the feature cache of the Outputs folder, with the fingerprint of the current lexicons, stopwords and
+    features.
+
+    :return: FeatureCache.FeatureCache
+    """
+    from nltk.corpus import stopwords
+    from FeatureCache import FeatureCache, feature_fingerprint
+
+    return FeatureCache(FEATURE_CACHE_PATH, feature_fingerprint(LEXICON_PATHS, stopwords.words('english'),
+                                                                FEATURE_NAMES))
+
+
+def features_of_songs(df_lyrics, token_store, stems, stem_ids, workers=None, feature_cache=None):
+    """
+    Per-song features of tokenized songs: lexicon counts and sentiment (looked up in the feature cache if given), and
+    lexical density from the token store.
+
+    :param df_lyrics: pd.DataFrame with 'Song Title', 'Date', 'Year' and 'Lyrics'
+    :param token_store: TokenStore of the lyrics
+    :param stems: np.array of str, as returned by TokenStore.stem_vocabulary
+    :param stem_ids: np.array, stem id of each vocabulary entry
+    :param workers: int, number of worker processes (defaults to FeatureExtraction.default_workers)
+    :param feature_cache: FeatureCache.FeatureCache, see open_feature_cache
+    :return: pd.DataFrame with 'Song Title', 'Date', 'Year' and the features
+    """
+    from nltk.corpus import stopwords
+    from TokenStore import stem_stopword_mask, lexical_density
+    from FeatureExtraction import default_workers, extract_features
+    from FeatureCache import extract_features_cached
+
+    stops = stopwords.words('english')
+    with stage("lexicons and sentiment"):
+        workers = workers or default_workers()
+        if feature_cache is None:
+            df_features = extract_features(df_lyrics, load_lexicons(), stops, FEATURE_NAMES, n_workers=workers)
+        else:
+            df_features = extract_features_cached(df_lyrics, load_lexicons(), stops, feature_cache, FEATURE_NAMES,
+                                                  n_workers=workers)
+
+    with stage("lexical density"):
+        df_songs = df_lyrics[["Song Title", "Date", "Year"]].copy()
+        for column in LEXICON_PATHS:
+            df_songs[column] = df_features[column].astype("int32")
+        df_songs["Lexical density"] = lexical_density(token_store, stem_ids, stem_stopword_mask(stems, stops))
+        df_songs["Sentiment"] = df_features["Sentiment"]
+    return df_songs
+
+
+def clean_chunks(corpus, search_for=SEARCH_FOR, chunk_size=CORPUS_CHUNK_SIZE):
+    """
+    Reads and cleans a corpus chunk by chunk (see clean_lyrics). A 'Row' column keeps the position of each song in
+    the corpus file, and the songs are numbered as clean_lyrics numbers the songs of the whole corpus.
+
+    :param corpus: str, path of the Arrow corpus
+    :param search_for: list of regex patterns of song titles to drop
+    :param chunk_size: int, number of songs per chunk
+    :return: generator of pd.DataFrame
+    """
+    from CorpusStore import iter_corpus
+
+    first = 0
+    for df_chunk in iter_corpus(corpus, ["Song Title", "Date", "Lyrics"], chunk_size):
+        df_chunk["Row"] = df_chunk.index
+        df_clean = clean_lyrics(df_chunk, search_for)
+        yield df_clean.set_axis(df_clean.index + first)
+        first += int(listed_songs(df_chunk, search_for).sum())
+
+
+def kept_rows(corpus, search_for=SEARCH_FOR, dedup_threshold=0.8, chunk_size=CORPUS_CHUNK_SIZE):
+    """
+    Corpus positions of the songs which remain after cleaning and near-duplicate removal (as clean_corpus), from a
+    pass over the corpus which only keeps the titles and MinHash signatures of the songs.
+
+    :param corpus: str, path of the Arrow corpus
+    :param search_for: list of regex patterns of song titles to drop
+    :param dedup_threshold: float, lyrics similarity above which songs are near-duplicates (1 to keep them all)
+    :param chunk_size: int, number of songs per chunk
+    :return: np.array of int
+    """
+    import numpy as np
+    import pandas as pd
+    from Deduplication import minhash_signatures, duplicates
+
+    rows, titles, signatures = [], [], []
+    for df_chunk in clean_chunks(corpus, search_for, chunk_size):
+        rows.append(df_chunk["Row"].to_numpy())
+        if dedup_threshold < 1:
+            titles.append(df_chunk["Song Title"].to_numpy(dtype=object))
+            signatures.append(minhash_signatures(df_chunk["Lyrics"]))
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype='int64')
+    if dedup_threshold >= 1 or len(rows) == 0:
+        return rows
+
+    with stage("deduplicate"):
+        dropped, df_dropped = duplicates(np.concatenate(signatures), np.concatenate(titles), dedup_threshold)
+    print("Dropped {} near-duplicate songs".format(len(df_dropped)))
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(df_dropped)
+    return np.delete(rows, dropped)
+
+
+def chunk_features(corpus, search_for=SEARCH_FOR, dedup_threshold=0.8, chunk_size=CORPUS_CHUNK_SIZE, workers=None):
+    """
+    Streams a corpus through clean_corpus and song_features one chunk of songs at a time: a first pass finds the
+    songs to keep (see kept_rows), and a second pass cleans, tokenizes and calculates the features of each chunk.
+    Only one chunk of lyrics is in memory at a time.
+
+    :param corpus: str, path of the Arrow corpus
+    :param search_for: list of regex patterns of song titles to drop
+    :param dedup_threshold: float, lyrics similarity above which songs are near-duplicates (1 to keep them all)
+    :param chunk_size: int, number of songs per chunk
+    :param workers: int, number of worker processes (defaults to FeatureExtraction.default_workers)
+    :return: generator of (df_songs, token_store, stems, stem_ids) per chunk, as song_features and
+             TokenStore.stem_vocabulary return them for the chunk's songs
+    """
+    import numpy as np
+    from Functions import load_stem_cache, save_stem_cache
+    from TokenStore import build_token_store, stem_vocabulary
+
+    with stage("clean and deduplicate"):
+        rows = kept_rows(corpus, search_for, dedup_threshold, chunk_size)
+
+    load_stem_cache(STEM_CACHE_PATH)
+    feature_cache = open_feature_cache()
+    try:
+        for df_chunk in clean_chunks(corpus, search_for, chunk_size):
+            df_chunk = df_chunk[np.isin(df_chunk["Row"].to_numpy(), rows)]
+            with stage("tokenize"):
+                token_store = build_token_store(df_chunk["Lyrics"])
+                stems, stem_ids = stem_vocabulary(token_store)
+            df_songs = features_of_songs(df_chunk, token_store, stems, stem_ids, workers, feature_cache)
+            yield df_songs, token_store, stems, stem_ids
+    finally:
+        print("Feature cache: {} hits, {} misses".format(feature_cache.hits, feature_cache.misses))
+        feature_cache.close()
+        save_stem_cache(STEM_CACHE_PATH)
+
+
+def song_features_chunked(corpus, search_for=SEARCH_FOR, dedup_threshold=0.8, chunk_size=CORPUS_CHUNK_SIZE,
+                          workers=None):
+    """
+    Same as clean_corpus followed by song_features, for corpora whose lyrics don't fit in the memory budget (see
+    chunk_features). Only the token ids and features of all songs are kept, never all of the lyrics.
+
+    :param corpus: str, path of the Arrow corpus
+    :param search_for: list of regex patterns of song titles to drop
+    :param dedup_threshold: float, lyrics similarity above which songs are near-duplicates (1 to keep them all)
+    :param chunk_size: int, number of songs per chunk
+    :param workers: int, number of worker processes (defaults to FeatureExtraction.default_workers)
+    :return: pd.DataFrame with 'Song Title', 'Date', 'Year' and the features
+    """
+    import pandas as pd
+    from CorpusStore import compact_frame
+    from TokenStore import concat_token_stores, save_token_store
+
+    stores, songs = [], []
+    for df_songs, token_store, _, _ in chunk_features(corpus, search_for, dedup_threshold, chunk_size, workers):
+        songs.append(df_songs)
+        stores.append(token_store)
+    with stage("save tokens"):
+        save_token_store(concat_token_stores(stores), TOKEN_STORE_PATH)
+    return compact_frame(pd.concat(songs, ignore_index=True))
+
+
+def year_state_chunked(corpus, search_for=SEARCH_FOR, dedup_threshold=0.8, chunk_size=CORPUS_CHUNK_SIZE,
+                       workers=None, sketch=False):
+    """
+    Out-of-core analysis: cleans a corpus, calculates the per-song features and reduces them to the per-year state
+    (see AggregateState) one chunk of songs at a time, merging the partial state of each chunk. Neither the lyrics
+    nor the tokens of the whole corpus are ever in memory; the state gives the same yearly table as the in-memory
+    path.
+
+    :param corpus: str, path of the Arrow corpus
+    :param search_for: list of regex patterns of song titles to drop
+    :param dedup_threshold: float, lyrics similarity above which songs are near-duplicates (1 to keep them all)
+    :param chunk_size: int, number of songs per chunk
+    :param workers: int, number of worker processes (defaults to FeatureExtraction.default_workers)
+    :param sketch: bool, estimate the vocabulary sizes with HyperLogLog sketches
+    :return: state: AggregateState, df_songs: pd.DataFrame with 'Song Title', 'Date', 'Year' and the features
+    """
+    import pandas as pd
+    from nltk.corpus import stopwords
+    from AggregateState import AggregateState
+    from CorpusStore import compact_frame
+    from TokenStore import stem_stopword_mask
+
+    stops = stopwords.words('english')
+    state = None
+    songs = []
+    for df_songs, token_store, stems, stem_ids in chunk_features(corpus, search_for, dedup_threshold, chunk_size,
+                                                                 workers):
+        with stage("per-year state"):
+            features = [column for column in df_songs.columns if column not in ("Song Title", "Date", "Year")]
+            chunk_state = AggregateState(features, sketch)
+            chunk_state.add_songs(df_songs, token_store, stems, stem_ids, stem_stopword_mask(stems, stops))
+            if state is None:
+                state = chunk_state
+            else:
+                state.merge(chunk_state)
+        songs.append(df_songs)
+    if state is None:
+        raise ValueError("No songs left in {} after cleaning".format(corpus))
+    return state, compact_frame(pd.concat(songs, ignore_index=True))
+
+
+def stage_stream(args):
+    from CorpusStore import write_corpus, convert_pickle_corpus
+
+    if not os.path.exists(args.corpus):
+        convert_pickle_corpus(path=args.corpus)
+    state, df_songs = year_state_chunked(args.corpus, SEARCH_FOR if args.title_filter else None,
+                                         args.dedup_threshold, args.chunk_size, args.workers, args.sketch)
+    with stage("save"):
+        write_corpus(df_songs, SONG_FEATURES_PATH)
+        state.save(AGGREGATE_STATE_PATH)
+        df_year = impute_years(state.table(), args.first_year, args.last_year, args.impute)
+        df_year.to_csv(YEARLY_PATH, index=False)
+
+
+def parse_size(text):
+    """
+    Number of bytes of a size such as 512M, 4G or 1.5GB (or a plain number of bytes).
+
+    :param text: str
+    :return: int
+    """
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+def memory_budget(budget=None):
+    """
+    Memory budget of the in-memory stages: the given size, else $LYRICS_MEMORY_BUDGET, else half of the physical
+    memory.
+
+    :param budget: str, e.g. 4G
+    :return: int, bytes
+    """
+    budget = budget or os.environ.get("LYRICS_MEMORY_BUDGET")
+    if budget:
+        return parse_size(budget)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except (AttributeError, ValueError, OSError):
+        return 4 << 30
+
+
+def fits_in_memory(corpus, budget=None):
+    """
+    Whether the features stage can hold the corpus in memory within the budget, going by the size of its lyrics.
+
+    :param corpus: str, path of the Arrow corpus
+    :param budget: str, see memory_budget
+    :return: bool
+    """
+    from CorpusStore import corpus_nbytes
+
+    return corpus_nbytes(corpus, ["Lyrics"]) * IN_MEMORY_FACTOR <= memory_budget(budget)
+
+
+def stage_features(args):
+    from CorpusStore import load_corpus, write_corpus, convert_pickle_corpus
+
+    if not os.path.exists(args.corpus):
+        convert_pickle_corpus(path=args.corpus)
+    if not fits_in_memory(args.corpus, args.memory_budget):
+        print("The corpus doesn't fit in the memory budget; processing it in chunks of {} songs".format(
+            args.chunk_size))
+        df_songs = song_features_chunked(args.corpus, SEARCH_FOR if args.title_filter else None,
+                                         args.dedup_threshold, args.chunk_size, args.workers)
+    else:
+        with stage("load"):
+            df_lyrics = load_corpus(args.corpus, columns=["Song Title", "Date", "Lyrics"], compact=True)
+        with stage("clean"):
+            df_lyrics = clean_lyrics(df_lyrics, SEARCH_FOR if args.title_filter else None)
+        df_lyrics = remove_duplicates(df_lyrics, args.dedup_threshold)
+        df_songs = song_features(df_lyrics, args.workers)
+    with stage("save"):
+        write_corpus(df_songs, SONG_FEATURES_PATH)
+
+
+def year_vocabulary(df_songs):
+    """
+    Vocabulary size, total words and lexical diversity per year, from the token store saved by song_features.
+
+    :param df_songs: pd.DataFrame with 'Year', in the order of the token store
+    :return: pd.DataFrame indexed by year
+    """
+    from nltk.corpus import stopwords
+    from Functions import load_stem_cache
+    from TokenStore import load_token_store, stem_vocabulary, stem_stopword_mask, group_vocabulary
+
+    load_stem_cache(STEM_CACHE_PATH)
+    token_store = load_token_store(TOKEN_STORE_PATH)
+    stems, stem_ids = stem_vocabulary(token_store)
+    stop_mask = stem_stopword_mask(stems, stopwords.words('english'))
+    return group_vocabulary(token_store, stems, stem_ids, stop_mask, df_songs["Year"])
+
+
+def average_years(df_songs, df_vocabulary_year):
+    """
+    Averages the per-song features per year, and adds the per-year vocabulary measures and number of songs.
+
+    :param df_songs: pd.DataFrame with 'Year' and the per-song features
+    :param df_vocabulary_year: pd.DataFrame indexed by year, as returned by TokenStore.group_vocabulary
+    :return: pd.DataFrame indexed by year, with only the years which have songs
+    """
+    features = [column for column in df_songs.columns if column not in ("Song Title", "Date", "Year")]
+    df_year = df_songs[["Year"] + features].groupby(["Year"]).mean()
+    for column in ["Vocabulary size", "Lexical diversity", "Total words"]:
+        df_year[column] = df_vocabulary_year[column]
+    df_year["Number of Songs"] = df_songs.groupby(["Year"]).size()
+    return df_year
+
+
+def impute_years(df_year, first_year=None, last_year=None, method="linear"):
+    """
+    Adds the years without songs (with 0 songs) and fills in their features, by linear interpolation by default.
+
+    :param df_year: pd.DataFrame indexed by year, as returned by average_years
+    :param first_year: int, first year of the table (defaults to the first year with songs)
+    :param last_year: int, last year of the table (defaults to the last year with songs)
+    :param method: str, see TimeSeries.IMPUTATIONS
+    :return: pd.DataFrame with 'Year'
+    """
+    from TimeSeries import reindex_periods, impute
+
+    return impute(reindex_periods(df_year, first_year, last_year), method)
+
+
+def aggregate_years(df_songs, df_vocabulary_year, first_year=None, last_year=None, method="linear"):
+    """
+    Averages the per-song features per year, adds the per-year vocabulary measures and number of songs, and fills in
+    the years without songs by linear interpolation (or another imputation method).
+
+    :param df_songs: pd.DataFrame with 'Year' and the per-song features
+    :param df_vocabulary_year: pd.DataFrame indexed by year, as returned by TokenStore.group_vocabulary
+    :param first_year: int, first year of the table (defaults to the first year with songs)
+    :param last_year: int, last year of the table (defaults to the last year with songs)
+    :param method: str, see TimeSeries.IMPUTATIONS
+    :return: pd.DataFrame
+    """
+    return impute_years(average_years(df_songs, df_vocabulary_year), first_year, last_year, method)
+
+
+def year_state(df_songs, sketch=False):
+    """
+    Mergeable per-year state of the features and vocabulary (see AggregateState), from the token store saved by
+    song_features.
+
+    :param df_songs: pd.DataFrame with 'Year' and the per-song features, in the order of the token store
+    :param sketch: bool, estimate the vocabulary sizes with HyperLogLog sketches
+    :return: AggregateState
+    """
+    from nltk.corpus import stopwords
+    from Functions import load_stem_cache
+    from TokenStore import load_token_store, stem_vocabulary, stem_stopword_mask
+    from AggregateState import AggregateState
+
+    load_stem_cache(STEM_CACHE_PATH)
+    token_store = load_token_store(TOKEN_STORE_PATH)
+    stems, stem_ids = stem_vocabulary(token_store)
+    state = AggregateState([column for column in df_songs.columns if column not in ("Song Title", "Date", "Year")],
+                           sketch)
+    state.add_songs(df_songs, token_store, stems, stem_ids, stem_stopword_mask(stems, stopwords.words('english')))
+    return state
+
+
+def stage_aggregate(args):
+    from CorpusStore import read_corpus
+
+    if not os.path.exists(SONG_FEATURES_PATH):
+        sys.exit("{} doesn't exist yet; run the features (or run) stage first".format(SONG_FEATURES_PATH))
+    with stage("load"):
+        df_songs = read_corpus(SONG_FEATURES_PATH)
+    with stage("per-year state"):
+        state = year_state(df_songs, args.sketch)
+        state.save(AGGREGATE_STATE_PATH)
+
+    with stage("per-year averages"):
+        df_year = impute_years(state.table(), args.first_year, args.last_year, args.impute)
+    df_year.to_csv(YEARLY_PATH, index=False)
+
+
+def new_song_features(df_lyrics):
+    """
+    Per-song features of a few new songs, as song_features calculates them, but without touching the saved token
+    store or feature cache of the corpus.
+
+    :param df_lyrics: pd.DataFrame with 'Song Title', 'Date', 'Year' and 'Lyrics'
+    :return: df_songs: pd.DataFrame with 'Song Title', 'Date', 'Year' and the features, token_store: TokenStore of
+             the songs, stems, stem_ids and stop_mask as returned by TokenStore.stem_vocabulary and stem_stopword_mask
+    """
+    from nltk.corpus import stopwords
+    from Functions import load_stem_cache
+    from TokenStore import build_token_store, stem_vocabulary, stem_stopword_mask
+
+    load_stem_cache(STEM_CACHE_PATH)
+    token_store = build_token_store(df_lyrics["Lyrics"])
+    stems, stem_ids = stem_vocabulary(token_store)
+    df_songs = features_of_songs(df_lyrics, token_store, stems, stem_ids, workers=1)
+    return df_songs, token_store, stems, stem_ids, stem_stopword_mask(stems, stopwords.words('english'))
+
+
+def append_songs(df_songs, token_store, df_raw, corpus):
+    """
+    Saves added songs with the rest of the corpus: the raw songs at the end of the corpus file, so that the features
+    and run stages include them, and their features and tokens at the end of the saved features and token store, so
+    that the aggregate stage does. The token store is only extended if it matches the saved features (the stream
+    stage doesn't save one).
+
+    :param df_songs: pd.DataFrame with 'Song Title', 'Date', 'Year' and the features of the added songs
+    :param token_store: TokenStore of the added songs
+    :param df_raw: pd.DataFrame with the 'Song Title', 'Date' and 'Lyrics' of the added songs as given
+    :param corpus: str, path of the Arrow corpus
+    :return: None
+    """
+    import numpy as np
+    import pandas as pd
+    from CorpusStore import compact_frame, read_corpus, write_corpus
+    from TokenStore import concat_token_stores, load_token_store, save_token_store
+
+    if os.path.exists(corpus):
+        write_corpus(pd.concat([read_corpus(corpus), df_raw], ignore_index=True), corpus)
+    if os.path.exists(SONG_FEATURES_PATH):
+        df_features = read_corpus(SONG_FEATURES_PATH)
+        if os.path.exists(TOKEN_STORE_PATH):
+            store = load_token_store(TOKEN_STORE_PATH, mmap_mode=None)
+            if len(store.offsets) - 1 == len(df_features):
+                # The added songs are numbered after the songs of the store
+                first = int(store.index.max()) + 1 if len(store.index) else 0
+                save_token_store(concat_token_stores([store, token_store._replace(
+                    index=np.arange(first, first + len(df_songs)))]), TOKEN_STORE_PATH)
+        df_songs = pd.concat([df_features, df_songs], ignore_index=True)
+        write_corpus(compact_frame(df_songs), SONG_FEATURES_PATH)
+
+
+def stage_add_songs(args):
+    import pandas as pd
+    from AggregateState import AggregateState
+
+    if not os.path.exists(AGGREGATE_STATE_PATH):
+        sys.exit("No saved per-year state in {}; run the aggregate stage first".format(AGGREGATE_STATE_PATH))
+    if len(args.title) != len(args.lyrics) or len(args.date) != len(args.lyrics):
+        sys.exit("Give one --title and one --date per lyrics file")
+
+    lyrics = []
+    for path in args.lyrics:
+        with open(path, encoding="utf-8") as f:
+            lyrics.append(f.read())
+    df_raw = pd.DataFrame({"Song Title": args.title, "Date": args.date, "Lyrics": lyrics})
+    df_lyrics = clean_lyrics(df_raw.assign(Row=range(len(df_raw))), SEARCH_FOR if args.title_filter else None)
+    if df_lyrics.empty:
+        print("No songs left to add after cleaning")
+        return
+
+    state = AggregateState.load(AGGREGATE_STATE_PATH)
+    with stage("new song features"):
+        df_songs, token_store, stems, stem_ids, stop_mask = new_song_features(df_lyrics)
+        # Songs which were already added (or are in the corpus the state was built from) aren't counted again
+        known = state.known_songs(token_store)
+        if known.any():
+            print("Already in the per-year state: {}".format(", ".join(df_lyrics["Song Title"][known])))
+            if known.all():
+                return
+            df_lyrics = df_lyrics[~known]
+            df_songs, token_store, stems, stem_ids, stop_mask = new_song_features(df_lyrics)
+    with stage("update per-year state"):
+        state.add_songs(df_songs, token_store, stems, stem_ids, stop_mask)
+    with stage("save"):
+        # The songs are saved before the state, so an interruption at worst leaves them saved but not counted
+        append_songs(df_songs, token_store, df_raw.iloc[df_lyrics["Row"]], args.corpus)
+        state.save(AGGREGATE_STATE_PATH)
+    df_year = impute_years(state.table(), args.first_year, args.last_year, args.impute)
+    df_year.to_csv(YEARLY_PATH, index=False)
+    print("Added {} songs; {} songs in the yearly table".format(len(df_songs), int(df_year["Number of Songs"].sum())))
+
+
+def rolling_years(df_year, window=3, kind="trailing"):
+    """
+    Moving average of the features of the yearly table (the years themselves are kept as they are).
+
+    :param df_year: pd.DataFrame with 'Year'
+    :param window: int, number of years
+    :param kind: str, see TimeSeries.WINDOW_KINDS
+    :return: pd.DataFrame
+    """
+    from TimeSeries import moving_average
+
+    return moving_average(df_year, window, kind)
+
+
+def plot_pair(df_year, left, right, path):
+    """
+    Plots two yearly features against each other on twin y-axes and saves the figure.
+
+    :param df_year: pd.DataFrame with 'Year'
+    :param left: (column, axis label)
+    :param right: (column, axis label)
+    :param path: str, or list of str to save the figure in several formats (e.g. .png and .svg)
+    :return: None
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax1 = plt.subplots()
+
+    color = 'tab:red'
+    ax1.set_xlabel('Year')
+    ax1.set_ylabel(left[1], color=color)
+    ax1.plot(df_year["Year"], df_year[left[0]], color=color)
+    ax1.tick_params(axis='y', labelcolor=color)
+
+    ax2 = ax1.twinx()
+    color = 'tab:blue'
+    ax2.set_ylabel(right[1], color=color)
+    ax2.plot(df_year["Year"], df_year[right[0]], color=color)
+    ax2.tick_params(axis='y', labelcolor=color)
+
+    fig.tight_layout()
+    fig.set_size_inches(12, 8)
+    for figure_path in ([path] if isinstance(path, str) else path):
+        fig.savefig(figure_path)
+    plt.close(fig)
+
+
+def stage_plot(args):
+    import pandas as pd
+
+    df_year = pd.read_csv(YEARLY_PATH)
+    plot_years(df_year, rolling_years(df_year, args.window, args.window_kind))
+
+
+def plot_paths(directory=PLOTS_PATH, plot_pairs=PLOT_PAIRS):
+    """
+    Paths of the figures saved by plot_years.
+
+    :return: list of str
+    """
+    return [os.path.join(directory, "{} {} - {}.png".format(name, left[0], right[0]))
+            for name in ("yearly", "rolling") for left, right in plot_pairs]
+
+
+def plot_years(df_year, df_rolling, directory=PLOTS_PATH, plot_pairs=PLOT_PAIRS):
+    """
+    Saves the plots of each pair of yearly features, and of their rolling averages, and prints their correlations.
+
+    :param df_year: pd.DataFrame with 'Year'
+    :param df_rolling: pd.DataFrame with 'Year'
+    :param directory: str
+    :param plot_pairs: list of pairs of (column, axis label)
+    :return: list of str, the paths of the figures
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    os.makedirs(directory, exist_ok=True)
+    paths = iter(plot_paths(directory, plot_pairs))
+    for df in [df_year, df_rolling]:
+        for left, right in plot_pairs:
+            plot_pair(df, left, right, next(paths))
+            print(df[[left[0], right[0]]].corr())
+    return plot_paths(directory, plot_pairs)
+
+
+def stage_report(args):
+    import pandas as pd
+    from Report import default_specs, load_specs, render_report
+
+    specs = load_specs(args.specs) if args.specs else default_specs(windows=args.windows, kinds=args.window_kinds)
+    if len(args.yearly) == 1:
+        tables = {"": pd.read_csv(args.yearly[0])}
+    else:
+        tables = {os.path.splitext(os.path.basename(path))[0]: pd.read_csv(path) for path in args.yearly}
+    index_path = render_report(tables, specs, args.output, args.formats, args.workers)
+    print("Report written to {}".format(index_path))
+
+
+def render_wordcloud(path, mask_path='user.png', draft=False, reuse_layout=False, colormap=None,
+                     layout_path=WORDCLOUD_LAYOUT_PATH):
+    """
+    Saves a word cloud of all lyrics, from the word frequencies of the token store saved by song_features. The layout
+    (where each word goes) is saved, so that the word cloud can be drawn again, e.g. recoloured, without placing the
+    words again; and a draft layout, which is much faster to compute, can be drawn at the final size.
+
+    :param path: str
+    :param mask_path: str, image giving the shape of the cloud
+    :param draft: bool, place the words on a smaller canvas (or with reuse_layout, draw at the layout's size)
+    :param reuse_layout: bool, draw the saved layout instead of placing the words
+    :param colormap: str, matplotlib colormap to recolour the words with
+    :param layout_path: str
+    :return: str, the path
+    """
+    from WordCloudRender import load_mask, compute_layout, save_layout, load_layout, render_layout, DRAFT_FACTOR
+
+    if reuse_layout:
+        word_cloud, factor = load_layout(layout_path)
+        return render_layout(word_cloud, path, 1 if draft else factor, colormap)
+
+    from TokenStore import load_token_store, word_frequencies
+    from wordcloud import STOPWORDS
+
+    factor = DRAFT_FACTOR if draft else 1
+    with stage("word frequencies"):
+        word_frequencies_all = word_frequencies(load_token_store(TOKEN_STORE_PATH), STOPWORDS)
+    with stage("layout"):
+        mask = load_mask(mask_path, factor, MASK_CACHE_PATH)
+        word_cloud = compute_layout(word_frequencies_all.to_dict(), mask, draft)
+    save_layout(word_cloud, layout_path, factor)
+    with stage("render"):
+        return render_layout(word_cloud, path, 1, colormap)
+
+
+def stage_wordcloud(args):
+    render_wordcloud(args.output, draft=args.draft, reuse_layout=args.reuse_layout, colormap=args.colormap)
+
+
+def stage_lexicons(args):
+    from CorpusStore import load_corpus
+    from LexiconProfile import lexicon_report
+
+    df_lyrics = clean_lyrics(load_corpus(args.corpus, columns=["Song Title", "Date", "Lyrics"], compact=True))
+    df_profile, df_issues = lexicon_report(load_lexicons(), df_lyrics["Lyrics"])
+    if args.strict and len(df_issues):
+        sys.exit(1)
+
+
+def read_lyrics(corpus):
+    """
+    Reads the titles, dates and lyrics of a corpus with compact dtypes, converting the pickled corpus first if needed.
+
+    :param corpus: str, path of the Arrow corpus
+    :return: pd.DataFrame
+    """
+    from CorpusStore import load_corpus
+
+    return load_corpus(corpus, columns=["Song Title", "Date", "Lyrics"], compact=True)
+
+
+def clean_corpus(df_lyrics, search_for=SEARCH_FOR, dedup_threshold=0.8):
+    """
+    Cleans a corpus (see clean_lyrics) and drops its near-duplicate songs (see remove_duplicates).
+
+    :param df_lyrics: pd.DataFrame with 'Song Title', 'Date' and 'Lyrics'
+    :param search_for: list of regex patterns of song titles to drop
+    :param dedup_threshold: float, lyrics similarity above which songs are near-duplicates (1 to keep them all)
+    :return: pd.DataFrame
+    """
+    return remove_duplicates(clean_lyrics(df_lyrics, search_for), dedup_threshold)
+
+
+def save_song_features(df_lyrics, workers=None):
+    """
+    song_features, also saving the features where the features stage does, for the aggregate and add-songs stages.
+
+    :param df_lyrics: pd.DataFrame with 'Song Title', 'Date', 'Year' and 'Lyrics'
+    :param workers: int, number of worker processes
+    :return: pd.DataFrame with 'Song Title', 'Date', 'Year' and the features
+    """
+    from CorpusStore import write_corpus
+
+    df_songs = song_features(df_lyrics, workers)
+    write_corpus(df_songs, SONG_FEATURES_PATH)
+    return df_songs
+
+
+def yearly_features(df_songs):
+    """
+    Per-year averages of the features and vocabulary measures of the songs, without imputing missing years.
+
+    :param df_songs: pd.DataFrame with 'Year' and the per-song features, in the order of the saved token store
+    :return: pd.DataFrame
+    """
+    return average_years(df_songs, year_vocabulary(df_songs))
+
+
+def write_yearly(df_year, first_year=None, last_year=None, method="linear"):
+    """
+    Imputes the years without songs (see impute_years) and saves the yearly table as a CSV file.
+
+    :param df_year: pd.DataFrame indexed by year, as returned by yearly_features
+    :param first_year: int, first year of the table
+    :param last_year: int, last year of the table
+    :param method: str, see TimeSeries.IMPUTATIONS
+    :return: pd.DataFrame
+    """
+    df_year = impute_years(df_year, first_year, last_year, method)
+    os.makedirs(OUTPUTS, exist_ok=True)
+    df_year.to_csv(YEARLY_PATH, index=False)
+    return df_year
+
+
+def word_cloud_of(df_songs, path, mask_path='user.png'):
+    """
+    Draws the word cloud of the saved token store (see render_wordcloud).
+
+    :param df_songs: pd.DataFrame, only an input so that the word cloud is redrawn whenever the token store changes
+    :param path: str, image file
+    :param mask_path: str, image giving the shape of the word cloud
+    :return: str, the path
+    """
+    return render_wordcloud(path, mask_path)
+
+
+def make_graph(args):
+    """
+    The analysis as a pipeline of stages (see PipelineGraph): load, clean, features, yearly, impute, rolling, plots
+    and wordcloud. Each stage lists the code, files and options its result depends on, so that e.g. changing the
+    rolling window only reruns the rolling and plots stages.
+
+    :param args: argparse.Namespace, the options of the run command
+    :return: PipelineGraph
+    """
+    from PipelineGraph import PipelineGraph
+
+    graph = PipelineGraph(STAGES_PATH)
+    graph.add("load", read_lyrics, files=[args.corpus], params={"corpus": args.corpus}, code=["CorpusStore"],
+              persist=False)
+    graph.add("clean", clean_corpus, inputs=["load"],
+              code=[clean_lyrics, clean_lyrics_text, remove_duplicates, "Deduplication"],
+              params={"search_for": SEARCH_FOR if args.title_filter else None,
+                      "dedup_threshold": args.dedup_threshold})
+    graph.add("features", save_song_features, inputs=["clean"], files=list(LEXICON_PATHS.values()),
+              options={"workers": args.workers}, outputs=[TOKEN_STORE_PATH, SONG_FEATURES_PATH],
+              code=[song_features, load_lexicons, open_feature_cache, features_of_songs, "Functions", "TokenStore",
+                    "FeatureExtraction", "FeatureCache"])
+    graph.add("yearly", yearly_features, inputs=["features"], code=[year_vocabulary, average_years, "TokenStore"])
+    graph.add("impute", write_yearly, inputs=["yearly"], code=[impute_years, "TimeSeries"], outputs=[YEARLY_PATH],
+              params={"first_year": args.first_year, "last_year": args.last_year, "method": args.impute})
+    graph.add("rolling", rolling_years, inputs=["impute"], code=["TimeSeries"],
+              params={"window": args.window, "kind": args.window_kind})
+    graph.add("plots", plot_years, inputs=["impute", "rolling"], code=[plot_paths, plot_pair],
+              params={"directory": PLOTS_PATH, "plot_pairs": PLOT_PAIRS}, outputs=plot_paths())
+    graph.add("wordcloud", word_cloud_of, inputs=["features"], files=['user.png'],
+              code=[render_wordcloud, "WordCloudRender"], params={"path": args.output, "mask_path": 'user.png'},
+              outputs=[args.output])
+    return graph
+
+
+def stage_run(args):
+    graph = make_graph(args)
+    status = graph.run(args.targets, args.force)
+    for name, state in status.items():
+        print("{:<12} {}".format(name, state))
+
+
+def stage_artists(args):
+    import pandas as pd
+    from CorpusStore import artist_corpora, read_corpus, write_artist_corpora
+    from Artists import analyze_artists
+
+    for corpus, artist in args.add:
+        df_lyrics = read_corpus(corpus, compact=True)
+        df_lyrics["Artist"] = artist
+        try:
+            write_artist_corpora(df_lyrics, args.directory)
+        except ValueError as e:
+            sys.exit(str(e))
+    corpora = artist_corpora(args.directory)
+    if args.artists:
+        missing = [artist for artist in args.artists if artist not in corpora]
+        if missing:
+            sys.exit("No corpus in {} for {}".format(args.directory, ", ".join(missing)))
+        corpora = {artist: corpora[artist] for artist in args.artists}
+    if not corpora:
+        sys.exit("No artist corpora in {}; ingest them with --artist or add a corpus with --add".format(
+            args.directory))
+
+    df_comparison = analyze_artists(corpora, args.outputs, args.workers, dedup_threshold=args.dedup_threshold,
+                                    chunk_size=args.chunk_size, sketch=args.sketch, first_year=args.first_year,
+                                    last_year=args.last_year, impute=args.impute)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    df_comparison.to_csv(args.output)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(df_comparison)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description="Analysis of an artist's lyrics over the years")
+    parser.add_argument("--trace", action="store_true",
+                        help="record the time and memory of each step in {}".format(TRACE_PATH))
+    parser.add_argument("--trace-memory", action="store_true", help="also trace allocations (slower)")
+    parser.add_argument("--trace-functions", action="store_true",
+                        help="also count the calls and time of the Functions.py functions")
+    subparsers = parser.add_subparsers(dest="stage", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="scrape the lyrics into the corpus file")
+    ingest_parser.add_argument("--artist", nargs="+", default=["Kanye West"],
+                               help="one or more artists; several artists are stored partitioned by artist")
+    ingest_parser.add_argument("--partitioned", action="store_true",
+                               help="store a single artist in the partitioned corpus too")
+    ingest_parser.add_argument("--artists-directory", default="Artists", help="directory of the partitioned corpus")
+    ingest_parser.add_argument("--token", help="Genius API token (default: $GENIUS_TOKEN)")
+    ingest_parser.add_argument("--replay", action="store_true", help="only use cached responses")
+    ingest_parser.add_argument("--corpus", default="lyrics.arrow")
+    ingest_parser.set_defaults(run=stage_ingest)
+
+    features_parser = subparsers.add_parser("features", help="clean the corpus and calculate the per-song features")
+    features_parser.add_argument("--corpus", default="lyrics.arrow")
+    features_parser.add_argument("--workers", type=int, help="number of worker processes")
+    features_parser.add_argument("--no-title-filter", dest="title_filter", action="store_false",
+                                 help="don't drop the songs matching the manual title blacklist")
+    features_parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                                 help="lyrics similarity above which songs are near-duplicates (1 to keep them all)")
+    features_parser.add_argument("--memory-budget",
+                                 help="e.g. 4G; above it the corpus is processed in chunks (default: "
+                                      "$LYRICS_MEMORY_BUDGET or half of the memory)")
+    features_parser.add_argument("--chunk-size", type=int, default=CORPUS_CHUNK_SIZE,
+                                 help="number of songs per chunk when processing in chunks")
+    features_parser.set_defaults(run=stage_features)
+
+    aggregate_parser = subparsers.add_parser("aggregate", help="average the features per year")
+    aggregate_parser.add_argument("--first-year", type=int)
+    aggregate_parser.add_argument("--last-year", type=int)
+    aggregate_parser.add_argument("--impute", default="linear",
+                                  help="how to fill in the years without songs: linear, nearest, ffill, zero, none, "
+                                       "or another pandas interpolation method")
+    aggregate_parser.add_argument("--sketch", action="store_true",
+                                  help="estimate the vocabulary sizes with HyperLogLog sketches (for huge corpora)")
+    aggregate_parser.set_defaults(run=stage_aggregate)
+
+    stream_parser = subparsers.add_parser("stream", help="features and per-year averages of a corpus larger than the "
+                                                         "memory, a chunk of songs at a time")
+    stream_parser.add_argument("--corpus", default="lyrics.arrow")
+    stream_parser.add_argument("--chunk-size", type=int, default=CORPUS_CHUNK_SIZE, help="number of songs per chunk")
+    stream_parser.add_argument("--workers", type=int, help="number of worker processes")
+    stream_parser.add_argument("--no-title-filter", dest="title_filter", action="store_false",
+                               help="don't drop the songs matching the manual title blacklist")
+    stream_parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                               help="lyrics similarity above which songs are near-duplicates (1 to keep them all)")
+    stream_parser.add_argument("--sketch", action="store_true",
+                               help="estimate the vocabulary sizes with HyperLogLog sketches")
+    stream_parser.add_argument("--first-year", type=int)
+    stream_parser.add_argument("--last-year", type=int)
+    stream_parser.add_argument("--impute", default="linear", help="how to fill in the years without songs")
+    stream_parser.set_defaults(run=stage_stream)
+
+    add_parser = subparsers.add_parser("add-songs", help="add new songs to the saved per-year state and table")
+    add_parser.add_argument("lyrics", nargs="+", help="text files with the lyrics of each song")
+    add_parser.add_argument("--title", nargs="+", required=True, help="title of each song")
+    add_parser.add_argument("--date", nargs="+", required=True, help="release date of each song, e.g. 2026-10-01")
+    add_parser.add_argument("--corpus", default="lyrics.arrow", help="corpus the songs are added to")
+    add_parser.add_argument("--no-title-filter", dest="title_filter", action="store_false",
+                            help="don't drop the songs matching the manual title blacklist")
+    add_parser.add_argument("--first-year", type=int)
+    add_parser.add_argument("--last-year", type=int)
+    add_parser.add_argument("--impute", default="linear", help="how to fill in the years without songs")
+    add_parser.set_defaults(run=stage_add_songs)
+
+    plot_parser = subparsers.add_parser("plot", help="save the plots of the yearly features")
+    plot_parser.add_argument("--window", type=int, default=3, help="size of the rolling average window")
+    plot_parser.add_argument("--window-kind", default="trailing", choices=["trailing", "centered", "ewm"])
+    plot_parser.set_defaults(run=stage_plot)
+
+    report_parser = subparsers.add_parser("report", help="render all plots in parallel, with an HTML index")
+    report_parser.add_argument("--yearly", nargs="+", default=[YEARLY_PATH],
+                               help="yearly tables, e.g. one per artist (default: the output of aggregate)")
+    report_parser.add_argument("--specs", help="JSON file of figure specs (default: the figures of Analysis.py)")
+    report_parser.add_argument("--windows", type=int, nargs="+", default=[3], help="rolling average windows")
+    report_parser.add_argument("--window-kinds", nargs="+", default=["trailing"],
+                               choices=["trailing", "centered", "ewm"])
+    report_parser.add_argument("--formats", nargs="+", default=["png"], help="e.g. png svg")
+    report_parser.add_argument("--workers", type=int, help="number of worker processes")
+    report_parser.add_argument("--output", default=REPORT_PATH)
+    report_parser.set_defaults(run=stage_report)
+
+    wordcloud_parser = subparsers.add_parser("wordcloud", help="save a word cloud of all lyrics")
+    wordcloud_parser.add_argument("--output", default=os.path.join(OUTPUTS, 'wordcloud.png'))
+    wordcloud_parser.add_argument("--draft", action="store_true",
+                                  help="place the words on a smaller canvas, for a quick preview")
+    wordcloud_parser.add_argument("--reuse-layout", action="store_true",
+                                  help="draw the layout of the previous run, at the final size unless --draft")
+    wordcloud_parser.add_argument("--colormap", help="matplotlib colormap to recolour the words with")
+    wordcloud_parser.set_defaults(run=stage_wordcloud)
+
+    lexicons_parser = subparsers.add_parser("lexicons", help="profile and check the lexicon patterns")
+    lexicons_parser.add_argument("--corpus", default="lyrics.arrow")
+    lexicons_parser.add_argument("--strict", action="store_true", help="exit with an error if any problem is found")
+    lexicons_parser.set_defaults(run=stage_lexicons)
+
+    artists_parser = subparsers.add_parser("artists", help="features and per-year averages of each artist in "
+                                                           "parallel, and a comparison of the artists")
+    artists_parser.add_argument("--directory", default="Artists", help="directory of the partitioned corpus")
+    artists_parser.add_argument("--artists", nargs="+", help="only these artists (default: all)")
+    artists_parser.add_argument("--add", nargs=2, action="append", default=[], metavar=("CORPUS", "ARTIST"),
+                                help="first add a single-artist corpus file to the partitioned corpus")
+    artists_parser.add_argument("--workers", type=int, help="number of worker processes")
+    artists_parser.add_argument("--chunk-size", type=int, default=CORPUS_CHUNK_SIZE,
+                                help="number of songs per chunk")
+    artists_parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                                help="lyrics similarity above which songs are near-duplicates (1 to keep them all)")
+    artists_parser.add_argument("--sketch", action="store_true",
+                                help="estimate the vocabulary sizes with HyperLogLog sketches")
+    artists_parser.add_argument("--first-year", type=int)
+    artists_parser.add_argument("--last-year", type=int)
+    artists_parser.add_argument("--impute", default="linear", help="how to fill in the years without songs")
+    artists_parser.add_argument("--outputs", default=os.path.join(OUTPUTS, 'Artists'),
+                                help="directory of the yearly tables and features of each artist")
+    artists_parser.add_argument("--output", default=os.path.join(OUTPUTS, 'artist_comparison.csv'),
+                                help="comparison table")
+    artists_parser.set_defaults(run=stage_artists)
+
+    run_parser = subparsers.add_parser("run", help="run the stages which are out of date")
+    run_parser.add_argument("targets", nargs="*", metavar="stage",
+                            help="stages to bring up to date, with those they depend on (default: all)")
+    run_parser.add_argument("--force", nargs="+", default=[], metavar="stage",
+                            help="rerun these stages and those depending on them")
+    run_parser.add_argument("--corpus", default="lyrics.arrow")
+    run_parser.add_argument("--workers", type=int, help="number of worker processes")
+    run_parser.add_argument("--no-title-filter", dest="title_filter", action="store_false",
+                            help="don't drop the songs matching the manual title blacklist")
+    run_parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                            help="lyrics similarity above which songs are near-duplicates (1 to keep them all)")
+    run_parser.add_argument("--first-year", type=int)
+    run_parser.add_argument("--last-year", type=int)
+    run_parser.add_argument("--impute", default="linear", help="how to fill in the years without songs")
+    run_parser.add_argument("--window", type=int, default=3, help="size of the rolling average window")
+    run_parser.add_argument("--window-kind", default="trailing", choices=["trailing", "centered", "ewm"])
+    run_parser.add_argument("--output", default=os.path.join(OUTPUTS, 'wordcloud.png'), help="word cloud file")
+    run_parser.set_defaults(run=stage_run)
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    if not args.trace:
+        args.run(args)
+        return
+
+    import Functions
+    enable(trace_malloc=args.trace_memory, trace_modules=[Functions] if args.trace_functions else ())
+    with stage(args.stage):
+        args.run(args)
+    write_trace(TRACE_PATH, CHROME_TRACE_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+import time
+from collections import namedtuple
+from Instrumentation import stage as instrumented_stage
+
+
+Stage = namedtuple('Stage', ['name', 'function', 'inputs', 'files', 'params', 'options', 'code', 'outputs',
+                             'persist'])
+
+
+def file_fingerprint(path):
+    """
+    SHA-1 of the contents of a file, or of the names and contents of all files in a directory ("missing" if the path
+    doesn't exist).
+
+    :param path: str
+    :return: str
+    """
+    if not os.path.exists(path):
+        return "missing"
+    digest = hashlib.sha1()
+    if os.path.isdir(path):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        paths = [path]
+    for file_path in paths:
+        digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def code_fingerprint(code):
+    """
+    SHA-1 of the source of a function, or of the file of a module given by name (which isn't imported).
+
+    :param code: function or str
+    :return: str
+    """
+    if isinstance(code, str):
+        spec = importlib.util.find_spec(code)
+        if spec is None or not spec.origin or not os.path.exists(spec.origin):
+            return "missing"
+        return file_fingerprint(spec.origin)
+    return hashlib.sha1(inspect.getsource(code).encode("utf-8")).hexdigest()
+
+
+class PipelineGraph:
+    """
+    Pipeline of named stages with declared inputs. Each stage's result is saved together with a fingerprint of
+    everything it depends on: the source of the stage function and of the code it lists, its parameters, the
+    contents of its input files and the fingerprints of its upstream stages. When the pipeline is run again, a stage
+    whose fingerprint hasn't changed (and whose output files still exist) is skipped, and its saved result is only
+    loaded if a downstream stage has to run. So only the stages downstream of a change are executed.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: str, where the stage results and fingerprints are saved
+        """
+        self.directory = directory
+        self.stages = {}
+        self.values = {}
+        self.ran = []
+        self._fingerprints = {}
+
+    def add(self, name, function, inputs=(), files=(), params=None, options=None, code=(), outputs=(),
+            persist=True):
+        """
+        Declares a stage. The function is called with the results of the input stages, in order, and with params and
+        options as keyword arguments.
+
+        :param name: str
+        :param function: function
+        :param inputs: list of names of stages declared before
+        :param files: list of paths of input files or directories
+        :param params: dict of keyword arguments which change the result
+        :param options: dict of keyword arguments which don't change the result (e.g. number of workers)
+        :param code: list of functions or module names the stage depends on, besides the function itself
+        :param outputs: list of paths of files the stage writes besides its result
+        :param persist: bool, save the result (else it's recomputed whenever a downstream stage runs)
+        :return: None
+        """
+        for input_name in inputs:
+            if input_name not in self.stages:
+                raise ValueError("Stage {} must be declared before {}".format(input_name, name))
+        self.stages[name] = Stage(name, function, list(inputs), list(files), dict(params or {}), dict(options or {}),
+                                  list(code), list(outputs), persist)
+
+    def fingerprint(self, name):
+        """
+        Fingerprint of a stage, which changes whenever its result may change.
+
+        :param name: str
+        :return: str
+        """
+        if name not in self._fingerprints:
+            stage = self.stages[name]
+            contents = {"function": code_fingerprint(stage.function),
+                        "code": [code_fingerprint(code) for code in stage.code],
+                        "params": repr(sorted(stage.params.items())),
+                        "files": [file_fingerprint(path) for path in stage.files],
+                        "inputs": [self.fingerprint(input_name) for input_name in stage.inputs]}
+            self._fingerprints[name] = hashlib.sha1(json.dumps(contents, sort_keys=True).encode("utf-8")).hexdigest()
+        return self._fingerprints[name]
+
+    def _paths(self, name):
+        return os.path.join(self.directory, name + ".pkl"), os.path.join(self.directory, name + ".json")
+
+    def up_to_date(self, name):
+        """
+        Whether a stage's saved result matches its current fingerprint.
+
+        :param name: str
+        :return: bool
+        """
+        stage = self.stages[name]
+        value_path, manifest_path = self._paths(name)
+        if not stage.persist or not os.path.exists(value_path) or not os.path.exists(manifest_path):
+            return False
+        if not all(os.path.exists(path) for path in stage.outputs):
+            return False
+        with open(manifest_path) as f:
+            return json.load(f).get("fingerprint") == self.fingerprint(name)
+
+    def downstream(self, names):
+        """
+        The given stages and every stage depending on them, directly or not.
+
+        :param names: list of str
+        :return: set of str
+        """
+        result = set(names)
+        for stage in self.stages.values():
+            if any(input_name in result for input_name in stage.inputs):
+                result.add(stage.name)
+        return result
+
+    def upstream(self, names):
+        """
+        The given stages and every stage they depend on, directly or not.
+
+        :param names: list of str
+        :return: set of str
+        """
+        result = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name not in result:
+                result.add(name)
+                pending += self.stages[name].inputs
+        return result
+
+    def run(self, targets=None, force=()):
+        """
+        Brings the target stages (by default all) up to date, running only the stages whose fingerprint changed, the
+        forced stages and the stages downstream of those.
+
+        :param targets: list of str
+        :param force: list of str, stages to rerun regardless of their fingerprint
+        :return: dict of stage name -> "ran" or "up to date"
+        """
+        for name in list(targets or []) + list(force):
+            if name not in self.stages:
+                raise ValueError("Unknown stage {}; the stages are {}".format(name, ", ".join(self.stages)))
+        needed = self.upstream(targets or list(self.stages))
+        forced = self.downstream(force)
+        status = {}
+        for name, stage in self.stages.items():
+            if name not in needed:
+                continue
+            if not stage.persist:
+                # Computed on demand by the stages which need it
+                continue
+            changed = any(status.get(input_name) == "ran" for input_name in stage.inputs)
+            if name in forced or changed or not self.up_to_date(name):
+                self._run_stage(name)
+                status[name] = "ran"
+            else:
+                status[name] = "up to date"
+        return status
+
+    def value(self, name):
+        """
+        Result of a stage: from memory, from its saved result if up to date, or else by running it.
+
+        :param name: str
+        :return: anything
+        """
+        if name not in self.values:
+            if self.up_to_date(name):
+                with open(self._paths(name)[0], "rb") as f:
+                    self.values[name] = pickle.load(f)
+            else:
+                self._run_stage(name)
+        return self.values[name]
+
+    def _run_stage(self, name):
+        stage = self.stages[name]
+        arguments = [self.value(input_name) for input_name in stage.inputs]
+        start = time.perf_counter()
+        with instrumented_stage(name):
+            value = stage.function(*arguments, **stage.params, **stage.options)
+        seconds = time.perf_counter() - start
+        self.values[name] = value
+        self.ran.append(name)
+        if stage.persist:
+            os.makedirs(self.directory, exist_ok=True)
+            value_path, manifest_path = self._paths(name)
+            with open(value_path + ".tmp", "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(value_path + ".tmp", value_path)
+            # The manifest is written last, so an interrupted stage is never taken as up to date
+            with open(manifest_path, "w") as f:
+                json.dump({"fingerprint": self.fingerprint(name), "seconds": seconds,
+                           "time": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import html
+import json
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from Pipeline import PLOT_PAIRS, plot_pair, rolling_years
+
+
+# A figure of the report: two yearly features (column, axis label) on twin y-axes, either as they are ("yearly") or
+# as a moving average over window years of one of the kinds of TimeSeries.WINDOW_KINDS ("rolling" is "trailing")
+FigureSpec = namedtuple('FigureSpec', ['left', 'right', 'kind', 'window'])
+
+
+def default_specs(plot_pairs=PLOT_PAIRS, windows=(3,), kinds=("trailing",)):
+    """
+    The figures of Analysis.py: each pair of features, yearly and with each moving average window.
+
+    :param plot_pairs: list of pairs of (column, axis label)
+    :param windows: list of int
+    :param kinds: list of str, see TimeSeries.WINDOW_KINDS
+    :return: list of FigureSpec
+    """
+    specs = [FigureSpec(left, right, "yearly", None) for left, right in plot_pairs]
+    specs += [FigureSpec(left, right, kind, window)
+              for kind in kinds for window in windows for left, right in plot_pairs]
+    return specs
+
+
+def load_specs(path):
+    """
+    Loads figure specs from a JSON file: a list of {"left": [column, label], "right": [column, label],
+    "kind": "yearly", "trailing", "centered" or "ewm", "window": int}.
+
+    :param path: str
+    :return: list of FigureSpec
+    """
+    with open(path) as f:
+        return [FigureSpec(tuple(spec["left"]), tuple(spec["right"]), spec.get("kind", "yearly"), spec.get("window"))
+                for spec in json.load(f)]
+
+
+def figure_name(title, spec):
+    """
+    File name (without extension) of a figure.
+
+    :param title: str, title of the yearly table, e.g. the artist
+    :param spec: FigureSpec
+    :return: str
+    """
+    kind = spec.kind if spec.kind == "yearly" else "{} {}".format(spec.kind, spec.window)
+    name = " - ".join(part for part in (title, kind, spec.left[0], spec.right[0]) if part)
+    return re.sub(r'[^\w\- ]', '_', name)
+
+
+def init_worker():
+    # Workers draw without a display
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_figure(df_year, spec, paths):
+    """
+    Draws one figure and saves it in each format.
+
+    :param df_year: pd.DataFrame with 'Year', not yet averaged for moving average figures
+    :param spec: FigureSpec
+    :param paths: list of str
+    :return: float, the correlation of the two features in the figure
+    """
+    if spec.kind == "yearly":
+        df = df_year
+    else:
+        df = rolling_years(df_year, spec.window, "trailing" if spec.kind == "rolling" else spec.kind)
+    plot_pair(df, spec.left, spec.right, paths)
+    return float(df[spec.left[0]].corr(df[spec.right[0]]))
+
+
+def render_report(tables, specs, directory, formats=("png",), n_workers=None, title="Lyrics over the years"):
+    """
+    Renders every figure of every yearly table in worker processes, without a display, and writes an HTML index of
+    the figures (index.html in the directory).
+
+    :param tables: dict of title (e.g. artist) -> yearly pd.DataFrame with 'Year'
+    :param specs: list of FigureSpec
+    :param directory: str
+    :param formats: list of file formats supported by matplotlib, e.g. ("png", "svg")
+    :param n_workers: int, number of worker processes (default: number of CPUs; 1 to render in this process)
+    :param title: str, title of the HTML page
+    :return: str, path of the HTML index
+    """
+    os.makedirs(directory, exist_ok=True)
+    tasks = []
+    for table_title, df_year in tables.items():
+        for spec in specs:
+            name = figure_name(table_title, spec)
+            tasks.append((table_title, spec, [os.path.join(directory, name + "." + extension)
+                                              for extension in formats]))
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(tasks) == 1:
+        init_worker()
+        correlations = [render_figure(tables[table_title], spec, paths) for table_title, spec, paths in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(tasks)), initializer=init_worker) as executor:
+            correlations = list(executor.map(render_figure, [tables[task[0]] for task in tasks],
+                                             [task[1] for task in tasks], [task[2] for task in tasks],
+                                             chunksize=max(1, len(tasks) // (4 * n_workers))))
+
+    index_path = os.path.join(directory, "index.html")
+    with open(index_path, "w", encoding="utf-8") as f:
+        f.write(_index_html(tasks, correlations, title, directory))
+    return index_path
+
+
+def _index_html(tasks, correlations, title, directory):
+    parts = ["<!DOCTYPE html>", "<html><head><meta charset='utf-8'><title>{}</title>".format(html.escape(title)),
+             "<style>body{font-family:sans-serif} figure{display:inline-block;margin:1em} "
+             "img{width:600px}</style></head><body>", "<h1>{}</h1>".format(html.escape(title))]
+    current_title = None
+    for (table_title, spec, paths), correlation in zip(tasks, correlations):
+        if table_title != current_title:
+            current_title = table_title
+            if table_title:
+                parts.append("<h2>{}</h2>".format(html.escape(table_title)))
+        kind = "yearly" if spec.kind == "yearly" else "{}-year {} average".format(spec.window, spec.kind)
+        links = " ".join("<a href='{}'>{}</a>".format(html.escape(os.path.relpath(path, directory)),
+                                                      os.path.splitext(path)[1][1:]) for path in paths)
+        parts.append("<figure><img src='{}' alt='{}'><figcaption>{} vs. {} ({}), correlation {:.2f} {}"
+                     "</figcaption></figure>".format(html.escape(os.path.relpath(paths[0], directory)),
+                                                     html.escape(figure_name(table_title, spec)),
+                                                     html.escape(spec.left[1]), html.escape(spec.right[1]), kind,
+                                                     correlation, links))
+    parts.append("</body></html>")
+    return "\n".join(parts)
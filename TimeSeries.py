@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Kinds of moving averages: trailing (the period and the window - 1 before it, as DataFrame.rolling), centered
+# (the period in the middle of the window, as DataFrame.rolling(center=True)), and exponentially weighted with a span
+# of window periods (as DataFrame.ewm(span=window))
+WINDOW_KINDS = ("trailing", "centered", "ewm")
+
+# Imputation methods besides those of DataFrame.interpolate: "ffill" repeats the last known value, "zero" fills in
+# zeros and "none" leaves the gaps
+IMPUTATIONS = ("linear", "nearest", "ffill", "zero", "none")
+
+# Columns which are counts, so a period without songs gets 0 rather than an imputed value
+COUNT_COLUMNS = ("Number of Songs",)
+
+
+def metric_columns(df_period, period_column="Year"):
+    """
+    The numeric columns of a per-period table, other than the period.
+
+    :param df_period: pd.DataFrame
+    :param period_column: str
+    :return: list of str
+    """
+    return [column for column in df_period.select_dtypes("number").columns if column != period_column]
+
+
+def reindex_periods(df_period, first=None, last=None, period_column="Year", step=1):
+    """
+    Puts a per-period table on a full calendar in one operation: one row per period from first to last, with NaN
+    for the periods which weren't in the table.
+
+    :param df_period: pd.DataFrame indexed by period, or with a period column
+    :param first: int, first period (defaults to the first period of the table)
+    :param last: int, last period (defaults to the last period of the table)
+    :param period_column: str
+    :param step: int, length of a period in the calendar's unit
+    :return: pd.DataFrame with a period column and a RangeIndex
+    """
+    if period_column in df_period.columns:
+        df_period = df_period.set_index(period_column)
+    first = df_period.index.min() if first is None else first
+    last = df_period.index.max() if last is None else last
+    df_period = df_period.reindex(pd.RangeIndex(first, last + 1, step, name=period_column))
+    return df_period.reset_index()
+
+
+def impute(df_period, method="linear", count_columns=COUNT_COLUMNS, period_column="Year"):
+    """
+    Fills in the missing values of a per-period table, e.g. the periods added by reindex_periods.
+
+    :param df_period: pd.DataFrame with a period column
+    :param method: str, one of IMPUTATIONS or a DataFrame.interpolate method
+    :param count_columns: list of str, columns filled with 0 whatever the method
+    :param period_column: str
+    :return: pd.DataFrame
+    """
+    df_period = df_period.copy()
+    counts = [column for column in count_columns if column in df_period.columns]
+    df_period[counts] = df_period[counts].fillna(0)
+    columns = [column for column in metric_columns(df_period, period_column) if column not in counts]
+    if method == "none" or not columns:
+        return df_period
+    if method == "zero":
+        df_period[columns] = df_period[columns].fillna(0)
+    elif method == "ffill":
+        df_period[columns] = df_period[columns].ffill()
+    else:
+        df_period[columns] = df_period[columns].interpolate(method=method)
+    return df_period
+
+
+def _window_sums(values):
+    # Cumulative sums and numbers of non-missing values of all columns, with a row of zeros first, from which the sum
+    # of any window of rows is the difference of two rows: (sums, counts), each of shape (rows + 1, columns)
+    valid = ~np.isnan(values)
+    zero_row = np.zeros((1, values.shape[1]))
+    sums = np.vstack([zero_row, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    counts = np.vstack([zero_row, np.cumsum(valid, axis=0)])
+    return sums, counts
+
+
+def _ewm_averages(values, windows, min_periods=0):
+    # Exponentially weighted averages with a span of each window size, as DataFrame.ewm(span=window).mean(), for all
+    # window sizes and columns at once: each period's weighted sum and sum of weights decay by 1 - alpha per period
+    decay = (1 - 2 / (np.array(windows, dtype='float64') + 1))[:, None]
+    valid = ~np.isnan(values)
+    weighted_values = np.where(valid, values, 0.0)
+    sums = np.zeros((len(windows), values.shape[1]))
+    weights = np.zeros((len(windows), values.shape[1]))
+    averages = np.empty((len(windows),) + values.shape)
+    previous = np.full(sums.shape, np.nan)
+    observations = np.cumsum(valid, axis=0)
+    for row in range(len(values)):
+        sums = sums * decay + weighted_values[row]
+        weights = weights * decay + valid[row]
+        # A missing value keeps the previous average (which matters when the weights have decayed to 0, for span 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            previous = np.where(weights > 0, sums / weights, previous)
+        # Like DataFrame.ewm, there is no average before min_periods values
+        averages[:, row] = np.where(observations[row] >= max(min_periods, 1), previous, np.nan)
+    return dict(zip(windows, averages))
+
+
+def _moving_averages(values, windows, kind, window_sums=None, min_periods=None):
+    # Moving averages of each column of values for each window size: {window: np.array like values}
+    if kind == "ewm":
+        return _ewm_averages(values, windows, min_periods or 0)
+    if kind not in WINDOW_KINDS:
+        raise ValueError("Unknown window kind {}; the kinds are {}".format(kind, ", ".join(WINDOW_KINDS)))
+
+    sums, counts = window_sums if window_sums is not None else _window_sums(values)
+    rows = np.arange(len(values))
+    averages = {}
+    for window in windows:
+        # The window of row i ends window - 1 rows after it if trailing, (window - 1) // 2 rows after it if centered,
+        # and is cut at the first and last rows
+        end = rows + (0 if kind == "trailing" else (window - 1) // 2) + 1
+        start = np.clip(end - window, 0, len(values))
+        end = np.clip(end, 0, len(values))
+        window_counts = counts[end] - counts[start]
+        # Like DataFrame.rolling, a window with fewer than min_periods values (by default, any missing value) has no
+        # average
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages[window] = np.where(window_counts >= max(window if min_periods is None else min_periods, 1),
+                                        (sums[end] - sums[start]) / window_counts, np.nan)
+    return averages
+
+
+def moving_average(df_period, window=3, kind="trailing", columns=None, period_column="Year", min_periods=None):
+    """
+    Moving average of every metric of a per-period table, computed for all columns as one block. The period column
+    is kept as it is, not averaged.
+
+    :param df_period: pd.DataFrame with a period column
+    :param window: int, number of periods (the span for "ewm")
+    :param kind: str, one of WINDOW_KINDS
+    :param columns: list of str, the metrics (default: all numeric columns but the period)
+    :param period_column: str
+    :param min_periods: int, number of non-missing values needed for an average, as in DataFrame.rolling and
+                        DataFrame.ewm (default: the window, or 0 for "ewm")
+    :return: pd.DataFrame like df_period
+    """
+    columns = metric_columns(df_period, period_column) if columns is None else list(columns)
+    values = df_period[columns].to_numpy(dtype='float64')
+    df_average = df_period.copy()
+    df_average[columns] = _moving_averages(values, [window], kind, min_periods=min_periods)[window]
+    return df_average
+
+
+def moving_average_sweep(df_period, windows, kinds=WINDOW_KINDS, columns=None, period_column="Year",
+                         min_periods=None):
+    """
+    Moving averages of every metric for every window size and kind, sharing one cumulative sum between all the
+    trailing and centered windows.
+
+    :param df_period: pd.DataFrame with a period column
+    :param windows: list of int
+    :param kinds: list of str, from WINDOW_KINDS
+    :param columns: list of str, the metrics (default: all numeric columns but the period)
+    :param period_column: str
+    :param min_periods: int, see moving_average
+    :return: pd.DataFrame indexed by period, with (kind, window, metric) columns
+    """
+    columns = metric_columns(df_period, period_column) if columns is None else list(columns)
+    values = df_period[columns].to_numpy(dtype='float64')
+    windows = list(windows)
+    window_sums = _window_sums(values)
+    blocks = []
+    keys = []
+    for kind in kinds:
+        averages = _moving_averages(values, windows, kind, window_sums, min_periods)
+        for window in windows:
+            blocks.append(averages[window])
+            keys += [(kind, window, column) for column in columns]
+    return pd.DataFrame(np.hstack(blocks), index=pd.Index(df_period[period_column], name=period_column),
+                        columns=pd.MultiIndex.from_tuples(keys, names=["Kind", "Window", "Metric"]))
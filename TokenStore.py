@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import os
+from array import array
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from Functions import list_conventional_words, stem_word
+
+
+# A tokenized corpus: every distinct conventional word is stored once in the vocabulary, and the songs are one flat
+# array of vocabulary ids, where the tokens of song i are token_ids[offsets[i]:offsets[i + 1]]
+TokenStore = namedtuple('TokenStore', ['vocabulary', 'token_ids', 'offsets', 'index'])
+
+STORE_FILES = {'vocabulary': 'vocabulary.npy', 'token_ids': 'token_ids.npy', 'offsets': 'offsets.npy',
+               'index': 'index.npy'}
+
+
+def build_token_store(lyrics_series):
+    """
+    Tokenizes each song once into conventional words (see list_conventional_words) and interns them.
+
+    :param lyrics_series: pd.Series of str
+    :return: TokenStore
+    """
+    word_ids = {}
+    token_ids = array('i')
+    offsets = array('q', [0])
+    for lyrics in lyrics_series:
+        for word in list_conventional_words(lyrics):
+            word_id = word_ids.get(word)
+            if word_id is None:
+                word_id = word_ids[word] = len(word_ids)
+            token_ids.append(word_id)
+        offsets.append(len(token_ids))
+
+    vocabulary = np.array(list(word_ids), dtype=str)
+    # The arrays share the buffers of the token and offset arrays (which aren't appended to anymore), rather than
+    # copying them
+    return TokenStore(vocabulary, np.frombuffer(token_ids, dtype='int32'), np.frombuffer(offsets, dtype='int64'),
+                      np.asarray(lyrics_series.index))
+
+
+def concat_token_stores(stores):
+    """
+    Joins the token stores of consecutive parts of a corpus (e.g. tokenized chunk by chunk) into the token store
+    build_token_store would have built from the whole corpus, with the words in order of first appearance.
+
+    :param stores: list of TokenStore
+    :return: TokenStore
+    """
+    if not stores:
+        return TokenStore(np.array([], dtype=str), np.zeros(0, dtype='int32'), np.zeros(1, dtype='int64'),
+                          np.array([], dtype='int64'))
+    words = np.concatenate([store.vocabulary for store in stores])
+    unique_words, first, inverse = np.unique(words, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    word_ids = np.empty(len(order), dtype='int32')
+    word_ids[order] = np.arange(len(order), dtype='int32')
+    entry_ids = word_ids[inverse.ravel()]
+
+    # The tokens are written into one preallocated array, so that only one chunk's tokens are ever copied twice
+    token_ids = np.empty(sum(len(store.token_ids) for store in stores), dtype='int32')
+    offsets = [np.zeros(1, dtype='int64')]
+    n_words = 0
+    n_tokens = 0
+    for store in stores:
+        token_ids[n_tokens:n_tokens + len(store.token_ids)] = \
+            entry_ids[n_words:n_words + len(store.vocabulary)][store.token_ids]
+        offsets.append(store.offsets[1:] + n_tokens)
+        n_words += len(store.vocabulary)
+        n_tokens += len(store.token_ids)
+    return TokenStore(unique_words[order], token_ids, np.concatenate(offsets),
+                      np.concatenate([store.index for store in stores]))
+
+
+def save_token_store(store, directory):
+    """
+    Saves a token store as one .npy file per field, so that it can be memory-mapped when loaded.
+
+    :param store: TokenStore
+    :param directory: str
+    :return: None
+    """
+    os.makedirs(directory, exist_ok=True)
+    for field, file_name in STORE_FILES.items():
+        np.save(os.path.join(directory, file_name), getattr(store, field))
+
+
+def load_token_store(directory, mmap_mode='r'):
+    """
+    Loads a token store saved by save_token_store. By default the arrays are memory-mapped rather than read.
+
+    :param directory: str
+    :param mmap_mode: str or None, passed on to np.load
+    :return: TokenStore
+    """
+    fields = {field: np.load(os.path.join(directory, file_name), mmap_mode=mmap_mode)
+              for field, file_name in STORE_FILES.items()}
+    return TokenStore(**fields)
+
+
+def song_lengths(store):
+    """
+    Number of tokens in each song.
+
+    :param store: TokenStore
+    :return: np.array
+    """
+    return np.diff(store.offsets)
+
+
+def stem_vocabulary(store, stemmer=None):
+    """
+    Stems each vocabulary entry once, instead of each token occurrence.
+
+    :param store: TokenStore
+    :param stemmer: nltk stemmer, defaults to the shared cached stemmer (see Functions.stem_word)
+    :return: stems: np.array of str, stem_ids: np.array of the stem id of each vocabulary entry
+    """
+    stem = stem_word if stemmer is None else stemmer.stem
+    stems, stem_ids = np.unique(np.array([stem(word) for word in store.vocabulary], dtype=str),
+                                return_inverse=True)
+    return stems, stem_ids.astype('int32')
+
+
+def stem_stopword_mask(stems, stops):
+    """
+    Flags the stems which are stopwords.
+
+    :param stems: np.array of str
+    :param stops: list of str
+    :return: np.array of bool
+    """
+    return np.isin(stems, list(stops))
+
+
+def lexical_density(store, stem_ids, stop_mask):
+    """
+    Ratio of non-stopwords to total words in each song, in percent (0 for songs without words). As in the BoW
+    based calculation, a word is a stopword if its stem is.
+
+    :param store: TokenStore
+    :param stem_ids: np.array, stem id of each vocabulary entry
+    :param stop_mask: np.array of bool, stopword flag of each stem
+    :return: np.array
+    """
+    # One bool per token: the flags are looked up per vocabulary entry first, and summed per song with reduceat
+    # rather than through a cumulative sum of 8 bytes per token
+    non_stop = (~stop_mask[stem_ids])[store.token_ids]
+    total_words = song_lengths(store)
+    density = np.zeros(len(total_words))
+    has_words = total_words > 0
+    if has_words.any():
+        non_stop_words = np.add.reduceat(non_stop, store.offsets[:-1][has_words], dtype='int64')
+        density[has_words] = non_stop_words / total_words[has_words] * 100
+    return density
+
+
+def song_tokens(store, rows):
+    """
+    Concatenated token ids of the given songs.
+
+    :param store: TokenStore
+    :param rows: array of song positions (not index labels)
+    :return: np.array
+    """
+    rows = np.asarray(rows)
+    if len(rows) == 0:
+        return np.zeros(0, dtype='int32')
+    return np.concatenate([store.token_ids[store.offsets[row]:store.offsets[row + 1]] for row in rows])
+
+
+def vocabulary_size(store, stem_ids, stop_mask, rows=None):
+    """
+    Number of unique stems in the given songs (all songs by default), leaving out stopwords and the empty word.
+
+    :param store: TokenStore
+    :param stem_ids: np.array, stem id of each vocabulary entry
+    :param stop_mask: np.array of bool, stopword flag of each stem
+    :param rows: array of song positions
+    :return: int
+    """
+    tokens = store.token_ids if rows is None else song_tokens(store, rows)
+    present = np.zeros(len(stop_mask), dtype=bool)
+    present[stem_ids[tokens]] = True
+    present &= ~stop_mask
+    empty = np.flatnonzero(store.vocabulary == '')
+    if len(empty):
+        present[stem_ids[empty]] = False
+    return int(present.sum())
+
+
+def lexical_diversity(store, stem_ids, stop_mask, rows=None):
+    """
+    Vocabulary size divided by the total number of words in the given songs (all songs by default).
+
+    :param store: TokenStore
+    :param stem_ids: np.array, stem id of each vocabulary entry
+    :param stop_mask: np.array of bool, stopword flag of each stem
+    :param rows: array of song positions
+    :return: float
+    """
+    total_words = len(store.token_ids) if rows is None else int(song_lengths(store)[np.asarray(rows)].sum())
+    if total_words == 0:
+        return 0.0
+    return vocabulary_size(store, stem_ids, stop_mask, rows) / total_words
+
+
+def word_frequencies(store, stopwords=(), rows=None):
+    """
+    Frequency of each (unstemmed) word in the given songs, without stopwords and the empty word, e.g. for
+    WordCloud.generate_from_frequencies.
+
+    :param store: TokenStore
+    :param stopwords: collection of str
+    :param rows: array of song positions
+    :return: pd.Series indexed by word, sorted by decreasing frequency
+    """
+    tokens = store.token_ids if rows is None else song_tokens(store, rows)
+    counts = np.bincount(tokens, minlength=len(store.vocabulary))
+    keep = (counts > 0) & (store.vocabulary != '') & ~np.isin(store.vocabulary, list(stopwords))
+    frequencies = pd.Series(counts[keep], index=store.vocabulary[keep])
+    return frequencies.sort_values(ascending=False, kind='stable')
+
+
+def bow_matrix(store, stem_ids, n_stems=None):
+    """
+    Per-song bag of words of stems, as a sparse (songs x stems) count matrix.
+
+    :param store: TokenStore
+    :param stem_ids: np.array, stem id of each vocabulary entry
+    :param n_stems: int, number of columns (defaults to the largest stem id + 1)
+    :return: scipy.sparse.csr_matrix
+    """
+    from scipy.sparse import csr_matrix
+
+    if n_stems is None:
+        n_stems = int(stem_ids.max()) + 1 if len(stem_ids) else 0
+    rows = np.repeat(np.arange(len(store.offsets) - 1), song_lengths(store))
+    columns = stem_ids[store.token_ids]
+    matrix = csr_matrix((np.ones(len(columns), dtype='int64'), (rows, columns)),
+                        shape=(len(store.offsets) - 1, n_stems))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def group_vocabulary(store, stems, stem_ids, stop_mask, groups):
+    """
+    Total words, vocabulary size and lexical diversity per group of songs (e.g. per year), in one grouped reduction
+    of the per-song bags of words. Vocabulary size leaves out stopwords and the empty word, as in vocabulary_size.
+
+    :param store: TokenStore
+    :param stems: np.array of str, as returned by stem_vocabulary
+    :param stem_ids: np.array, stem id of each vocabulary entry
+    :param stop_mask: np.array of bool, stopword flag of each stem
+    :param groups: array-like with the group of each song
+    :return: pd.DataFrame indexed by group, sorted
+    """
+    from scipy.sparse import csr_matrix
+
+    group_codes, group_labels = pd.factorize(np.asarray(groups), sort=True)
+    n_songs = len(group_codes)
+    indicator = csr_matrix((np.ones(n_songs, dtype='int64'), (group_codes, np.arange(n_songs))),
+                           shape=(len(group_labels), n_songs))
+    group_counts = (indicator @ bow_matrix(store, stem_ids, len(stems))).tocsc()
+
+    total_words = np.asarray(group_counts.sum(axis=1)).ravel()
+    counted = ~stop_mask & (stems != '')
+    unique_words = np.asarray((group_counts[:, np.flatnonzero(counted)] > 0).sum(axis=1)).ravel()
+    diversity = np.divide(unique_words, total_words, out=np.zeros(len(total_words)), where=total_words > 0)
+
+    index = pd.Index(group_labels, name=getattr(groups, 'name', None))
+    return pd.DataFrame({"Vocabulary size": unique_words, "Total words": total_words,
+                         "Lexical diversity": diversity}, index=index)
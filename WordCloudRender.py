@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+
+
+# Settings of the word cloud of Analysis.py
+WORDCLOUD_OPTIONS = {"width": 3000, "height": 2000, "random_state": 3, "background_color": 'white',
+                     "colormap": 'Set2', "collocations": False}
+
+# Factor by which draft word clouds are smaller than final ones
+DRAFT_FACTOR = 4
+
+# Decoded masks of this process, by (image path, modification time, size, factor)
+_masks = {}
+
+
+def load_mask(path, factor=1, cache_directory=None):
+    """
+    Decodes the image giving the shape of a word cloud into a mask array, optionally shrunk by a factor (for drafts).
+    Decoded masks are kept for the rest of the process, and saved as .npy files in cache_directory (if given) under
+    the hash of the image, so that later runs don't decode the image again.
+
+    :param path: str
+    :param factor: int, the mask is shrunk to 1/factor of the image size
+    :param cache_directory: str
+    :return: np.array
+    """
+    status = os.stat(path)
+    key = (os.path.abspath(path), status.st_mtime_ns, status.st_size, factor)
+    if key in _masks:
+        return _masks[key]
+
+    cache_path = None
+    if cache_directory is not None:
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        cache_path = os.path.join(cache_directory, "mask-{}-{}.npy".format(digest, factor))
+    if cache_path is not None and os.path.exists(cache_path):
+        mask = np.load(cache_path)
+    else:
+        from PIL import Image
+
+        image = Image.open(path)
+        if factor != 1:
+            image = image.resize((max(1, image.width // factor), max(1, image.height // factor)), Image.NEAREST)
+        mask = np.array(image)
+        if cache_path is not None:
+            os.makedirs(cache_directory, exist_ok=True)
+            np.save(cache_path, mask)
+    _masks[key] = mask
+    return mask
+
+
+def compute_layout(frequencies, mask=None, draft=False, **options):
+    """
+    Places the words of a word cloud, from precomputed word frequencies. Placement is by far the slowest part of
+    drawing a word cloud, and takes roughly factor^2 less time on a draft, whose layout can later be rendered at the
+    full size (see render_layout).
+
+    :param frequencies: dict of word -> frequency
+    :param mask: np.array, as returned by load_mask (already shrunk for drafts)
+    :param draft: bool, place the words on a DRAFT_FACTOR times smaller canvas
+    :param options: WordCloud options (default WORDCLOUD_OPTIONS)
+    :return: WordCloud
+    """
+    from wordcloud import WordCloud
+
+    options = dict(WORDCLOUD_OPTIONS, **options)
+    if draft:
+        options["width"] = max(1, options["width"] // DRAFT_FACTOR)
+        options["height"] = max(1, options["height"] // DRAFT_FACTOR)
+    return WordCloud(mask=mask, **options).generate_from_frequencies(frequencies)
+
+
+def save_layout(word_cloud, path, factor=1):
+    """
+    Saves the placed words of a word cloud, with what's needed to draw them again, as JSON.
+
+    :param word_cloud: WordCloud, after generate_from_frequencies
+    :param path: str
+    :param factor: int, how many times smaller than the final image the layout is (DRAFT_FACTOR for drafts)
+    :return: None
+    """
+    if word_cloud.mask is not None:
+        height, width = word_cloud.mask.shape[:2]
+    else:
+        height, width = word_cloud.height, word_cloud.width
+    layout = {"width": width, "height": height, "factor": factor, "font_path": word_cloud.font_path,
+              "background_color": word_cloud.background_color, "mode": word_cloud.mode,
+              "colormap": word_cloud.colormap if isinstance(word_cloud.colormap, str) else None,
+              "words": [[word, float(frequency), int(font_size), [int(position[0]), int(position[1])],
+                         None if orientation is None else int(orientation), color]
+                        for (word, frequency), font_size, position, orientation, color in word_cloud.layout_]}
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(layout, f)
+
+
+def load_layout(path):
+    """
+    Loads a layout saved by save_layout as a WordCloud which can be rendered (or recoloured) without placing the
+    words again.
+
+    :param path: str
+    :return: word_cloud: WordCloud, factor: int, the scale at which it has the final size
+    """
+    from wordcloud import WordCloud
+
+    with open(path) as f:
+        layout = json.load(f)
+    word_cloud = WordCloud(width=layout["width"], height=layout["height"], font_path=layout["font_path"],
+                           background_color=layout["background_color"], mode=layout["mode"],
+                           colormap=layout["colormap"])
+    # The layout's font is used as is, even if the default font of wordcloud has changed since
+    word_cloud.layout_ = [((word, frequency), font_size, tuple(position), orientation, color)
+                          for word, frequency, font_size, position, orientation, color in layout["words"]]
+    return word_cloud, layout["factor"]
+
+
+def render_layout(word_cloud, path, scale=1, colormap=None, random_state=None):
+    """
+    Draws a placed word cloud to an image file, scaled up (e.g. a draft layout at DRAFT_FACTOR for the final
+    image) and optionally with new colours.
+
+    :param word_cloud: WordCloud, placed by compute_layout or loaded by load_layout
+    :param path: str
+    :param scale: float
+    :param colormap: str, matplotlib colormap of the new colours
+    :param random_state: int, seed of the new colours
+    :return: str, the path
+    """
+    if colormap is not None:
+        word_cloud.recolor(colormap=colormap, random_state=random_state)
+    word_cloud.scale = scale
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    word_cloud.to_file(path)
+    return path
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import os
+import random
+import sys
+import pytest
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+WORDS = ["i", "me", "my", "mine", "myself", "great", "greatest", "genius", "king", "love", "money", "dreams", "city",
+         "night", "the", "a", "and", "of", "to", "we", "you", "running", "flows", "shining", "crowns", "gold"]
+
+
+def synthetic_songs(n_songs, seed=0):
+    """
+    Song records with random lyrics, a few exact duplicates and release dates over a few years.
+
+    :param n_songs: int
+    :param seed: int
+    :return: list of dict with 'Song ID', 'Song Title', 'Date' and 'Lyrics'
+    """
+    rng = random.Random(seed)
+    songs = []
+    for i in range(n_songs):
+        if i % 10 == 9:
+            lyrics = songs[i - 1]["Lyrics"]
+        else:
+            lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))) for _ in range(rng.randint(4, 20))]
+            lyrics = "[Verse]\n" + "\n".join(lines)
+        songs.append({"Song ID": i, "Song Title": "Song {}".format(i),
+                      "Date": "{}-{:02d}-01".format(2003 + i % 7, 1 + i % 12), "Lyrics": lyrics})
+    return songs
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # The stages read the lexicons and write to the Outputs folder relative to the working directory
+    os.symlink(os.path.join(REPOSITORY, "Lexicons"), str(tmp_path / "Lexicons"))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def corpus(workdir):
+    import pandas as pd
+    from CorpusStore import write_corpus
+
+    path = str(workdir / "lyrics.arrow")
+    write_corpus(pd.DataFrame(synthetic_songs(60)), path)
+    return path
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import pandas as pd
+import pytest
+from conftest import synthetic_songs
+from AggregateState import AggregateState, merge_states
+from CorpusStore import write_corpus
+from Pipeline import year_state_chunked
+
+
+@pytest.mark.parametrize("sketch", [False, True])
+def test_merged_partitions_equal_the_whole_corpus(workdir, corpus, sketch):
+    songs = synthetic_songs(60)
+    paths = [str(workdir / "first.arrow"), str(workdir / "second.arrow")]
+    write_corpus(pd.DataFrame(songs[:25]), paths[0])
+    write_corpus(pd.DataFrame(songs[25:]), paths[1])
+
+    state, _ = year_state_chunked(corpus, None, dedup_threshold=1, workers=1, sketch=sketch)
+    states = [year_state_chunked(path, None, dedup_threshold=1, workers=1, sketch=sketch)[0] for path in paths]
+    pd.testing.assert_frame_equal(merge_states(states).table(), state.table())
+
+
+def test_chunks_equal_the_in_memory_state(workdir, corpus):
+    state, _ = year_state_chunked(corpus, None, dedup_threshold=1, chunk_size=1000, workers=1)
+    chunked, _ = year_state_chunked(corpus, None, dedup_threshold=1, chunk_size=7, workers=1)
+    pd.testing.assert_frame_equal(chunked.table(), state.table())
+
+
+def test_save_load_and_collapse(workdir, corpus):
+    state, df_songs = year_state_chunked(corpus, None, dedup_threshold=1, workers=1)
+    state.save(str(workdir / "state.pkl"))
+    loaded = AggregateState.load(str(workdir / "state.pkl"))
+    pd.testing.assert_frame_equal(loaded.table(), state.table())
+
+    collapsed = state.collapse().table()
+    assert list(collapsed.index) == ["All"]
+    assert collapsed["Number of Songs"].iloc[0] == len(df_songs)
+    assert collapsed["I-words"].iloc[0] == pytest.approx(df_songs["I-words"].mean())
+
+
+def test_known_songs(workdir, corpus):
+    from Pipeline import clean_lyrics_text
+    from TokenStore import build_token_store
+
+    state, _ = year_state_chunked(corpus, None, dedup_threshold=1, workers=1)
+    # A song of the corpus, cleaned like the corpus, is already counted; a new one isn't
+    lyrics = clean_lyrics_text(pd.Series([synthetic_songs(1)[0]["Lyrics"], "a brand new song about the city at night"]))
+    assert list(state.known_songs(build_token_store(lyrics))) == [True, False]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import pandas as pd
+import pytest
+from conftest import synthetic_songs
+from CorpusStore import artist_corpora, read_corpus, write_artist_corpora
+
+
+def test_partitions_by_artist(tmp_path):
+    df = pd.DataFrame(synthetic_songs(10))
+    df["Artist"] = ["Kanye West"] * 6 + ["AC/DC"] * 4
+    paths = write_artist_corpora(df, str(tmp_path))
+    assert artist_corpora(str(tmp_path)) == {"AC/DC": paths["AC/DC"], "Kanye West": paths["Kanye West"]}
+    assert len(read_corpus(paths["AC/DC"])) == 4
+
+
+def test_artists_with_the_same_slug(tmp_path):
+    df = pd.DataFrame(synthetic_songs(4))
+    df["Artist"] = "AC/DC"
+    write_artist_corpora(df, str(tmp_path))
+    df["Artist"] = "AC DC"
+    with pytest.raises(ValueError):
+        write_artist_corpora(df, str(tmp_path))
+    # The partition of the first artist is kept
+    assert list(artist_corpora(str(tmp_path))) == ["AC/DC"]
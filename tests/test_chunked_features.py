@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from CorpusStore import read_corpus
+from Pipeline import TOKEN_STORE_PATH, clean_corpus, song_features, song_features_chunked
+from TokenStore import load_token_store
+
+
+@pytest.mark.parametrize("dedup_threshold", [0.8, 1])
+def test_chunked_features_equal_in_memory(workdir, corpus, dedup_threshold):
+    df_lyrics = clean_corpus(read_corpus(corpus, compact=True), None, dedup_threshold)
+    df_songs = song_features(df_lyrics, workers=1).reset_index(drop=True)
+    store = load_token_store(TOKEN_STORE_PATH, mmap_mode=None)
+
+    df_chunked = song_features_chunked(corpus, None, dedup_threshold, chunk_size=7, workers=1)
+    chunked_store = load_token_store(TOKEN_STORE_PATH, mmap_mode=None)
+
+    assert len(df_songs) < 60 if dedup_threshold < 1 else len(df_songs) == 60
+    pd.testing.assert_frame_equal(df_chunked.astype({"Date": str}), df_songs.astype({"Date": str}))
+    np.testing.assert_array_equal(chunked_store.offsets, store.offsets)
+    np.testing.assert_array_equal(chunked_store.index, store.index)
+    np.testing.assert_array_equal(chunked_store.vocabulary[chunked_store.token_ids],
+                                  store.vocabulary[store.token_ids])
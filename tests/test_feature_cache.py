@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import shutil
+import pandas as pd
+from conftest import REPOSITORY, synthetic_songs
+from FeatureCache import FeatureCache, feature_fingerprint, extract_features_cached
+from FeatureExtraction import extract_features
+from Pipeline import load_lexicons
+
+FEATURES = ("Lexicons", "Lexical density")
+
+
+def cached_features(path, lexicon_paths, stops, df_lyrics):
+    cache = FeatureCache(path, feature_fingerprint(lexicon_paths, stops, FEATURES))
+    try:
+        df_features = extract_features_cached(df_lyrics, load_lexicons(lexicon_paths), stops, cache, FEATURES,
+                                              n_workers=1)
+        return df_features, cache.hits, cache.misses
+    finally:
+        cache.close()
+
+
+def test_lexicon_and_stopword_changes_invalidate_the_cache(tmp_path):
+    lexicon_paths = {}
+    for name, file_name in [("I-words", "i_words.txt"), ("Greatness words", "greatness_words.txt")]:
+        lexicon_paths[name] = str(tmp_path / file_name)
+        shutil.copy("{}/Lexicons/{}".format(REPOSITORY, file_name), lexicon_paths[name])
+    df_lyrics = pd.DataFrame(synthetic_songs(20))
+    df_lyrics["Lyrics"] = df_lyrics["Lyrics"].str.replace("\n", " ")
+    stops = ["the", "a", "and", "of", "to"]
+    path = str(tmp_path / "feature_cache.sqlite")
+
+    df_first, hits, misses = cached_features(path, lexicon_paths, stops, df_lyrics)
+    assert (hits, misses) == (0, len(df_lyrics))
+    df_again, hits, misses = cached_features(path, lexicon_paths, stops, df_lyrics)
+    assert (hits, misses) == (len(df_lyrics), 0)
+    pd.testing.assert_frame_equal(df_again, df_first)
+
+    # A new greatness word: every song is recomputed, and the songs with "genius" get more greatness words
+    with open(lexicon_paths["Greatness words"], "a") as f:
+        f.write("38\tgenius\t\\bgenius\\b\n")
+    df_edited, hits, misses = cached_features(path, lexicon_paths, stops, df_lyrics)
+    assert (hits, misses) == (0, len(df_lyrics))
+    genius = df_lyrics["Lyrics"].str.count(r"\bgenius\b")
+    assert genius.sum() > 0
+    pd.testing.assert_series_equal(df_edited["Greatness words"], df_first["Greatness words"] + genius,
+                                   check_names=False, check_dtype=False)
+    pd.testing.assert_frame_equal(df_edited, extract_features(df_lyrics, load_lexicons(lexicon_paths), stops,
+                                                              FEATURES, n_workers=1), check_dtype=False)
+
+    df_stops, hits, misses = cached_features(path, lexicon_paths, stops + ["i", "my"], df_lyrics)
+    assert (hits, misses) == (0, len(df_lyrics))
+    assert (df_stops["Lexical density"] < df_edited["Lexical density"]).all()
+    pd.testing.assert_frame_equal(df_stops, extract_features(df_lyrics, load_lexicons(lexicon_paths),
+                                                             stops + ["i", "my"], FEATURES, n_workers=1),
+                                  check_dtype=False)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+from HttpCache import EVICT_TO, ResponseCache
+
+
+def test_eviction_keeps_a_running_total_and_prunes_parsed_results(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=1000)
+    for i in range(100):
+        body = "page {:03d} ".format(i) * 5
+        cache.put("https://example.com/{}".format(i), None, body)
+        cache.parsed(body, "length", len)
+
+    size, count = cache.connection.execute("SELECT SUM(size), COUNT(*) FROM responses").fetchone()
+    assert size == cache.total_bytes <= 1000
+    # The most recently used responses are kept, and only the parsing results of cached bodies
+    assert cache.get("https://example.com/99") is not None and cache.get("https://example.com/0") is None
+    assert cache.connection.execute("SELECT COUNT(*) FROM parsed").fetchone()[0] <= count
+    cache.close()
+
+    reopened = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=1000)
+    assert reopened.total_bytes == size
+    assert reopened.evict(int(1000 * EVICT_TO)) >= 0 and reopened.total_bytes <= 900
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import json
+import os
+import pytest
+from conftest import synthetic_songs
+from CorpusStore import read_corpus
+from Ingestion import LocalSongSource, ingest
+
+
+class InterruptedSource(LocalSongSource):
+    """
+    Local source which is interrupted (as by Ctrl-C) before a given song, the first time only.
+    """
+
+    def __init__(self, records, interrupt_before):
+        super().__init__(records)
+        self.interrupt_before = interrupt_before
+
+    def songs(self, state=None, skip_ids=()):
+        for record, record_state in super().songs(state, skip_ids):
+            if record["Song ID"] == self.interrupt_before:
+                self.interrupt_before = None
+                raise KeyboardInterrupt
+            yield record, record_state
+
+
+def test_resume_after_interruption(tmp_path):
+    songs = synthetic_songs(12)
+    source = InterruptedSource(songs, interrupt_before=7)
+    directory, path = str(tmp_path / "shards"), str(tmp_path / "lyrics.arrow")
+    with pytest.raises(KeyboardInterrupt):
+        ingest(source, directory, shard_size=5, corpus_path=path)
+
+    # The songs buffered before the interruption were written, with the position to resume from
+    with open(os.path.join(directory, "checkpoint.json")) as f:
+        checkpoint = json.load(f)
+    assert checkpoint["songs"] == 7 and checkpoint["state"] == {"position": 7} and not checkpoint["complete"]
+
+    assert ingest(source, directory, shard_size=5, corpus_path=path) == 12
+    df = read_corpus(path)
+    assert list(df["Song ID"]) == list(range(12))
+    assert list(df["Lyrics"]) == [song["Lyrics"] for song in songs]
+
+
+def test_refresh_fetches_new_songs_before_the_checkpoint(tmp_path):
+    songs = synthetic_songs(8)
+    directory, path = str(tmp_path / "shards"), str(tmp_path / "lyrics.arrow")
+    ingest(LocalSongSource(songs), directory, shard_size=3, corpus_path=path)
+    with open(os.path.join(directory, "checkpoint.json")) as f:
+        assert json.load(f)["complete"]
+
+    # A new song at the start of the source, as a new title sorting onto page 1
+    new_song = {"Song ID": 100, "Song Title": "AAA new", "Date": "2026-10-01", "Lyrics": "a brand new song here"}
+    seen = []
+
+    class RecordingSource(LocalSongSource):
+        def songs(self, state=None, skip_ids=()):
+            for record, record_state in super().songs(state, skip_ids):
+                seen.append(record["Song ID"])
+                yield record, record_state
+
+    assert ingest(RecordingSource([new_song] + songs), directory, shard_size=3, corpus_path=path) == 9
+    # Only the new song was fetched; the stored ones were skipped
+    assert seen == [100]
+    assert sorted(read_corpus(path)["Song ID"]) == list(range(8)) + [100]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import REPOSITORY, synthetic_songs
+from Functions import LexiconMatcher, count_patterns_string, word_pattern
+
+TEXTS = ["aaaa i'm iffy abab", "banana aab xx i i'm I'M", "", "my mine myself, my own greatness is the greatest",
+         "number one, number  one NUMBER ONE ha ha ha", "İ ı ſs KANYE K"]
+
+
+def lexicon(patterns):
+    return pd.DataFrame({"Label": patterns, "Regex": patterns})
+
+
+@pytest.mark.parametrize("patterns", [
+    [r"\bi\b", r"\bi'm\b", "i", r"\bmy\w*", r"\bmy\w{0,}\b", r"\bgreat\w{1,4}\b", r"\bgreatest\b"],
+    [r"\bnumber one\b", r"\bha ha\b", r"\bone, number\b", r"\bnumber on\w*\b", r"\bss\b", r"\bkanye\b", r"\bk\b"],
+    ["a??", "a*", r"(\w)\1", "(?:ab)+", "ab|a", r"(?P<x>a)(?P=x)", r"(?-i:\bi\b)", r"(?i)\bi\b"],
+])
+@pytest.mark.parametrize("flags", [0, re.IGNORECASE])
+def test_matcher_counts_equal_findall(patterns, flags):
+    matcher = LexiconMatcher([lexicon(patterns)], flags)
+    for text in TEXTS:
+        np.testing.assert_array_equal(matcher.count_string(text), count_patterns_string(matcher.pattern_list, text))
+
+
+def test_word_pattern():
+    assert word_pattern(r"\bMy\b", re.IGNORECASE) == (("my",), (0, 0))
+    assert word_pattern(r"\bi'm\b") == (("i", "'", "m"), (0, 0))
+    assert word_pattern(r"\bgreat\w{0,}\b") == (("great",), (0, None))
+    assert word_pattern(r"\bmy\w*") is None and word_pattern(r"\b'em\b") is None
+    assert word_pattern(r"\b(my|mine)\b") is None and word_pattern(r"(?i)\bmy\b") is None
+
+
+def test_matcher_counts_of_the_lexicons():
+    lexicons = [pd.read_table("{}/Lexicons/{}".format(REPOSITORY, name), index_col=0, sep='\t')
+                for name in ("i_words.txt", "greatness_words.txt")]
+    matcher = LexiconMatcher(lexicons)
+    assert matcher.separate == [] and matcher.scanned == {}
+    texts = [song["Lyrics"] for song in synthetic_songs(30)] + TEXTS
+    expected = np.array([count_patterns_string(matcher.pattern_list, text) for text in texts])
+    np.testing.assert_array_equal(matcher.count_series(texts), expected)
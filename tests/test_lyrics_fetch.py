@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import asyncio
+import threading
+from collections import Counter
+import pytest
+from aiohttp import web
+from CorpusStore import read_corpus
+from LyricsFetch import FetchError, GeniusAsyncSource, ingest_async
+
+ARTIST_ID = 72
+PAGES = {1: [1, 2, 3], 2: [4, 5, 6], 3: [7, 8]}
+
+
+class StubGenius:
+    """
+    Stub of the Genius API and song pages on a local port, served from a thread (ingest_async runs its own event
+    loop). Song 2 is rate limited (429) on its first request, song 3 is missing (404), and the songs in failing get
+    a 503 on every request.
+    """
+
+    def __init__(self):
+        self.requests = Counter()
+        self.failing = set()
+        self.base = None
+        self.loop = asyncio.new_event_loop()
+        self.runner = None
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/search", self.search)
+        app.router.add_get("/artists/{artist_id}/songs", self.artist_songs)
+        app.router.add_get("/songs/{song_id}", self.song_page)
+        return app
+
+    async def search(self, request):
+        self.requests["search"] += 1
+        return web.json_response({"response": {"hits": [{"result": {"primary_artist": {"id": ARTIST_ID,
+                                                                                       "name": "Stub Artist"}}}]}})
+
+    async def artist_songs(self, request):
+        page = int(request.query["page"])
+        self.requests["page {}".format(page)] += 1
+        songs = [{"id": song_id, "title": "Song {}".format(song_id), "url": "{}/songs/{}".format(self.base, song_id),
+                  "release_date": "2020-01-{:02d}".format(song_id), "lyrics_state": "complete"}
+                 for song_id in PAGES[page]]
+        return web.json_response({"response": {"songs": songs, "next_page": page + 1 if page + 1 in PAGES else None}})
+
+    async def song_page(self, request):
+        song_id = int(request.match_info["song_id"])
+        self.requests[song_id] += 1
+        if song_id == 2 and self.requests[song_id] == 1:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if song_id == 3:
+            raise web.HTTPNotFound()
+        if song_id in self.failing:
+            return web.Response(status=503)
+        return web.Response(text="<div data-lyrics-container='true'>Lyrics of song {}<br>second line</div>"
+                                 .format(song_id), content_type="text/html")
+
+    def start(self):
+        async def serve():
+            self.runner = web.AppRunner(self.app())
+            await self.runner.setup()
+            site = web.TCPSite(self.runner, "127.0.0.1", 0)
+            await site.start()
+            return "http://127.0.0.1:{}".format(site._server.sockets[0].getsockname()[1])
+
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.base = asyncio.run_coroutine_threadsafe(serve(), self.loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture
+def stub():
+    server = StubGenius()
+    server.start()
+    yield server
+    server.stop()
+
+
+def source(stub):
+    return GeniusAsyncSource("token", "Stub Artist", per_page=3, api_base=stub.base, rate=1000, retries=2,
+                             backoff=0.01)
+
+
+def test_rate_limit_and_missing_page(tmp_path, stub):
+    genius = source(stub)
+    path = str(tmp_path / "lyrics.arrow")
+    assert ingest_async(genius, str(tmp_path / "shards"), shard_size=2, corpus_path=path) == 7
+
+    # The rate limited song was retried after backing off; the missing one was skipped without aborting
+    assert stub.requests[2] == 2 and stub.requests[3] == 1
+    assert [song["Song ID"] for song in genius.failed] == [3]
+    df = read_corpus(path)
+    assert sorted(df["Song ID"]) == [1, 2, 4, 5, 6, 7, 8]
+    assert set(df.loc[df["Song ID"] == 5, "Lyrics"]) == {"Lyrics of song 5\nsecond line"}
+
+
+def test_resume_after_failure(tmp_path, stub):
+    directory, path = str(tmp_path / "shards"), str(tmp_path / "lyrics.arrow")
+    stub.failing = {7}
+    with pytest.raises(FetchError):
+        ingest_async(source(stub), directory, shard_size=2, corpus_path=path)
+    # The song was tried once plus the retries
+    assert stub.requests[7] == 3
+
+    stub.failing = set()
+    assert ingest_async(source(stub), directory, shard_size=2, corpus_path=path) == 7
+    # Resumed from the checkpoint: the first page wasn't listed again, and no song was fetched twice
+    assert stub.requests["page 1"] == 1
+    assert all(stub.requests[song_id] == 1 for song_id in (1, 4, 5, 6, 8))
+    assert sorted(read_corpus(path)["Song ID"]) == [1, 2, 4, 5, 6, 7, 8]
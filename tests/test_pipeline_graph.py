@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+from PipelineGraph import PipelineGraph
+
+
+def load(path):
+    with open(path) as f:
+        return [int(line) for line in f]
+
+
+def scale(numbers, factor, workers=1):
+    return [number * factor for number in numbers]
+
+
+def total(numbers):
+    return sum(numbers)
+
+
+def count(numbers):
+    return len(numbers)
+
+
+def graph(directory, path, factor=2, workers=1):
+    # load -> scale -> total, and load -> count
+    pipeline = PipelineGraph(str(directory))
+    pipeline.add("load", load, files=[str(path)], params={"path": str(path)})
+    pipeline.add("scale", scale, inputs=["load"], params={"factor": factor}, options={"workers": workers})
+    pipeline.add("total", total, inputs=["scale"])
+    pipeline.add("count", count, inputs=["load"])
+    return pipeline
+
+
+def test_rerun_recomputes_only_downstream_stages(tmp_path):
+    path = tmp_path / "numbers.txt"
+    path.write_text("1\n2\n3\n")
+    stages = tmp_path / "Stages"
+
+    first = graph(stages, path)
+    assert first.run() == {"load": "ran", "scale": "ran", "total": "ran", "count": "ran"}
+    assert first.value("total") == 12
+
+    # Nothing changed, and the options don't change the results: nothing runs or even loads its saved result
+    rerun = graph(stages, path, workers=4)
+    assert rerun.run() == {"load": "up to date", "scale": "up to date", "total": "up to date", "count": "up to date"}
+    assert rerun.ran == [] and rerun.values == {}
+
+    # A parameter of scale only reruns scale and total, from the saved result of load
+    changed = graph(stages, path, factor=10)
+    assert changed.run() == {"load": "up to date", "scale": "ran", "total": "ran", "count": "up to date"}
+    assert changed.ran == ["scale", "total"]
+    assert changed.value("total") == 60 and changed.value("count") == 3
+
+    # An input file reruns everything downstream of it
+    path.write_text("1\n2\n3\n4\n")
+    edited = graph(stages, path, factor=10)
+    assert edited.run(targets=["count"]) == {"load": "ran", "count": "ran"}
+    assert edited.value("count") == 4
+    assert edited.run() == {"load": "up to date", "scale": "ran", "total": "ran", "count": "up to date"}
+    assert edited.value("total") == 100
+
+    forced = graph(stages, path, factor=10)
+    assert forced.run(force=["scale"]) == {"load": "up to date", "scale": "ran", "total": "ran", "count": "up to date"}
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Created in October 2026
+
+@author: Dimitar Atanasov
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from TimeSeries import moving_average, moving_average_sweep
+
+VALUES = [4.0, np.nan, 7.0, 1.0, np.nan, np.nan, 3.0, 9.0, 2.0, np.nan, 5.0, 6.0]
+
+
+def expected_average(series, window, kind, min_periods):
+    if kind == "ewm":
+        return series.ewm(span=window, min_periods=min_periods or 0).mean()
+    return series.rolling(window, min_periods=min_periods, center=kind == "centered").mean()
+
+
+@pytest.mark.parametrize("kind", ["trailing", "centered", "ewm"])
+@pytest.mark.parametrize("window", [1, 2, 3, 4, 5, 20])
+@pytest.mark.parametrize("min_periods", [None, 1, 2])
+def test_moving_average_equals_pandas(kind, window, min_periods):
+    # DataFrame.rolling refuses more min_periods than the window
+    min_periods = min_periods and min(min_periods, window)
+    df_year = pd.DataFrame({"Year": range(2004, 2004 + len(VALUES)), "I-words": VALUES,
+                            "Total words": np.arange(len(VALUES), dtype='float64')})
+    df_average = moving_average(df_year, window, kind, min_periods=min_periods)
+    pd.testing.assert_series_equal(df_average["Year"], df_year["Year"])
+    for column in ["I-words", "Total words"]:
+        pd.testing.assert_series_equal(df_average[column], expected_average(df_year[column], window, kind, min_periods))
+
+    df_sweep = moving_average_sweep(df_year, [window], [kind], min_periods=min_periods)
+    np.testing.assert_allclose(df_sweep[(kind, window, "I-words")].to_numpy(), df_average["I-words"].to_numpy())